@@ -1,7 +1,32 @@
-import random
-from statistics import pstdev
+import atexit
+import os
+import secrets
+import tempfile
+import time
+from functools import partial
+
 import streamlit as st
 
+from trifactor.accumulator import ScoreAccumulator
+from trifactor.adaptive import AdaptiveSession
+from trifactor import metrics
+from trifactor.bank import CompiledBank, QuestionList, load_bank
+from trifactor.cache import ResultCache, fingerprint
+from trifactor.combined import (
+    COMBINED_LENS,
+    FOLLOWUPS_PER_LENS,
+    CombinedScores,
+    pick_combined_questions,
+)
+from trifactor.export import FORMATS, export_bytes, session_records, store_records, write_export
+from trifactor.metrics import timed
+from trifactor.narrative import DEFAULT_LOCALE, get_pack
+from trifactor.population import OVERALL, PopulationIndex
+from trifactor.prefetch import FOLLOWUPS, FollowupPrefetch, select_followups
+from trifactor.quality import QualityTracker
+from trifactor.scoring import choose_followup_targets, pick_initial_questions
+from trifactor.storage import DEFAULT_STORE_URL, SessionStore, open_store
+
 st.set_page_config(page_title="Trifactor Diagnostic", layout="centered")
 
 # ────────────────────────────────────────────────────────────── 
@@ -18,277 +43,97 @@ SCALE_LABELS = {
     4: "4 — Almost always",
 }
 
-VARIABLE_WEIGHTS = {
-    "Baseline": 1.2,
-    "Clarity": 1.1,
-    "Resources": 1.1,
-    "Boundaries": 1.1,
-    "Execution": 1.2,
-    "Feedback": 1.0,
-}
+PAGE_SIZE = max(1, int(os.environ.get("TRIFACTOR_PAGE_SIZE", 5)))  # questions per form submit
+HISTORY_DAYS = 365  # trend chart window
+ADMIN_TOKEN = os.environ.get("TRIFACTOR_ADMIN_TOKEN", "")  # unlocks the all-sessions export via ?admin=<token>
 
 # ──────────────────────────────────────────────────────────────
-# Helper Functions
+# Narrative Texts (locale pack compiled once per process)
 # ──────────────────────────────────────────────────────────────
 
-def clamp(n, lo, hi):
-    return max(lo, min(hi, n))
-
-
-def zone_name(score: float) -> str:  # 0–100
-    if score < 45:
-        return "RED"
-    if score < 70:
-        return "YELLOW"
-    return "GREEN"
-
-
-def zone_message(zone: str) -> str:
-    return {
-        "RED": "broken — needs urgent attention",
-        "YELLOW": "unstable — fragile under pressure",
-        "GREEN": "solid — working well",
-    }[zone]
-
-
-def lens_focus(lens: str) -> str:
-    return {
-        "Interpersonal": "relationship tension, clarity, boundaries, execution",
-        "Financial": "money stability, buffer, boundaries, execution",
-        "Big Picture": "mission clarity, resources, focus, execution, feedback",
-    }[lens]
-
-
-def variable_translation(lens: str, var: str) -> str:
-    translations = {
-        "Interpersonal": {
-            "Baseline": "Emotional stability under contact",
-            "Clarity": "Knowing what you want / what's true",
-            "Resources": "Support & emotional capacity",
-            "Boundaries": "Ability to hold limits",
-            "Execution": "Following through on difficult conversations",
-            "Feedback": "Repair & learning from conflict",
-        },
-        "Financial": {
-            "Baseline": "Stability under financial stress",
-            "Clarity": "Knowing your numbers & priorities",
-            "Resources": "Income, buffer, tools",
-            "Boundaries": "Control over spending & exposure",
-            "Execution": "Actually doing the necessary actions",
-            "Feedback": "Reviewing & closing leaks",
-        },
-        "Big Picture": {
-            "Baseline": "Overall momentum & stability",
-            "Clarity": "Clear direction & next step",
-            "Resources": "Energy, support, environment",
-            "Boundaries": "Protecting focus & saying no",
-            "Execution": "Shipping & completing work",
-            "Feedback": "Measuring & iterating",
-        },
-    }
-    return translations.get(lens, {}).get(var, var)
+TEXT = get_pack(os.environ.get("TRIFACTOR_LOCALE", DEFAULT_LOCALE))
 
 
-def pressure_focus_summary(lens: str, weakest_var: str) -> str:
-    summaries = {
-        "Interpersonal": f"Biggest pressure is in **{weakest_var}** — likely too much emotional load or poor resolution patterns.",
-        "Financial": f"Biggest pressure is in **{weakest_var}** — usually buffer, system, or leak problem.",
-        "Big Picture": f"Biggest pressure is in **{weakest_var}** — goal is real, but structure/support isn't matching.",
-    }
-    return summaries.get(lens, f"Pressure concentrates in **{weakest_var}**.")
+# ──────────────────────────────────────────────────────────────
+# Question Bank (compiled once per server process)
+# ──────────────────────────────────────────────────────────────
+
+@st.cache_resource
+def get_bank() -> CompiledBank:
+    return load_bank(weights=os.environ.get("TRIFACTOR_WEIGHTS"))  # recalibrated item weights, if any
+
+
+BANK = get_bank()
+
+
+@st.cache_resource
+def get_store() -> SessionStore:
+    store = open_store(os.environ.get("TRIFACTOR_STORE", DEFAULT_STORE_URL), BANK)
+    atexit.register(store.close)  # flush buffered answers when the server shuts down
+    return store
+
+
+STORE = get_store()
+
+
+@st.cache_resource
+def get_population() -> PopulationIndex:
+    return PopulationIndex()
+
+
+POPULATION = get_population()
+POPULATION_SYNC_SECONDS = 30
+
 
+@st.cache_resource
+def get_result_cache() -> ResultCache:
+    return ResultCache(max_entries=int(os.environ.get("TRIFACTOR_RESULT_CACHE_SIZE", 4096)))
+
+
+RESULTS = get_result_cache()
+
+
+@st.cache_resource
+def get_prefetch() -> FollowupPrefetch:
+    return FollowupPrefetch(BANK)
+
+
+PREFETCH = get_prefetch()
 
 # ──────────────────────────────────────────────────────────────
-# Question Bank (placeholder — fill with your real questions)
+# Metrics (opt-in: TRIFACTOR_METRICS=1)
 # ──────────────────────────────────────────────────────────────
 
-QUESTION_BANK = {
-    "Interpersonal": [
-        {"id":"i01","text":"How often do you feel tense before interacting with a specific person?","variable":"Baseline","weight":1.2,"reverse":True},
-        {"id":"i02","text":"How often does one conversation ruin your whole day?","variable":"Baseline","weight":1.3,"reverse":True},
-        {"id":"i03","text":"How often do you avoid a conversation you know you need to have?","variable":"Execution","weight":1.2,"reverse":True},
-        {"id":"i04","text":"How clear are you about what you want from this relationship/situation?","variable":"Clarity","weight":1.3,"reverse":False},
-        {"id":"i05","text":"How often do you leave a talk unsure what was actually decided?","variable":"Clarity","weight":1.1,"reverse":True},
-        {"id":"i06","text":"How often do you say “yes” when you mean “no”?","variable":"Boundaries","weight":1.4,"reverse":True},
-        {"id":"i07","text":"How often do you tolerate behavior that you resent later?","variable":"Boundaries","weight":1.3,"reverse":True},
-        {"id":"i08","text":"How often do you communicate your limits early rather than late?","variable":"Boundaries","weight":1.2,"reverse":False},
-        {"id":"i09","text":"How supported do you feel by at least one person in your life?","variable":"Resources","weight":1.1,"reverse":False},
-        {"id":"i10","text":"How often do you feel alone carrying the emotional load?","variable":"Resources","weight":1.2,"reverse":True},
-        {"id":"i11","text":"How often do conflicts repeat without resolution?","variable":"Feedback","weight":1.2,"reverse":True},
-        {"id":"i12","text":"How often do you reflect after conflict and adjust your approach?","variable":"Feedback","weight":1.1,"reverse":False},
-        {"id":"i13","text":"How often do you interpret neutral behavior as hostile?","variable":"Feedback","weight":1.0,"reverse":True},
-        {"id":"i14","text":"How often do you apologize to restore peace even when you weren’t wrong?","variable":"Boundaries","weight":1.1,"reverse":True},
-        {"id":"i15","text":"How often do you directly ask for what you need?","variable":"Execution","weight":1.2,"reverse":False},
-        {"id":"i16","text":"How often do you replay conversations in your head afterward?","variable":"Baseline","weight":1.0,"reverse":True},
-        {"id":"i17","text":"How often do you feel respected in the dynamic?","variable":"Resources","weight":1.2,"reverse":False},
-        {"id":"i18","text":"How often do you keep your word when you set a boundary?","variable":"Execution","weight":1.3,"reverse":False},
-        {"id":"i19","text":"How often do you use sarcasm/withdrawal instead of stating the issue?","variable":"Execution","weight":1.1,"reverse":True},
-        {"id":"i20","text":"How often do you feel you must perform to be valued?","variable":"Clarity","weight":1.0,"reverse":True},
-        {"id":"i21","text":"How often do you choose timing/location to improve the odds of a good talk?","variable":"Execution","weight":1.0,"reverse":False},
-        {"id":"i22","text":"How often do you communicate expectations before frustration builds?","variable":"Execution","weight":1.1,"reverse":False},
-        {"id":"i23","text":"How often do you recover quickly after conflict?","variable":"Baseline","weight":1.1,"reverse":False},
-        {"id":"i24","text":"How often do you ask clarifying questions instead of assuming intent?","variable":"Feedback","weight":1.0,"reverse":False},
-        {"id":"i25","text":"How often do you feel you’re walking on eggshells?","variable":"Baseline","weight":1.3,"reverse":True},
-        {"id":"i51","text":"How often do you notice resentment building before you name it?","variable":"Feedback","weight":1.2,"reverse":True},
-        {"id":"i52","text":"How often do you recover quickly after interpersonal strain?","variable":"Baseline","weight":1.1,"reverse":False},
-        {"id":"i53","text":"How often do you feel conversations require translation instead of clarity?","variable":"Clarity","weight":1.2,"reverse":True},
-        {"id":"i54","text":"How often do you address tone instead of content when tension arises?","variable":"Execution","weight":1.0,"reverse":False},
-        {"id":"i55","text":"How often do you feel relational effort is uneven?","variable":"Resources","weight":1.2,"reverse":True},
-        {"id":"i56","text":"How often do you say no without justification?","variable":"Boundaries","weight":1.3,"reverse":False},
-        {"id":"i57","text":"How often do misunderstandings persist longer than necessary?","variable":"Feedback","weight":1.1,"reverse":True},
-        {"id":"i58","text":"How often do you revisit unresolved conversations?","variable":"Execution","weight":1.1,"reverse":True},
-        {"id":"i59","text":"How often do you feel relationally resourced rather than depleted?","variable":"Resources","weight":1.3,"reverse":False},
-        {"id":"i60","text":"How often do you check assumptions before reacting?","variable":"Feedback","weight":1.0,"reverse":False},
-        {"id":"i61","text":"How often do you feel pressure to maintain harmony at your expense?","variable":"Boundaries","weight":1.2,"reverse":True},
-        {"id":"i62","text":"How often do you name patterns instead of incidents?","variable":"Clarity","weight":1.2,"reverse":False},
-        {"id":"i63","text":"How often do you feel conversations reset rather than compound?","variable":"Baseline","weight":1.1,"reverse":False},
-        {"id":"i64","text":"How often do you feel safe disagreeing?","variable":"Resources","weight":1.2,"reverse":False},
-        {"id":"i65","text":"How often do you delay resolution due to emotional fatigue?","variable":"Baseline","weight":1.1,"reverse":True},
-        {"id":"i66","text":"How often do you follow through on relational agreements?","variable":"Execution","weight":1.2,"reverse":False},
-        {"id":"i67","text":"How often do you feel conversations end cleanly?","variable":"Clarity","weight":1.1,"reverse":False},
-        {"id":"i68","text":"How often do you absorb blame to keep peace?","variable":"Boundaries","weight":1.2,"reverse":True},
-        {"id":"i69","text":"How often do you experience mutual accountability?","variable":"Feedback","weight":1.2,"reverse":False},
-        {"id":"i70","text":"How often do you exit interactions with increased trust?","variable":"Resources","weight":1.3,"reverse":False},
-        {"id":"i71","text":"How often do you recognize emotional debt accumulating?","variable":"Feedback","weight":1.1,"reverse":False},
-        {"id":"i72","text":"How often do you state needs without apology?","variable":"Boundaries","weight":1.2,"reverse":False},
-        {"id":"i73","text":"How often do you feel relational stability across time?","variable":"Baseline","weight":1.2,"reverse":False},
-        {"id":"i74","text":"How often do you resolve issues before they resurface?","variable":"Execution","weight":1.2,"reverse":False},
-        {"id":"i75","text":"How often do relationships feel directionally improving?","variable":"Resources","weight":1.3,"reverse":False},
-    ],
-    
-    "Financial": [
-  {"id":"f01","text":"How often do you feel a tightness in your chest when thinking about upcoming expenses?","variable":"Baseline","weight":1.1,"reverse":true},
-  {"id":"f02","text":"How frequently do you delay checking financial notifications because they feel stressful?","variable":"Baseline","weight":1.2,"reverse":true},
-  {"id":"f03","text":"How often do thoughts about money interrupt your ability to relax?","variable":"Baseline","weight":1.3,"reverse":true},
-  {"id":"f04","text":"How calm do you generally feel when reviewing your monthly finances?","variable":"Baseline","weight":1.0,"reverse":false},
-  {"id":"f05","text":"How often do you feel a sense of dread before opening bills or statements?","variable":"Baseline","weight":1.2,"reverse":true},
-
-  {"id":"f06","text":"How frequently do you feel confident that you understand your financial situation?","variable":"Baseline","weight":1.0,"reverse":false},
-  {"id":"f07","text":"How often do you feel mentally braced for bad news when checking your accounts?","variable":"Baseline","weight":1.3,"reverse":true},
-  {"id":"f08","text":"How often does financial uncertainty affect your sleep?","variable":"Baseline","weight":1.4,"reverse":true},
-  {"id":"f09","text":"How steady do you feel emotionally when thinking about long-term financial plans?","variable":"Baseline","weight":1.1,"reverse":false},
-  {"id":"f10","text":"How often do you experience physical tension when money comes up in conversation?","variable":"Baseline","weight":1.2,"reverse":true},
-
-  {"id":"f11","text":"How often do you feel in control of your financial decisions?","variable":"Baseline","weight":1.0,"reverse":false},
-  {"id":"f12","text":"How frequently do you avoid financial planning because it feels overwhelming?","variable":"Baseline","weight":1.3,"reverse":true},
-  {"id":"f13","text":"How often do you notice your heart rate increase when checking balances?","variable":"Baseline","weight":1.4,"reverse":true},
-  {"id":"f14","text":"How comfortable are you reviewing past financial mistakes?","variable":"Baseline","weight":1.1,"reverse":false},
-  {"id":"f15","text":"How often do you feel a sense of urgency or panic related to money?","variable":"Baseline","weight":1.3,"reverse":true},
-
-  {"id":"f16","text":"How often do you feel financially safe in your day-to-day life?","variable":"Baseline","weight":1.2,"reverse":false},
-  {"id":"f17","text":"How frequently do financial thoughts loop in your mind without resolution?","variable":"Baseline","weight":1.3,"reverse":true},
-  {"id":"f18","text":"How relaxed do you feel when making routine financial decisions?","variable":"Baseline","weight":1.0,"reverse":false},
-  {"id":"f19","text":"How often do you feel pressure building before financial check-ins?","variable":"Baseline","weight":1.2,"reverse":true},
-  {"id":"f20","text":"How confident are you in your ability to handle unexpected expenses?","variable":"Baseline","weight":1.1,"reverse":false},
-
-  {"id":"f21","text":"How often do you feel emotionally drained after dealing with money matters?","variable":"Baseline","weight":1.3,"reverse":true},
-  {"id":"f22","text":"How often do you feel grounded and present when reviewing finances?","variable":"Baseline","weight":1.0,"reverse":false},
-  {"id":"f23","text":"How frequently do you anticipate negative outcomes before checking your balance?","variable":"Baseline","weight":1.2,"reverse":true},
-  {"id":"f24","text":"How stable does your mood feel when thinking about money overall?","variable":"Baseline","weight":1.1,"reverse":false},
-  {"id":"f25","text":"How often do financial concerns spill over into other areas of your life?","variable":"Baseline","weight":1.3,"reverse":true},
-
-  {"id":"f26","text":"How often do you feel anxious or braced when checking your bank balance?","variable":"Baseline","weight":1.2,"reverse":true},
-  {"id":"f27","text":"How often do you feel a sense of relief after checking your finances?","variable":"Baseline","weight":1.0,"reverse":false},
-  {"id":"f28","text":"How frequently do you experience bodily stress reactions related to money?","variable":"Baseline","weight":1.4,"reverse":true},
-  {"id":"f29","text":"How capable do you feel of navigating financial uncertainty?","variable":"Baseline","weight":1.1,"reverse":false},
-  {"id":"f30","text":"How often do you mentally prepare for the worst before financial reviews?","variable":"Baseline","weight":1.3,"reverse":true},
-
-  {"id":"f31","text":"How often do you feel emotionally regulated while managing money?","variable":"Baseline","weight":1.0,"reverse":false},
-  {"id":"f32","text":"How frequently do you feel tension in your body when opening financial apps?","variable":"Baseline","weight":1.3,"reverse":true},
-  {"id":"f33","text":"How clear-headed do you feel when making financial decisions?","variable":"Baseline","weight":1.1,"reverse":false},
-  {"id":"f34","text":"How often do you avoid financial information due to discomfort?","variable":"Baseline","weight":1.2,"reverse":true},
-  {"id":"f35","text":"How secure do you feel about your current financial footing?","variable":"Baseline","weight":1.1,"reverse":false},
-
-  {"id":"f36","text":"How often do you feel a spike of stress when thinking about money?","variable":"Baseline","weight":1.3,"reverse":true},
-  {"id":"f37","text":"How often do you feel emotionally balanced after checking your accounts?","variable":"Baseline","weight":1.0,"reverse":false},
-  {"id":"f38","text":"How frequently does financial stress show up physically for you?","variable":"Baseline","weight":1.4,"reverse":true},
-  {"id":"f39","text":"How confident do you feel facing financial conversations?","variable":"Baseline","weight":1.1,"reverse":false},
-  {"id":"f40","text":"How often do you feel a sense of threat when engaging with finances?","variable":"Baseline","weight":1.3,"reverse":true},
-
-  {"id":"f41","text":"How often do you feel capable of responding calmly to financial changes?","variable":"Baseline","weight":1.1,"reverse":false},
-  {"id":"f42","text":"How frequently do you feel overwhelmed by financial information?","variable":"Baseline","weight":1.2,"reverse":true},
-  {"id":"f43","text":"How relaxed do you feel immediately after reviewing your balance?","variable":"Baseline","weight":1.0,"reverse":false},
-  {"id":"f44","text":"How often do you feel on edge before dealing with money matters?","variable":"Baseline","weight":1.3,"reverse":true},
-  {"id":"f45","text":"How stable does your sense of safety feel regarding money?","variable":"Baseline","weight":1.1,"reverse":false},
-
-  {"id":"f46","text":"How often do financial tasks trigger a stress response in you?","variable":"Baseline","weight":1.3,"reverse":true},
-  {"id":"f47","text":"How often do you feel composed when managing your finances?","variable":"Baseline","weight":1.0,"reverse":false},
-  {"id":"f48","text":"How frequently do you feel braced for impact when reviewing money?","variable":"Baseline","weight":1.2,"reverse":true},
-  {"id":"f49","text":"How confident are you in your financial resilience?","variable":"Baseline","weight":1.1,"reverse":false},
-  {"id":"f50","text":"How often do you experience lingering stress after financial check-ins?","variable":"Baseline","weight":1.3,"reverse":true}
-],
-"Big Picture": [
-        {"id": "b01", "text": "How clear is your long-term direction (north star)?", "variable": "Clarity", "weight": 1.3, "reverse": False}, 
-        {"id": "b02", "text": "How often do you feel scattered or pulled in too many directions?", "variable": "Baseline", "weight": 1.2, "reverse": True},
-        {"id": "b03", "text": "How easily can you name the single smallest next step right now?", "variable": "Clarity", "weight": 1.2, "reverse": False},
-        {"id": "b04", "text": "How often do you have enough energy/focus to actually do meaningful work?", "variable": "Resources", "weight": 1.2, "reverse": False},
-        {"id": "b05", "text": "How frequently do you spend time on tasks that don't move your main goal forward?", "variable": "Boundaries", "weight": 1.3, "reverse": True},
-        {"id": "b06", "text": "How often do you finish and ship things instead of endlessly refining?", "variable": "Execution", "weight": 1.3, "reverse": False},
-        {"id": "b07", "text": "How often does your direction or priorities change dramatically week-to-week?", "variable": "Baseline", "weight": 1.2, "reverse": True},
-        {"id": "b08", "text": "How consistently do you track real progress with numbers (not just feelings)?", "variable": "Feedback", "weight": 1.2, "reverse": False},
-        {"id": "b09", "text": "How often do you actually review what worked and change your approach?", "variable": "Feedback", "weight": 1.2, "reverse": False},
-        {"id": "b10", "text": "How often do you ignore clear warning signals because they feel inconvenient?", "variable": "Feedback", "weight": 1.1, "reverse": True},
-        {"id": "b11", "text": "How well do you protect deep work time from interruptions and distractions?", "variable": "Boundaries", "weight": 1.3, "reverse": False},
-        {"id": "b12", "text": "How often do you feel like you're operating with zero buffer or safety margin?", "variable": "Resources", "weight": 1.2, "reverse": True},
-        {"id": "b13", "text": "How realistic and followable is your typical weekly plan?", "variable": "Execution", "weight": 1.2, "reverse": False},
-        {"id": "b14", "text": "How often do other people's urgencies derail your own priorities?", "variable": "Boundaries", "weight": 1.3, "reverse": True},
-        {"id": "b15", "text": "How clearly can you name the top 3 things you should say 'no' to right now?", "variable": "Clarity", "weight": 1.2, "reverse": False},
-        {"id": "b16", "text": "How often do you experience real forward momentum that feels good?", "variable": "Baseline", "weight": 1.1, "reverse": False},
-        {"id": "b17", "text": "How frequently do you procrastinate on the one most important/scary task?", "variable": "Execution", "weight": 1.3, "reverse": True},
-        {"id": "b18", "text": "How easy is it for you to get help, advice, or tools when you're stuck?", "variable": "Resources", "weight": 1.1, "reverse": False},
-        {"id": "b19", "text": "How often do you document important decisions so you don't re-debate them?", "variable": "Feedback", "weight": 1.1, "reverse": False},
-        {"id": "b20", "text": "How well does your current environment (physical + digital) support your goals?", "variable": "Resources", "weight": 1.2, "reverse": False0},
-        {"id": "b21", "text": "How quickly do you simplify things when they start becoming too complicated?", "variable": "Feedback", "weight": 1.2, "reverse": False},
-        {"id": "b22", "text": "How often do you actually complete the things you start?", "variable": "Execution", "weight": 1.3, "reverse": False},
-        {"id": "b23", "text": "How often do you experience mission drift after a setback or criticism?", "variable": "Baseline", "weight": 1.2, "reverse": True},
-        {"id": "b24", "text": "How good are you at picking one important lever and pushing it hard for a week?", "variable": "Execution", "weight": 1.2, "reverse": False},
-        {"id": "b25", "text": "How real and reachable does your main goal actually feel right now?", "variable": "Clarity", "weight": 1.3, "reverse": False},
-        {"id": "b26", "text": "How often does your mission feel like it pulls you forward instead of you pushing?", "variable": "Baseline", "weight": 1.2, "reverse": False},
-        {"id": "b27", "text": "How clearly can you name what you should definitely NOT be working on right now?", "variable": "Clarity", "weight": 1.3, "reverse": False},
-        {"id": "b28", "text": "How frequently does your whole system feel overloaded and fragile?", "variable": "Baseline", "weight": 1.3, "reverse": True},
-        {"id": "b29", "text": "How intentionally do you prune or simplify when complexity increases?", "variable": "Execution", "weight": 1.2, "reverse": False},
-        {"id": "b30", "text": "How often do you feel genuinely supported by your current setup/structure?", "variable": "Resources", "weight": 1.2, "reverse": False},
-        {"id": "b31", "text": "How often do you complete full cycles of work instead of abandoning projects halfway?", "variable": "Execution", "weight": 1.2, "reverse": False},
-        {"id": "b32", "text": "How frequently do external notifications or requests pull you off your intended path?", "variable": "Boundaries", "weight": 1.2, "reverse": True},
-        {"id": "b33", "text": "How quickly can you identify the true bottleneck when progress feels stuck?", "variable": "Clarity", "weight": 1.3, "reverse": False},
-        {"id": "b34", "text": "How comfortable are you taking action without having all the information first?", "variable": "Execution", "weight": 1.2, "reverse": False},
-        {"id": "b35", "text": "How often do you revisit and challenge assumptions that might no longer be true?", "variable": "Feedback", "weight": 1.1, "reverse": False},
-        {"id": "b36", "text": "How deliberately do you protect and manage your energy as a strategic resource?", "variable": "Resources", "weight": 1.2, "reverse": False},
-        {"id": "b37", "text": "How often do you find yourself reacting to events instead of acting deliberately?", "variable": "Baseline", "weight": 1.2, "reverse": True},
-        {"id": "b38", "text": "How willing are you to reduce scope or simplify when things get overwhelming?", "variable": "Boundaries", "weight": 1.2, "reverse": False},
-        {"id": "b39", "text": "How often do you fall for false urgency created by others or yourself?", "variable": "Feedback", "weight": 1.1, "reverse": True},
-        {"id": "b40", "text": "How easily can you identify the single most stabilizing move in chaotic times?", "variable": "Clarity", "weight": 1.2, "reverse": False},
-        {"id": "b41", "text": "How often do you ship something useful even when the information is incomplete?", "variable": "Execution", "weight": 1.2, "reverse": False},
-        {"id": "b42", "text": "How constrained do you feel by your current systems, tools, or environment?", "variable": "Resources", "weight": 1.1, "reverse": True},
-        {"id": "b43", "text": "How early do you usually notice when you're drifting off course?", "variable": "Feedback", "weight": 1.1, "reverse": False},
-        {"id": "b44", "text": "How intentionally do you slow everything down when speed creates more chaos?", "variable": "Boundaries", "weight": 1.2, "reverse": False},
-        {"id": "b45", "text": "How aligned does your current direction still feel with what matters most to you?", "variable": "Baseline", "weight": 1.2, "reverse": False},
-        {"id": "b46", "text": "How willing are you to cut losses on things that clearly aren't working?", "variable": "Feedback", "weight": 1.2, "reverse": False},
-        {"id": "b47", "text": "How often do you choose high-leverage actions over high-effort ones?", "variable": "Clarity", "weight": 1.3, "reverse": False},
-        {"id": "b48", "text": "How well do you maintain steady momentum without burning out?", "variable": "Resources", "weight": 1.2, "reverse": False},
-        {"id": "b49", "text": "How good are you at executing the smallest possible viable step forward?", "variable": "Execution", "weight": 1.2, "reverse": False},
-        {"id": "b50", "text": "Overall, how directionally sound and self-correcting does your system feel?", "variable": "Baseline", "weight": 1.3, "reverse": False}, 
-    ], 
-
-
-# Note: Make sure every question has unique "id" across ALL lenses
-# Recommended structure:
-# {"id": "i01", "text": "...", "variable": "Baseline", "weight": 1.2, "reverse": True}
+@st.cache_resource
+def start_metrics_server(port: int):
+    return metrics.serve(port)
+
+
+if metrics.ENABLED:
+    if os.environ.get("TRIFACTOR_METRICS_PORT"):
+        start_metrics_server(int(os.environ["TRIFACTOR_METRICS_PORT"]))
+    if os.environ.get("TRIFACTOR_METRICS_FILE"):
+        metrics.write_textfile(os.environ["TRIFACTOR_METRICS_FILE"], min_interval=10)
 
 # ──────────────────────────────────────────────────────────────
 # Session State Initialization
 # ──────────────────────────────────────────────────────────────
 
 defaults = {
+    "session_id": None,  # store token, mirrored in the ?s= query param
+    "user_id": None,     # history key across runs, mirrored in the ?u= query param
     "stage": "setup",
     "lens": "Interpersonal",
-    "active_questions": [],
-    "answers": {},
+    "active_questions": [],  # QuestionList once a run starts
     "idx": 0,
     "followup_questions": [],
-    "followup_answers": {},
     "followup_idx": 0,
     "followup_targets": [],
+    "seed": 0,  # drives every random draw in a run, so it can be replayed
+    "adaptive": False,
+    "adaptive_session": None,
+    "scores": ScoreAccumulator(BANK),  # every answer given so far, with running scores
+    "quality": None,  # QualityTracker once a run starts
 }
 
 for key, value in defaults.items():
@@ -299,13 +144,206 @@ for key, value in defaults.items():
 def reset_session():
     for key, value in defaults.items():
         st.session_state[key] = value
+    st.query_params.clear()
     st.rerun()
 
 
+def record_answer(q, value):
+    """Store an answer and apply it to the running scores and quality checks; only real changes reach the store."""
+    ss = st.session_state
+    previous = ss.scores.get(q["id"])
+    if ss.scores.set(q, value):
+        ss.quality.update(q, previous, value)
+        if ss.session_id:
+            STORE.record_answer(ss.session_id, q["id"], value)
+
+
+def prefetch_followups():
+    """Start choosing follow-ups for the answers so far, ready by the time they are asked for."""
+    ss = st.session_state
+    if ss.session_id and ss.adaptive_session is None:
+        PREFETCH.submit(ss.session_id, ss.lens, ss.active_questions, ss.scores.answers(), ss.seed)
+
+
+def question_caption(q) -> str:
+    """What ``q`` measures, in its own lens (named first in combined runs)."""
+    lens = BANK.lens_of[q["id"]]
+    label = TEXT.variable_translation(lens, q["variable"])
+    return f"{lens} · {label}" if st.session_state.lens == COMBINED_LENS else label
+
+
+def save_session():
+    """Write progress to the store; called on stage transitions, not per click."""
+    ss = st.session_state
+    if not ss.session_id:
+        return
+    STORE.save_session(ss.session_id, {
+        "lens": ss.lens,
+        "stage": ss.stage,
+        "mode": "adaptive" if ss.adaptive_session is not None
+        else "combined" if isinstance(ss.scores, CombinedScores) else "fixed",
+        "seed": ss.seed,
+        "questions": [q["id"] for q in ss.active_questions],
+        "followups": [q["id"] for q in ss.followup_questions],
+        "targets": ss.followup_targets,
+        "idx": ss.idx,
+        "followup_idx": ss.followup_idx,
+        "user": ss.user_id,
+    })
+    if ss.stage == "final_results":
+        summary = result_summary(ss.lens, ss.scores)
+        flags = ss.quality.flags()
+        for flag in flags:
+            metrics.inc("response_quality", flag=flag)
+        STORE.save_result(ss.session_id, summary["overall"], summary["per_variable"], flags=flags)
+        if ss.user_id:
+            STORE.append_history(ss.user_id, ss.session_id, ss.lens, summary["overall"], summary["per_variable"])
+        POPULATION.sync(STORE)
+
+
+def percentile_note(lens, var, pct) -> str:
+    """Where a score sits among completed runs, or "" until there are enough of them."""
+    p = POPULATION.percentile(lens, var, pct)
+    return "" if p is None else f"  ·  higher than {p:.0f}% of runs"
+
+
+def summarize(lens, scores) -> dict:
+    """Scores and narrative for the result pages (population percentiles are added at render time)."""
+    per_var = scores.per_variable()
+    summary = {
+        "overall": scores.overall(per_var),
+        "per_variable": per_var,
+        "targets": tuple(choose_followup_targets(per_var)),
+        "breakdown": [
+            (var, TEXT.variable_translation(lens, var), TEXT.zone_message(info["zone"]))
+            for var, info in per_var.items()
+        ],
+        "weakest": None,
+        "matrix": None,  # combined runs: {variable: {lens: info or None}}
+    }
+    if isinstance(scores, CombinedScores):
+        summary["matrix"] = scores.matrix()
+        summary["lens_overall"] = scores.lens_overall()
+    if per_var:
+        weakest_var = min(per_var.items(), key=lambda x: x[1]["pct"])[0]
+        weakest_label = TEXT.variable_translation(lens, weakest_var)
+        weakest_items = scores.lowest(1, var=weakest_var)
+        summary["weakest"] = {
+            "label": weakest_label,
+            "summary": TEXT.pressure_focus_summary(lens, weakest_label),
+            "signals": [f"- {q['text']}  (score: {score}/4)" for _, score, _, q, _ in scores.lowest(3)],
+            "first_move": f"→ {weakest_items[0][3]['text']}" if weakest_items else None,
+        }
+    return summary
+
+
+def result_summary(lens, scores) -> dict:
+    """``summarize``, cached by answer fingerprint; identical answer sets are scored once."""
+    key = fingerprint(BANK.version, lens, scores.answers())
+    return RESULTS.get_or_compute(key, lambda: summarize(lens, scores))
+
+
+def restore_session(token) -> bool:
+    """Rebuild session state from the store; False if the token is unknown."""
+    saved = STORE.load_session(token)
+    if saved is None:
+        return False
+
+    ss = st.session_state
+    answers = saved["answers"]
+    ss.session_id = token
+    ss.lens = saved["lens"]
+    ss.stage = saved["stage"]
+    ss.seed = saved["seed"]
+    ss.idx = saved["idx"]
+    ss.followup_targets = saved["targets"]
+    if ss.user_id is None and saved.get("user"):
+        # Runs started elsewhere (e.g. the API) keep appending to their user's history
+        ss.user_id = saved["user"]
+        st.query_params["u"] = ss.user_id
+    ss.quality = QualityTracker.from_answers(BANK, answers)
+
+    if saved["mode"] == "adaptive":
+        session = AdaptiveSession(BANK, ss.lens, seed=ss.seed)
+        current = session.resume(answers)
+        ss.adaptive = True
+        ss.adaptive_session = session
+        ss.scores = session.scores
+        ss.active_questions = session.asked
+        if current is None:
+            ss.stage = "final_results"
+        return True
+
+    ss.active_questions = QuestionList.from_ids(BANK, saved["questions"])
+    ss.followup_questions = QuestionList.from_ids(BANK, saved["followups"])
+    # Resume at the first unanswered follow-up
+    ss.followup_idx = next(
+        (i for i, q in enumerate(ss.followup_questions) if q["id"] not in answers),
+        max(len(ss.followup_questions) - 1, 0),
+    )
+    scores_cls = CombinedScores if saved["mode"] == "combined" else ScoreAccumulator
+    ss.scores = scores_cls.from_answers(BANK, [*ss.active_questions, *ss.followup_questions], answers)
+    return True
+
+
+def count_rerun(fragment=None):
+    """Count a full script rerun, or (with ``fragment`` named) a rerun of just that fragment.
+
+    Fragments also run inside every full rerun; only their runs since the
+    last full one are counted as their own.
+    """
+    if not metrics.ENABLED:
+        return
+    ss = st.session_state
+    if fragment is None:
+        ss["_full_runs"] = ss.get("_full_runs", 0) + 1
+        metrics.inc("reruns", stage=ss.stage, scope="app")
+        return
+    seen = ss.setdefault("_fragment_runs", {})  # fragment -> full run it last ran in
+    if seen.get(fragment) == ss.get("_full_runs"):
+        metrics.inc("reruns", stage=ss.stage, scope="fragment")
+    seen[fragment] = ss.get("_full_runs")
+
+
+count_rerun()
+
+token = st.query_params.get("s")
+if token and st.session_state.session_id is None and not restore_session(token):
+    del st.query_params["s"]
+if st.session_state.user_id is None and "u" in st.query_params:
+    st.session_state.user_id = st.query_params["u"]
+
+
 # ──────────────────────────────────────────────────────────────
 # UI – Header & Sidebar
 # ──────────────────────────────────────────────────────────────
 
+def is_admin() -> bool:
+    given = st.query_params.get("admin", "")
+    return bool(ADMIN_TOKEN) and secrets.compare_digest(given.encode(), ADMIN_TOKEN.encode())
+
+
+def export_all_sessions(fmt):
+    """Every stored session, encoded chunk by chunk into an anonymous temporary file."""
+    out = tempfile.TemporaryFile()
+    write_export(store_records(STORE, BANK), fmt, out)
+    out.seek(0)
+    return out
+
+
+@st.fragment
+def admin_export():
+    # Written only when the download is clicked: it scores every stored session.
+    count_rerun("admin_export")
+    fmt = st.selectbox("Format", list(FORMATS), key="admin_export_format")
+    st.download_button(
+        "Download all sessions",
+        partial(export_all_sessions, fmt),
+        file_name=f"trifactor-sessions.{fmt}",
+        mime=FORMATS[fmt],
+    )
+
+
 st.title("Trifactor")
 st.caption("Pressure mapping across three lenses")
 
@@ -315,309 +353,311 @@ with st.sidebar:
     if st.button("Reset Everything", type="secondary"):
         reset_session()
 
+    if is_admin():
+        # Timings panel for operators: also needs TRIFACTOR_METRICS=1.
+        if metrics.ENABLED:
+            with st.expander("Admin · timings"):
+                st.dataframe(metrics.REGISTRY.summary(), hide_index=True)
+                reruns = metrics.REGISTRY.counts("reruns")
+                st.caption("Reruns: " + ", ".join(
+                    f"{labels['stage']} ({labels['scope']}) {n}" for labels, n in reruns
+                ))
+        with st.expander("Admin · export"):
+            admin_export()
+
 # ──────────────────────────────────────────────────────────────
 # Setup Screen – Lens Selection
 # ──────────────────────────────────────────────────────────────
 
-if st.session_state.stage == "setup":
+@timed("render.setup")
+def setup_page():
     st.subheader("Choose your diagnostic lens")
 
+    options = [*LENSES, COMBINED_LENS]
     st.session_state.lens = st.radio(
         "Which area feels most pressurized right now?",
-        options=LENSES,
-        index=LENSES.index(st.session_state.lens),
+        options=options,
+        index=options.index(st.session_state.lens),
         horizontal=True,
     )
+    combined = st.session_state.lens == COMBINED_LENS
 
     st.markdown(
-        f"**Focus of this lens:** {lens_focus(st.session_state.lens)}  \n"
+        f"**Focus of this lens:** {TEXT.lens_focus(st.session_state.lens)}  \n"
         "The tool will show you **where** the system is weakest — not how to fix it yet."
     )
 
-    if st.button("Start 25 Questions", type="primary"):
+    st.session_state.adaptive = st.toggle(
+        "Adaptive mode — stop as soon as every area is clear",
+        value=st.session_state.adaptive and not combined,
+        disabled=combined,  # adaptive runs follow a single lens
+    )
+
+    if combined:
+        start_label = "Start All Three Lenses"
+    else:
+        start_label = "Start Adaptive Diagnostic" if st.session_state.adaptive else "Start 25 Questions"
+    if st.button(start_label, type="primary"):
         lens = st.session_state.lens
-        bank = QUESTION_BANK.get(lens, [])
 
-        if not bank:
+        if not any(BANK.questions(l) for l in (LENSES if combined else [lens])):
             st.error("Question bank for this lens is empty. Add questions first.")
             st.stop()
 
-        # Random sample of 25 (or all if fewer)
-        k = min(25, len(bank))
-        st.session_state.active_questions = random.sample(bank, k=k)
-        st.session_state.answers = {}
+        st.session_state.session_id = secrets.token_urlsafe(12)
+        st.query_params["s"] = st.session_state.session_id
+        if st.session_state.user_id is None:
+            st.session_state.user_id = secrets.token_urlsafe(12)  # kept for every later run
+        st.query_params["u"] = st.session_state.user_id
+        st.session_state.seed = secrets.randbits(32)
+        st.session_state.scores = ScoreAccumulator(BANK)
+        st.session_state.quality = QualityTracker(BANK)
         st.session_state.idx = 0
-        st.session_state.stage = "questions"
-        st.rerun()
-
-# ──────────────────────────────────────────────────────────────
-# Questions Stage (25 questions) — starts here
-# ──────────────────────────────────────────────────────────────
-0
-
-# ──────────────────────────────────────────────────────────────
-# Scoring & Analysis Functions
-# ──────────────────────────────────────────────────────────────
-  # Calculate final means (rounded to 3 decimals)
-    means = {}
-    for var in sums:
-        if total_weights[var] > 0:
-            means[var] = round(sums[vafrom collections import defaultdict
-
-def compute_scores(questions, answers):
-    """
-    Computes weighted subscale means, raw item scores, and detailed scoring info.
-    Skips invalid/missing answers silently.
-    
-    Returns:
-        dict with keys:
-        - 'means':       {variable: weighted_mean_score}
-        - 'raw_scores':  {variable: [list of individual 0-4 scores]}
-        - 'items':       list of (var, score, weight, question_dict, original_answer)
-    """
-    sums = defaultdict(float)          # weighted sum
-    total_weights = defaultdict(float) # sum of weights per variable
-    raw_scores = defaultdict(list)     # unweighted item scores (0-4)
-    items = []
-
-    for q in questions:
-        qid = q["id"]
-        if qid not in answers:
-            continue
-
-        # Safe integer conversion
-        try:
-            a = int(answers[qid])
-            if not (0 <= a <= 4):
-                continue  # or log warning
-        except (ValueError, TypeError):
-            continue  # skip bad data (empty string, float, None, text...)
-
-        # Apply reverse scoring if needed
-        score = (4 - a) if q.get("reverse", False) else a
-
-        var = q["variable"]
-        w = float(q.get("weight", 1.0))
-
-        sums[var] += score * w
-        total_weights[var] += w
-        raw_scores[var].append(score)
-
-        items.append((var, score, w, q, a))
-
-    # Calculate final means (rounded to 3 decimals)
-    means = {}
-    for var in sums:
-        if total_weights[var] > 0:
-            means[var] = round(sums[var] / total_weights[var], 3)
-        else:
-            means[var] = None
-
-    return {
-        "means": means,
-        "raw_scores": dict(raw_scores),
-        "items": items
-    }from collections import defaultdict
-
-def compute_scores(questions, answers):
-    """
-    Computes weighted subscale means, raw item scores, and detailed scoring info.
-    Skips invalid/missing answers silently.
-    
-    Returns:
-        dict with keys:
-        - 'means':       {variable: weighted_mean_score}
-        - 'raw_scores':  {variable: [list of individual 0-4 scores]}
-        - 'items':       list of (var, score, weight, question_dict, original_answer)
-    """
-    sums = defaultdict(float)          # weighted sum
-    total_weights = defaultdict(float) # sum of weights per variable
-    raw_scores = defaultdict(list)     # unweighted item scores (0-4)
-    items = []
-
-    for q in questions:
-        qid = q["id"]
-        if qid not in answers:
-            continue
-
-        # Safe integer conversion
-        try:
-            a = int(answers[qid])
-            if not (0 <= a <= 4):
-                continue  # or log warning
-        except (ValueError, TypeError):
-            continue  # skip bad data (empty string, float, None, text...)
-
-        # Apply reverse scoring if needed
-        score = (4 - a) if q.get("reverse", False) else a
-
-        var = q["variable"]
-        w = float(q.get("weight", 1.0))
 
-        sums[var] += score * w
-        total_weights[var] += w
-        raw_scores[var].append(score)
-
-        items.append((var, score, w, q, a))
-
-    # Calculate final means (rounded to 3 decimals)
-    means = {}
-    for var in sums:
-        if total_weights[var] > 0:
-            means[var] = round(sums[var] / total_weights[var], 3)
+        if combined:
+            # One run across every lens: interleaved questions, scored per lens and pooled
+            st.session_state.scores = CombinedScores(BANK, LENSES)
+            st.session_state.active_questions = QuestionList(
+                BANK, pick_combined_questions(BANK, LENSES, seed=st.session_state.seed)
+            )
+            st.session_state.stage = "questions"
+        elif st.session_state.adaptive:
+            session = AdaptiveSession(BANK, lens, scores=st.session_state.scores, seed=st.session_state.seed)
+            st.session_state.adaptive_session = session
+            session.next_question()
+            st.session_state.active_questions = session.asked  # grows as questions are asked
+            st.session_state.stage = "adaptive"
         else:
-            means[var] = None
-
-    return {
-        "means": means,
-        "raw_scores": dict(raw_scores),
-        "items": items
-    }r] / total_weights[var], 3)
-        else:
-            means[var] = None
-
-    return {
-        "means": means,
-        "raw_scores": dict(raw_scores),
-        "items": items
-    }
-        
-
-    # Overall weighted score
-    overall_num = overall_den = 0.0
-    for var, info in per_variable.items():
-        w = VARIABLE_WEIGHTS.get(var, 1.0)
-        overall_num += info["pct"] * w
-        overall_den += w
-
-    overall = (overall_num / overall_den) if overall_den > 0 else 0.0
-
-    scored_items.sort(key=lambda x: (x[1], -x[2]))  # lowest first, then heaviest
-
-    return overall, per_variable, scored_items
+            # Random sample of 25 (or all if fewer)
+            st.session_state.active_questions = QuestionList(
+                BANK, pick_initial_questions(BANK, lens, seed=st.session_state.seed)
+            )
+            st.session_state.stage = "questions"
+        save_session()
+        st.rerun()
 
 
-def choose_followup_targets(per_variable):
-    if not per_variable:
-        return []
+if st.session_state.stage == "setup":
+    setup_page()
 
-    sorted_vars = sorted(per_variable.items(), key=lambda x: x[1]["pct"])
-    weakest = sorted_vars[0][0]
+# ──────────────────────────────────────────────────────────────
+# Adaptive Questions (stops once every zone is stable)
+# ──────────────────────────────────────────────────────────────
 
-    reds = [v for v, d in per_variable.items() if d["zone"] == "RED" and v != weakest]
-    yellows = [v for v, d in per_variable.items() if d["zone"] == "YELLOW" and v != weakest]
+def answer_adaptive(q):
+    """Next-button callback: record the answer and queue the next question."""
+    ss = st.session_state
+    record_answer(q, ss[f"ad_{q['id']}"])
+    if ss.adaptive_session.next_question() is None:
+        ss.stage = "final_results"
+        save_session()
+
+
+@st.fragment
+@timed("render.adaptive")
+def adaptive_step():
+    # Clicks rerun only this fragment; finishing needs the whole page.
+    count_rerun("adaptive_step")
+    if st.session_state.stage != "adaptive":
+        st.rerun()
 
-    targets = [weakest] + reds[:2]
+    q = st.session_state.active_questions[-1]
 
-    if len(targets) < 3:
-        for v in yellows:
-            if v not in targets:
-                targets.append(v)
-            if len(targets) >= 3:
-                break
+    st.subheader(f"Question {len(st.session_state.active_questions)}")
+    st.caption("Adaptive mode — finishes as soon as every area is clear")
 
-    return targets[:3]
+    st.write(f"**{q['text']}**")
+    st.caption(question_caption(q))
 
+    st.radio(
+        "Select:",
+        options=list(SCALE_LABELS.keys()),
+        format_func=lambda x: SCALE_LABELS[x],
+        index=2,
+        key=f"ad_{q['id']}",
+        horizontal=True,
+    )
 
-def pick_followup_questions(lens, targets, already_asked_ids, n=10):
-    bank = QUESTION_BANK.get(lens, [])[:]
+    st.button("Next →", type="primary", on_click=answer_adaptive, args=(q,))
 
-    # Priority: targeted variables, not asked yet
-    priority = [q for q in bank if q["id"] not in already_asked_ids and q["variable"] in targets]
-    random.shuffle(priority)
-    selected = priority[:n]
 
-    # Fill with any not asked
-    if len(selected) < n:
-        remaining = [q for q in bank if q["id"] not in already_asked_ids and q not in selected]
-        random.shuffle(remaining)
-        selected.extend(remaining[:n - len(selected)])
+if st.session_state.stage == "adaptive":
+    adaptive_step()
 
-    # Last resort: anything
-    if len(selected) < n:
-        all_remaining = [q for q in bank if q not in selected]
-        random.shuffle(all_remaining)
-        selected.extend(all_remaining[:n - len(selected)])
+# ──────────────────────────────────────────────────────────────
+# Questions Stage (25 questions, one form per page)
+# ──────────────────────────────────────────────────────────────
 
-    return selected[:n]
+def submit_page(page, step):
+    """Form callback: record every answer on the page, then move ``step`` pages."""
+    ss = st.session_state
+    for q in page:
+        record_answer(q, ss[f"q_{q['id']}"])
+    ss.idx = max(0, ss.idx + step * PAGE_SIZE)
+    if ss.idx >= len(ss.active_questions):
+        ss.stage = "results"
+    save_session()
+    prefetch_followups()
+
+
+@st.fragment
+@timed("render.questions")
+def question_page():
+    # A page is answered in one submit; only leaving the stage reruns the whole app.
+    count_rerun("question_page")
+    if st.session_state.stage != "questions":
+        st.rerun()
 
+    questions = st.session_state.active_questions
+    total = len(questions)
+    start = st.session_state.idx
+    page = questions[start:start + PAGE_SIZE]
+    last_page = start + PAGE_SIZE >= total
+
+    st.subheader(f"Questions {start+1}–{start+len(page)} of {total}")
+    st.caption("Tab and the arrow keys move between answers; Enter on a button submits the page")
+    st.progress(start / total)
+
+    with st.form(f"page_{start}", border=False):
+        for q in page:
+            st.write(f"**{q['text']}**")
+            current = st.session_state.scores.get(q["id"])
+            st.radio(
+                question_caption(q),
+                options=list(SCALE_LABELS.keys()),
+                format_func=lambda x: SCALE_LABELS[x],
+                index=list(SCALE_LABELS.keys()).index(current) if current is not None else 2,
+                key=f"q_{q['id']}",
+                horizontal=True,
+            )
+
+        col1, col2 = st.columns([1, 3])
+        with col1:
+            st.form_submit_button("← Back", disabled=(start == 0), on_click=submit_page, args=(page, -1))
+        with col2:
+            st.form_submit_button(
+                "See Results" if last_page else "Next →",
+                type="primary",
+                on_click=submit_page,
+                args=(page, 1),
+            )
+
+
+if st.session_state.stage == "questions":
+    question_page()
 
 # ──────────────────────────────────────────────────────────────
 # Results Screen (after 25 questions)
 # ──────────────────────────────────────────────────────────────
 
-if st.session_state.stage == "results":
+def lens_matrix(summary):
+    """Variable × lens table of a combined run, with the pooled score last."""
+    def cell(info):
+        return "—" if info is None else f"{info['pct']:.0f} · {info['zone']}"
+
+    st.markdown("### Variable × Lens")
+    rows = [
+        {"Variable": var, **{lens: cell(info) for lens, info in by_lens.items()},
+         "All lenses": cell(summary["per_variable"].get(var))}
+        for var, by_lens in summary["matrix"].items()
+    ]
+    rows.append({"Variable": "Overall", **{
+        lens: f"{summary['lens_overall'][lens]:.0f}" if lens in summary["lens_overall"] else "—"
+        for lens in LENSES
+    }, "All lenses": f"{summary['overall']:.0f}"})
+    st.dataframe(rows, hide_index=True)
+
+
+@timed("render.results")
+def results_page():
     lens = st.session_state.lens
     questions = st.session_state.active_questions
-    answers = st.session_state.answers
-
-    overall, per_var, scored_sorted = compute_scores(questions, answers)
-    targets = choose_followup_targets(per_var)
+    summary = result_summary(lens, st.session_state.scores)
+    per_var = summary["per_variable"]
 
     st.subheader("Diagnostic Results")
     st.write(f"**Lens:** {lens}")
-    st.write(f"**Focus:** {lens_focus(lens)}")
-    st.metric("Overall Pressure Score", f"{overall:.0f}/100")
+    st.write(f"**Focus:** {TEXT.lens_focus(lens)}")
+    st.metric("Overall Pressure Score", f"{summary['overall']:.0f}/100")
+
+    POPULATION.sync(STORE, min_interval=POPULATION_SYNC_SECONDS)
+
+    if summary["matrix"]:
+        lens_matrix(summary)
 
     st.markdown("### Category Breakdown")
-    for var, info in per_var.items():
-        label = variable_translation(lens, var)
+    for var, label, zone_text in summary["breakdown"]:
+        info = per_var[var]
         st.write(
-            f"- **{label}**: {info['pct']:.0f}  —  {zone_message(info['zone'])}  "
-            f"(volatility: {info['volatility']:.0f})"
+            f"- **{label}**: {info['pct']:.0f}  —  {zone_text}  "
+            f"(volatility: {info['volatility']:.0f}){percentile_note(lens, var, info['pct'])}"
         )
 
-    if per_var:
-        weakest_var = min(per_var.items(), key=lambda x: x[1]["pct"])[0]
-        weakest_label = variable_translation(lens, weakest_var)
-
-        st.markdown(f"**Main Pressure Point:** {weakest_label}")
-        st.write(pressure_focus_summary(lens, weakest_label))
+    weakest = summary["weakest"]
+    if weakest:
+        st.markdown(f"**Main Pressure Point:** {weakest['label']}")
+        st.write(weakest["summary"])
 
         st.markdown("**Strongest signals (lowest 3)**")
-        for _, score, weight, q, _ in scored_sorted[:3]:
-            st.write(f"- {q['text']}  (score: {score}/4)")
+        for line in weakest["signals"]:
+            st.write(line)
 
         # Recommended first action
-        weakest_items = [t for t in scored_sorted if t[0] == weakest_var]
-        if weakest_items:
-            first_lever = weakest_items[0][3]  # already sorted lowest first
+        if weakest["first_move"]:
             st.markdown("**Recommended first move:**")
-            st.write(f"→ {first_lever['text']}")
+            st.write(weakest["first_move"])
 
     st.divider()
 
+    n_followups = FOLLOWUPS_PER_LENS * len(LENSES) if lens == COMBINED_LENS else FOLLOWUPS
+    prefetch_followups()  # no-op when already prefetched; covers runs restored onto this page
+
     col1, col2 = st.columns([2, 1])
     with col1:
-        if st.button("Continue → 10 Targeted Follow-ups", type="primary"):
-            already = {q["id"] for q in questions}
-            followups = pick_followup_questions(lens, targets, already, n=10)
-            st.session_state.followup_questions = followups
-            st.session_state.followup_answers = {}
+        if st.button(f"Continue → {n_followups} Targeted Follow-ups", type="primary"):
+            ss = st.session_state
+            answers = ss.scores.answers()
+            picked = PREFETCH.take(ss.session_id, lens, questions, answers, ss.seed)
+            followups, targets = picked or select_followups(BANK, lens, questions, answers, ss.seed)
+            st.session_state.followup_questions = QuestionList(BANK, followups)
             st.session_state.followup_idx = 0
             st.session_state.followup_targets = targets
             st.session_state.stage = "followups"
+            save_session()
             st.rerun()
 
     with col2:
         if st.button("Start Over (same lens)"):
             st.session_state.stage = "setup"
+            save_session()
             st.rerun()
 
 
+if st.session_state.stage == "results":
+    results_page()
+
 # ──────────────────────────────────────────────────────────────
 # Follow-up Questions (10 targeted)
 # ──────────────────────────────────────────────────────────────
 
-if st.session_state.stage == "followups":
+def go_to_followup(i):
+    st.session_state.followup_idx = i
+
+
+def answer_followup(q, key):
+    """Radio callback: record a follow-up answer when the respondent changes it."""
+    record_answer(q, st.session_state[key])
+
+
+@st.fragment
+@timed("render.followups")
+def followup_step():
+    # Answering and Back/Next rerun only this fragment, not the whole page.
+    count_rerun("followup_step")
     fqs = st.session_state.followup_questions
     idx = st.session_state.followup_idx
     total = len(fqs)
 
-    if total == 0:
-        st.error("No follow-up questions available.")
-        st.stop()
-
     st.subheader(f"Follow-up Questions  ({idx+1}/{total})")
     st.caption("Digging deeper into weakest areas")
 
@@ -625,72 +665,146 @@ if st.session_state.stage == "followups":
 
     q = fqs[idx]
     st.write(f"**{q['text']}**")
-    st.caption(variable_translation(st.session_state.lens, q["variable"]))
+    st.caption(question_caption(q))
 
-    key = f"fu_{q['id']}_{idx}"
-    current = st.session_state.followup_answers.get(key)
+    current = st.session_state.scores.get(q["id"])
+    if current is None:
+        # The preselected answer counts as given; later changes arrive through on_change.
+        current = 2
+        record_answer(q, current)
 
-    choice = st.radio(
+    key = f"fu_{q['id']}_{idx}"
+    st.radio(
         "Select:",
         options=list(SCALE_LABELS.keys()),
         format_func=lambda x: SCALE_LABELS[x],
-        index=list(SCALE_LABELS.keys()).index(current) if current is not None else 2,
+        index=list(SCALE_LABELS.keys()).index(current),
         key=key,
         horizontal=True,
+        on_change=answer_followup,
+        args=(q, key),
     )
 
-    st.session_state.followup_answers[key] = choice
-
     col1, col2, col3 = st.columns([1,1,2])
     with col1:
-        if st.button("← Back", disabled=(idx == 0)):
-            st.session_state.followup_idx = max(0, idx - 1)
-            st.rerun()
+        st.button("← Back", disabled=(idx == 0), on_click=go_to_followup, args=(max(0, idx - 1),))
 
     with col2:
-        if st.button("Next →", disabled=(idx >= total - 1)):
-            st.session_state.followup_idx = min(total - 1, idx + 1)
-            st.rerun()
+        st.button("Next →", disabled=(idx >= total - 1), on_click=go_to_followup, args=(min(total - 1, idx + 1),))
 
     with col3:
         if st.button("Finish & See Updated Results", type="primary"):
             st.session_state.stage = "final_results"
+            save_session()
             st.rerun()
 
 
+if st.session_state.stage == "followups":
+    if not st.session_state.followup_questions:
+        st.error("No follow-up questions available.")
+        st.stop()
+
+    followup_step()
+
+
 # ──────────────────────────────────────────────────────────────
 # Final Results (25 + 10 follow-ups)
 # ──────────────────────────────────────────────────────────────
 
-if st.session_state.stage == "final_results":
-    all_questions = st.session_state.active_questions + st.session_state.followup_questions
-    all_answers = st.session_state.answers.copy()
+def trend_panel(lens):
+    """Change since earlier runs of this lens, from the stored trend (no re-scoring)."""
+    user = st.session_state.user_id
+    trend = STORE.trend(user, lens) if user else None
+    if trend is None or trend.runs < 2:
+        return
 
-    for key, val in st.session_state.followup_answers.items():
-        qid = key.split("_")[1]  # extract qid from fu_{qid}_{idx}
-        all_answers[qid] = val
+    st.markdown(f"### Your Trend ({trend.runs} runs)")
+    overall = trend.overall
+    st.metric("Overall vs last run", f"{overall.pct:.0f}/100", delta=f"{overall.delta:+.0f}")
 
-    overall, per_var, scored_sorted = compute_scores(all_questions, all_answers)
+    rows = []
+    for var, vt in trend.variables.items():
+        if var == OVERALL:
+            continue
+        rows.append({
+            "Area": TEXT.variable_translation(lens, var),
+            "Now": f"{vt.pct:.0f} · {vt.zone}",
+            "Since last": "—" if vt.delta is None else f"{vt.delta:+.0f}",
+            "Per run": f"{vt.slope:+.1f}",
+            "Zone changes": ", ".join(f"run {run}: {a} → {b}" for run, a, b in vt.transitions[-3:]) or "—",
+        })
+    st.dataframe(rows, hide_index=True)
+
+    runs = STORE.history(user, lens, since=time.time() - HISTORY_DAYS * 86400)
+    if len(runs) > 1:
+        st.line_chart(
+            [{TEXT.variable_translation(lens, var): info["pct"] for var, info in per_var.items()}
+             for _, _, per_var in runs],
+            y_label="Score",
+        )
+
+
+@st.fragment
+def export_panel(lens):
+    # Changing the format reruns only this panel.
+    count_rerun("export_panel")
+    token = st.session_state.session_id
+    col1, col2 = st.columns([1, 2], vertical_alignment="bottom")
+    with col1:
+        fmt = st.selectbox("Export format", list(FORMATS), key="export_format")
+    with col2:
+        st.download_button(
+            "Download items & scores",
+            export_bytes(session_records(token, lens, st.session_state.scores), fmt),
+            file_name=f"trifactor-{token}.{fmt}",
+            mime=FORMATS[fmt],
+        )
+
+
+@timed("render.final_results")
+def final_results_page():
+    lens = st.session_state.lens
+    summary = result_summary(lens, st.session_state.scores)
+    per_var = summary["per_variable"]
+
+    if st.session_state.adaptive_session is not None:
+        st.subheader(f"Results ({len(st.session_state.scores)} adaptive questions)")
+    elif lens == COMBINED_LENS:
+        n, n_followups = len(st.session_state.active_questions), len(st.session_state.followup_questions)
+        st.subheader(f"Updated Results ({n} + {n_followups} follow-ups, all lenses)")
+    else:
+        st.subheader("Updated Results (25 + 10 follow-ups)")
+    st.metric("Overall Pressure Score", f"{summary['overall']:.0f}/100")
+
+    POPULATION.sync(STORE, min_interval=POPULATION_SYNC_SECONDS)
 
-    st.subheader("Updated Results (25 + 10 follow-ups)")
-    st.metric("Overall Pressure Score", f"{overall:.0f}/100")
+    if summary["matrix"]:
+        lens_matrix(summary)
 
     st.markdown("### Category Breakdown (updated)")
-    for var, info in sorted(per_var.items(), key=lambda x: x[1]["pct"]):
-        label = variable_translation(st.session_state.lens, var)
+    for var, label, zone_text in sorted(summary["breakdown"], key=lambda x: per_var[x[0]]["pct"]):
         st.write(
-            f"- **{label}**: {info['pct']:.0f}  —  {zone_message(info['zone'])}"
+            f"- **{label}**: {per_var[var]['pct']:.0f}  —  {zone_text}"
+            f"{percentile_note(lens, var, per_var[var]['pct'])}"
         )
 
-    if per_var:
-        weakest_var = min(per_var.items(), key=lambda x: x[1]["pct"])[0]
-        weakest_label = variable_translation(st.session_state.lens, weakest_var)
-        st.markdown(f"**Primary Pressure Point:** {weakest_label}")
-        st.write(pressure_focus_summary(st.session_state.lens, weakest_label))
+    weakest = summary["weakest"]
+    if weakest:
+        st.markdown(f"**Primary Pressure Point:** {weakest['label']}")
+        st.write(weakest["summary"])
+
+    trend_panel(lens)
+    export_panel(lens)
 
     st.divider()
     st.caption("This is still just a map — not a treatment plan.")
 
     if st.button("Run Again (same lens)", type="primary"):
         st.session_state.stage = "setup"
+        save_session()
+        st.session_state.adaptive_session = None
         st.rerun()
+
+
+if st.session_state.stage == "final_results":
+    final_results_page()
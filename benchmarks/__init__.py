@@ -0,0 +1 @@
+"""Benchmarks and simulations; run from the repo root, e.g. ``python -m benchmarks.adaptive``."""
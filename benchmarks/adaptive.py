@@ -0,0 +1,95 @@
+"""Adaptive flow vs the fixed 25 + 10 flow on simulated respondents.
+
+Reports, per lens, the mean number of questions asked and how often each
+flow puts a variable in the same zone as the respondent's latent level.
+Then compares one combined all-lens run against one fixed run per lens:
+questions per respondent and zone accuracy of the variable × lens cells.
+
+    python -m benchmarks.adaptive [--respondents 2000] [--noise 0.8] [--confidence 0.8]
+"""
+
+import argparse
+import random
+from statistics import mean
+
+from benchmarks.respondents import make_respondents
+from trifactor import choose_followup_targets, compute_scores, load_bank
+from trifactor import pick_followup_questions, pick_initial_questions
+from trifactor.adaptive import AdaptiveSession
+from trifactor.combined import CombinedScores, pick_combined_followups, pick_combined_questions
+
+
+def run_fixed(bank, lens, person, rng):
+    questions = pick_initial_questions(bank, lens, rng=rng)
+    answers = {q["id"]: person.answer(q) for q in questions}
+    _, per_var, _ = compute_scores(questions, answers)
+    targets = choose_followup_targets(per_var)
+    followups = pick_followup_questions(bank, lens, targets, answers.keys(), per_variable=per_var, rng=rng)
+    answers.update((q["id"], person.answer(q)) for q in followups)
+    _, per_var, _ = compute_scores(questions + followups, answers)
+    return len(answers), per_var
+
+
+def run_adaptive(bank, lens, person, rng, confidence):
+    session = AdaptiveSession(bank, lens, confidence=confidence, rng=rng)
+    while (q := session.next_question()) is not None:
+        session.answer(q, person.answer(q))
+    return len(session.asked), session.scores.per_variable()
+
+
+def run_combined(bank, person, rng):
+    scores = CombinedScores(bank)
+    for q in pick_combined_questions(bank, rng=rng):
+        scores.set(q, person.answer(q))
+    followups, _ = pick_combined_followups(bank, scores, scores.answers().keys(), rng=rng)
+    for q in followups:
+        scores.set(q, person.answer(q))
+    return len(scores), scores.matrix(), scores.per_variable()
+
+
+def zone_hits(person, per_var):
+    return [info["zone"] == person.true_zone(var) for var, info in per_var.items()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--respondents", type=int, default=2000)
+    parser.add_argument("--noise", type=float, default=0.8)
+    parser.add_argument("--confidence", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    bank = load_bank()
+    rng = random.Random(args.seed)
+    print(f"{'lens':<14}{'fixed n':>9}{'adaptive n':>12}{'saved':>8}{'fixed zone%':>13}{'adaptive zone%':>16}")
+    for lens in bank.lenses:
+        fixed_n, adapt_n, fixed_hits, adapt_hits = [], [], [], []
+        for person in make_respondents(args.respondents, args.seed, args.noise):
+            n, per_var = run_fixed(bank, lens, person, rng)
+            fixed_n.append(n)
+            fixed_hits += zone_hits(person, per_var)
+            n, per_var = run_adaptive(bank, lens, person, rng, args.confidence)
+            adapt_n.append(n)
+            adapt_hits += zone_hits(person, per_var)
+        f, a = mean(fixed_n), mean(adapt_n)
+        print(f"{lens:<14}{f:>9.1f}{a:>12.1f}{1 - a / f:>8.0%}"
+              f"{mean(fixed_hits):>13.1%}{mean(adapt_hits):>16.1%}")
+
+    three_n, three_hits, comb_n, comb_hits, pooled_hits = [], [], [], [], []
+    for person in make_respondents(args.respondents, args.seed, args.noise):
+        runs = [run_fixed(bank, lens, person, rng) for lens in bank.lenses]
+        three_n.append(sum(n for n, _ in runs))
+        three_hits += [hit for _, per_var in runs for hit in zone_hits(person, per_var)]
+        n, matrix, per_var = run_combined(bank, person, rng)
+        comb_n.append(n)
+        comb_hits += [info["zone"] == person.true_zone(var)
+                      for var, by_lens in matrix.items() for info in by_lens.values() if info]
+        pooled_hits += zone_hits(person, per_var)
+    print()
+    print(f"{'all lenses':<14}{'questions':>11}{'cell zone%':>12}{'pooled zone%':>14}")
+    print(f"{'one run each':<14}{mean(three_n):>11.1f}{mean(three_hits):>12.1%}{'':>14}")
+    print(f"{'combined':<14}{mean(comb_n):>11.1f}{mean(comb_hits):>12.1%}{mean(pooled_hits):>14.1%}")
+
+
+if __name__ == "__main__":
+    main()
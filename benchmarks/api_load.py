@@ -0,0 +1,219 @@
+"""Local load client for the JSON API (``trifactor.api``).
+
+Starts the API in a subprocess (or targets ``--url``). Then ``--concurrency``
+simulated users at a time run ``--sessions`` full diagnostics, each over one
+keep-alive connection. A session starts, fetches its questions, answers
+them in pages of ``PAGE_SIZE``, reads results, takes the follow-ups,
+answers them and finishes. Synthetic respondents supply the answers.
+
+With ``--pipeline`` a user sends each stage's answer pages back to back
+and then reads the responses, instead of waiting for each one in turn
+(HTTP/1.1 pipelining).
+
+Reported:
+- sessions and requests per second;
+- latency per round trip (a pipelined batch counts as one);
+- server CPU per session, from the server's own process clock via
+  ``/health``. This is the figure to set against the app's script CPU
+  per click (``benchmarks.load``) times the ~17 clicks of a session.
+
+    python -m benchmarks.api_load [--sessions 500] [--concurrency 50] [--pipeline] [--combined]
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+from benchmarks.respondents import make_respondents
+from benchmarks.scoring import percentile
+from trifactor.api import PAGE_SIZE
+from trifactor.bank import load_bank
+from trifactor.combined import COMBINED_LENS
+
+LENSES = ["Interpersonal", "Financial", "Big Picture"]
+
+
+class Connection:
+    """Minimal keep-alive HTTP/1.1 JSON client; ``pipeline`` sends several requests before reading."""
+
+    def __init__(self, host, port):
+        self.host, self.port = host, port
+        self.reader = self.writer = None
+
+    async def open(self):
+        self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+    def _send(self, method, path, body=None):
+        data = b"" if body is None else json.dumps(body).encode("utf-8")
+        self.writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1") + data
+        )
+
+    async def _receive(self):
+        head = await self.reader.readuntil(b"\r\n\r\n")
+        status = int(head.split(b" ", 2)[1])
+        length = next(
+            int(line.split(b":", 1)[1]) for line in head.split(b"\r\n") if line.lower().startswith(b"content-length:")
+        )
+        payload = json.loads(await self.reader.readexactly(length))
+        if status >= 400:
+            raise RuntimeError(f"HTTP {status}: {payload.get('error')}")
+        return payload
+
+    async def request(self, method, path, body=None):
+        self._send(method, path, body)
+        await self.writer.drain()
+        return await self._receive()
+
+    async def pipeline(self, requests):
+        for method, path, body in requests:
+            self._send(method, path, body)
+        await self.writer.drain()
+        return [await self._receive() for _ in requests]
+
+    async def close(self):
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def run_session(conn, person, bank, lens, pipeline, latencies):
+    async def timed(call):
+        t = time.perf_counter()
+        result = await call
+        latencies.append(time.perf_counter() - t)
+        return result
+
+    def pages(sid, questions):
+        return [
+            ("POST", f"/sessions/{sid}/answers",
+             {"answers": {q["id"]: person.answer(bank.by_id[q["id"]]) for q in questions[i:i + PAGE_SIZE]}})
+            for i in range(0, len(questions), PAGE_SIZE)
+        ]
+
+    async def answer_all(sid, questions):
+        if pipeline:
+            return (await timed(conn.pipeline(pages(sid, questions))))[-1]
+        for req in pages(sid, questions):
+            last = await timed(conn.request(*req))
+        return last
+
+    started = await timed(conn.request("POST", "/sessions", {"lens": lens}))
+    sid = started["session"]
+    listed = await timed(conn.request("GET", f"/sessions/{sid}/questions?n=100"))
+    status = await answer_all(sid, listed["questions"])
+    assert status["stage"] == "results", status["stage"]
+    if pipeline:
+        _, follow = await timed(conn.pipeline([
+            ("GET", f"/sessions/{sid}/results", None), ("POST", f"/sessions/{sid}/followups", None),
+        ]))
+    else:
+        await timed(conn.request("GET", f"/sessions/{sid}/results"))
+        follow = await timed(conn.request("POST", f"/sessions/{sid}/followups"))
+    if follow["questions"]:
+        await answer_all(sid, follow["questions"])
+    final = await timed(conn.request("GET", f"/sessions/{sid}/results"))
+    assert final["stage"] == "final_results", final["stage"]
+
+
+async def drive(args, host, port):
+    bank = load_bank()
+    rng = random.Random(args.seed)
+    people = list(make_respondents(args.sessions, args.seed, args.noise))
+    lenses = [COMBINED_LENS] if args.combined else LENSES
+    jobs = asyncio.Queue()
+    for person in people:
+        jobs.put_nowait((person, rng.choice(lenses)))
+
+    latencies, errors, done = [], [], 0
+
+    async def user():
+        nonlocal done
+        while not jobs.empty():
+            person, lens = jobs.get_nowait()
+            conn = Connection(host, port)
+            try:
+                await conn.open()
+                await run_session(conn, person, bank, lens, args.pipeline, latencies)
+                done += 1
+            except Exception as exc:  # reported, not fatal to the run
+                errors.append(exc)
+            finally:
+                if conn.writer is not None:
+                    await conn.close()
+
+    probe = Connection(host, port)
+    await probe.open()
+    cpu_before = (await probe.request("GET", "/health"))["cpu_seconds"]
+    start = time.perf_counter()
+    await asyncio.gather(*(user() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - start
+    cpu = (await probe.request("GET", "/health"))["cpu_seconds"] - cpu_before
+    await probe.close()
+
+    for exc in errors[:5]:
+        print(f"session error: {exc}", file=sys.stderr)
+    latencies.sort()
+    print(f"sessions {args.sessions}  completed {done}  errors {len(errors)}  "
+          f"{done / elapsed:.1f} sessions/s  {len(latencies) / elapsed:.0f} round trips/s"
+          f"{'  (pipelined)' if args.pipeline else ''}")
+    print(f"{'round trip':<14}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    print(f"{'wall':<14}" + "".join(f"{percentile(latencies, q) * 1e3:>9.2f}" for q in (0.5, 0.95, 0.99)))
+    print(f"server cpu per session {cpu / max(done, 1) * 1e3:.2f} ms")
+    return 1 if errors else 0
+
+
+async def wait_ready(host, port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            conn = Connection(host, port)
+            await conn.open()
+            await conn.request("GET", "/health")
+            await conn.close()
+            return
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            await asyncio.sleep(0.1)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50, help="users in flight at once")
+    parser.add_argument("--pipeline", action="store_true", help="send each stage's answer pages pipelined")
+    parser.add_argument("--combined", action="store_true", help="every session runs all lenses at once")
+    parser.add_argument("--url", help="use a running API instead of starting one")
+    parser.add_argument("--port", type=int, default=8766, help="port for the API this run starts")
+    parser.add_argument("--store", default="memory://", help="store URL for the API this run starts")
+    parser.add_argument("--noise", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.url:
+        url = urlsplit(args.url)
+        host, port = url.hostname, url.port
+    else:
+        host, port = "127.0.0.1", args.port
+        server = subprocess.Popen(
+            [sys.executable, "-m", "trifactor.api", "--port", str(port), "--store", args.store],
+            stderr=subprocess.DEVNULL,
+        )
+    try:
+        asyncio.run(wait_ready(host, port))
+        return asyncio.run(drive(args, host, port))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,131 @@
+"""Headless multi-session load generator for App.py.
+
+Drives ``--sessions`` simulated users through the full app with
+``streamlit.testing``. The flow runs setup, the paged questions, results,
+the follow-ups and final results. ``--adaptive`` runs the adaptive flow
+instead, and ``--combined`` one run across every lens. Synthetic
+respondents supply the answers. Sessions advance round-robin, one click
+each, so they interleave the way concurrent users do. They share the
+process-wide bank, store and population caches.
+
+Reported per click:
+- wall-clock latency, which includes the test harness;
+- script CPU, the time spent executing the page. Script compilation is
+  left out, because a live server caches the bytecode.
+
+Also reported: sessions completed, clicks per second, and errors.
+
+    python -m benchmarks.load [--sessions 20] [--adaptive | --combined] [--store memory://]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+from benchmarks.render_cost import APP, button, script_cpu
+from benchmarks.respondents import make_respondents
+from benchmarks.scoring import percentile
+from trifactor.combined import COMBINED_LENS
+
+
+class SimulatedUser:
+    """One app session plus the respondent answering it; ``step()`` performs a single click."""
+
+    def __init__(self, person, lens, adaptive):
+        from streamlit.testing.v1 import AppTest
+
+        self.person = person
+        self.lens = lens
+        self.adaptive = adaptive
+        self.at = AppTest.from_file(APP, default_timeout=30)
+        self.started = False
+        self.done = False
+
+    def step(self):
+        at = self.at
+        if not self.started:
+            self.started = True
+            at.run()
+            at.radio[0].set_value(self.lens)
+            at.toggle[0].set_value(self.adaptive).run()  # the toggle relabels the Start button
+            button(at, "Start").click().run()
+            return
+
+        ss = at.session_state
+        stage = ss.stage
+        if stage == "questions":
+            start = ss.idx
+            for q in ss.active_questions[start:start + len(at.radio)]:
+                at.radio(key=f"q_{q['id']}").set_value(self.person.answer(q))
+            labels = {b.label for b in at.button}
+            button(at, "See Results" if "See Results" in labels else "Next").click().run()
+        elif stage == "adaptive":
+            q = ss.active_questions[-1]
+            at.radio(key=f"ad_{q['id']}").set_value(self.person.answer(q))
+            button(at, "Next").click().run()
+        elif stage == "results":
+            button(at, "Continue").click().run()
+        elif stage == "followups":
+            idx, fqs = ss.followup_idx, ss.followup_questions
+            q = fqs[idx]
+            at.radio(key=f"fu_{q['id']}_{idx}").set_value(self.person.answer(q))
+            button(at, "Next" if idx < len(fqs) - 1 else "Finish").click().run()
+        else:
+            raise RuntimeError(f"stuck in stage {stage!r}")
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        self.done = at.session_state.stage == "final_results"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--adaptive", action="store_true")
+    mode.add_argument("--combined", action="store_true", help="every session runs all lenses at once")
+    parser.add_argument("--store", default="memory://", help="session store URL (TRIFACTOR_STORE)")
+    parser.add_argument("--noise", type=float, default=0.8)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    os.environ["TRIFACTOR_STORE"] = args.store
+    lenses = [COMBINED_LENS] if args.combined else ["Interpersonal", "Financial", "Big Picture"]
+    rng = random.Random(args.seed)
+    users = [
+        SimulatedUser(person, rng.choice(lenses), args.adaptive)
+        for person in make_respondents(args.sessions, args.seed, args.noise)
+    ]
+
+    wall, cpu, errors = [], [], 0
+    start = time.perf_counter()
+    with script_cpu(cpu):
+        active = list(users)
+        while active:
+            for user in list(active):
+                t = time.perf_counter()
+                try:
+                    user.step()
+                except Exception as exc:  # a failed session is reported, not fatal to the run
+                    errors += 1
+                    print(f"session error: {exc}", file=sys.stderr)
+                    user.done = True
+                wall.append(time.perf_counter() - t)
+                if user.done:
+                    active.remove(user)
+    elapsed = time.perf_counter() - start
+
+    wall.sort()
+    cpu.sort()
+    completed = sum(u.at.session_state.stage == "final_results" for u in users)
+    print(f"sessions {args.sessions}  completed {completed}  errors {errors}  "
+          f"clicks {len(wall)}  {len(wall) / elapsed:.1f} clicks/s")
+    print(f"{'per click':<14}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+    for name, values in (("wall", wall), ("script cpu", cpu)):
+        print(f"{name:<14}" + "".join(f"{percentile(values, q) * 1e3:>9.2f}" for q in (0.5, 0.95, 0.99)))
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
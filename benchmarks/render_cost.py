@@ -0,0 +1,118 @@
+"""Server CPU per click: full-script reruns vs fragment-scoped reruns.
+
+Drives App.py headlessly (``streamlit.testing``) to the follow-up stage and
+times answer + Next clicks two ways: as a full script rerun (what every
+click cost before the question stages became fragments) and as a rerun of
+only the follow-up fragment (what a browser click triggers now). Times are
+script-thread CPU spent executing the page, which leaves out the harness and
+script compilation (a live server caches the bytecode; the test harness
+recompiles on every run).
+
+    python -m benchmarks.render_cost [--clicks 200]
+"""
+
+import argparse
+import functools
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from statistics import mean, median
+
+APP = str(Path(__file__).resolve().parent.parent / "App.py")
+
+
+def button(at, label):
+    return next(b for b in at.button if b.label.startswith(label))
+
+
+def followup_app():
+    """An AppTest parked on the first follow-up question."""
+    from streamlit.testing.v1 import AppTest
+
+    from trifactor.accumulator import ScoreAccumulator
+
+    at = AppTest.from_file(APP, default_timeout=30).run()
+    button(at, "Start 25").click().run()
+    questions = at.session_state.active_questions
+    answers = {q["id"]: 1 for q in questions}
+    at.session_state.scores = ScoreAccumulator.from_answers(questions.bank, questions, answers)
+    at.session_state.stage = "results"
+    at.run()
+    button(at, "Continue").click().run()
+    return at
+
+
+@contextmanager
+def script_cpu(costs):
+    """Append the CPU seconds spent executing the script (or fragment) on every run to ``costs``."""
+    from streamlit.runtime.scriptrunner import script_runner
+
+    exec_func = script_runner.exec_func_with_error_handling
+
+    def timed(func, ctx):
+        start = time.thread_time()
+        try:
+            return exec_func(func, ctx)
+        finally:
+            costs.append(time.thread_time() - start)
+
+    script_runner.exec_func_with_error_handling = timed
+    try:
+        yield
+    finally:
+        script_runner.exec_func_with_error_handling = exec_func
+
+
+@contextmanager
+def fragment_reruns(at):
+    """Make the test runner rerun only the app's fragments, as the browser does for clicks inside one."""
+    from streamlit.runtime.scriptrunner_utils.script_requests import RerunData
+    from streamlit.testing.v1 import local_script_runner
+
+    fragment_ids = list(at._fragment_storage._fragments)
+    local_script_runner.RerunData = functools.partial(RerunData, fragment_id_queue=fragment_ids)
+    try:
+        yield
+    finally:
+        local_script_runner.RerunData = RerunData
+
+
+def click_costs(at, clicks):
+    """Script CPU seconds per click, alternating an answer with Next / Back through the follow-ups."""
+    costs = []
+    forward = True
+    with script_cpu(costs):
+        for i in range(clicks):
+            if i % 2:
+                idx, last = at.session_state.followup_idx, len(at.session_state.followup_questions) - 1
+                forward = idx < last if forward else idx == 0
+                button(at, "Next" if forward else "← Back").click().run()
+            else:
+                at.radio[0].set_value(i % 5).run()
+            if at.exception:
+                raise RuntimeError(at.exception[0].value)
+    return costs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clicks", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("TRIFACTOR_STORE", "memory://")
+    print(f"{'rerun':<10}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}")
+    for mode in ("full", "fragment"):
+        at = followup_app()
+        if mode == "fragment":
+            with fragment_reruns(at):
+                costs = click_costs(at, args.clicks)
+        else:
+            costs = click_costs(at, args.clicks)
+        costs.sort()
+        p95 = costs[int(0.95 * (len(costs) - 1))]
+        print(f"{mode:<10}{mean(costs) * 1e3:>10.2f}{median(costs) * 1e3:>10.2f}{p95 * 1e3:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Synthetic respondents with a latent level per variable.
+
+A respondent's level for a variable is its true item score on the 0–4 scale
+(after reverse scoring). Each answer is that level plus Gaussian noise,
+rounded and clipped, then un-reversed for reverse-scored items, so the
+scorer sees exactly what a person clicking the radio would produce.
+"""
+
+import random
+
+from trifactor.bank import VARIABLES
+from trifactor.scoring import zone_name
+
+
+class Respondent:
+    def __init__(self, levels: dict, noise=0.8, rng=random):
+        self.levels = levels
+        self.noise = noise
+        self.rng = rng
+
+    def answer(self, q) -> int:
+        score = round(self.levels[q["variable"]] + self.rng.gauss(0, self.noise))
+        score = max(0, min(4, score))
+        return 4 - score if q.get("reverse", False) else score
+
+    def true_pct(self, var) -> float:
+        return self.levels[var] / 4 * 100
+
+    def true_zone(self, var) -> str:
+        return zone_name(self.true_pct(var))
+
+
+def make_respondents(n, seed=0, noise=0.8, levels=None, variables=VARIABLES):
+    """``n`` respondents; ``levels`` fixes some variables' levels, the rest are uniform on 0–4."""
+    rng = random.Random(seed)
+    for _ in range(n):
+        lv = {var: rng.uniform(0, 4) for var in variables}
+        lv.update(levels or {})
+        yield Respondent(lv, noise, rng)
@@ -0,0 +1,166 @@
+"""Throughput, latency and allocations of the scoring and selection hot paths.
+
+Every synthetic respondent answers a fixed 25-question draw. Each function
+then runs on that respondent's inputs: ``compute_scores`` on the answers,
+``choose_followup_targets`` on the resulting per-variable scores, and
+``pick_followup_questions`` on the targets. Reported per function:
+
+- calls per second
+- p50/p95/p99 latency, in microseconds
+- peak bytes allocated during one call (tracemalloc, measured in a separate pass)
+- memory blocks still held by the call's result
+
+Pass ``--json`` to save a run and ``--baseline`` to fail (exit 1) when any
+function's throughput drops more than ``--tolerance`` below the saved run.
+
+    python -m benchmarks.scoring [--respondents 5000] [--level Clarity=1.0] [--baseline bench.json]
+"""
+
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from benchmarks.respondents import make_respondents
+from trifactor import choose_followup_targets, compute_scores, load_bank
+from trifactor import pick_followup_questions, pick_initial_questions
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def make_cases(bank, lens, respondents, seed):
+    """Per respondent: the questions, answers, per-variable scores, targets and already-asked ids."""
+    rng = random.Random(seed)
+    cases = []
+    for person in respondents:
+        questions = pick_initial_questions(bank, lens, rng=rng)
+        answers = {q["id"]: person.answer(q) for q in questions}
+        _, per_var, _ = compute_scores(questions, answers)
+        cases.append((questions, answers, per_var, choose_followup_targets(per_var), set(answers)))
+    return cases
+
+
+def workloads(bank, lens, seed):
+    """``name -> fn(case)`` for every benchmarked function."""
+    rng = random.Random(seed)
+    return {
+        "compute_scores": lambda c: compute_scores(c[0], c[1]),
+        "choose_followup_targets": lambda c: choose_followup_targets(c[2]),
+        "pick_followup_questions": lambda c: pick_followup_questions(
+            bank, lens, c[3], c[4], n=10, rng=rng, per_variable=c[2]
+        ),
+    }
+
+
+def measure(fn, cases):
+    """Latency (ns) of every call, plus totals; garbage collection is paused while timing."""
+    gc.collect()
+    gc.disable()
+    try:
+        latencies = []
+        clock = time.perf_counter_ns
+        start = clock()
+        for case in cases:
+            t = clock()
+            fn(case)
+            latencies.append(clock() - t)
+        elapsed = clock() - start
+    finally:
+        gc.enable()
+    latencies.sort()
+    return {
+        "calls_per_s": len(cases) / (elapsed / 1e9),
+        "p50_us": percentile(latencies, 0.50) / 1e3,
+        "p95_us": percentile(latencies, 0.95) / 1e3,
+        "p99_us": percentile(latencies, 0.99) / 1e3,
+    }
+
+
+def allocations(fn, cases, sample=500):
+    """Mean peak bytes allocated per call and mean blocks retained by the result."""
+    cases = cases[:sample]
+    peaks, blocks = [], []
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        for case in cases:
+            before = sys.getallocatedblocks()
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            result = fn(case)
+            peaks.append(tracemalloc.get_traced_memory()[1] - current)
+            blocks.append(sys.getallocatedblocks() - before)
+            del result
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+    return {"peak_bytes": sum(peaks) / len(peaks), "result_blocks": sum(blocks) / len(blocks)}
+
+
+def run(bank, lens, respondents, seed, noise, levels):
+    people = list(make_respondents(respondents, seed, noise, levels))
+    cases = make_cases(bank, lens, people, seed)
+    report = {}
+    for name, fn in workloads(bank, lens, seed).items():
+        measure(fn, cases[:200])  # warm caches (alias tables, bytecode specialisation)
+        report[name] = {**measure(fn, cases), **allocations(fn, cases)}
+    return report
+
+
+def regressions(report, baseline, tolerance):
+    """Names of functions whose throughput fell more than ``tolerance`` below ``baseline``."""
+    return [
+        name for name, row in report.items()
+        if name in baseline and row["calls_per_s"] < baseline[name]["calls_per_s"] * (1 - tolerance)
+    ]
+
+
+def parse_level(text):
+    var, _, level = text.partition("=")
+    return var, float(level)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--respondents", type=int, default=5000)
+    parser.add_argument("--lens", default="Interpersonal")
+    parser.add_argument("--noise", type=float, default=0.8)
+    parser.add_argument("--level", type=parse_level, action="append", default=[],
+                        metavar="VAR=LEVEL", help="fix a variable's latent level (0–4) for every respondent")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="report from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args(argv)
+
+    bank = load_bank()
+    report = run(bank, args.lens, args.respondents, args.seed, args.noise, dict(args.level))
+
+    print(f"{'function':<26}{'calls/s':>11}{'p50 µs':>9}{'p95 µs':>9}{'p99 µs':>9}{'peak B':>9}{'blocks':>8}")
+    for name, row in report.items():
+        print(f"{name:<26}{row['calls_per_s']:>11,.0f}{row['p50_us']:>9.1f}{row['p95_us']:>9.1f}"
+              f"{row['p99_us']:>9.1f}{row['peak_bytes']:>9.0f}{row['result_blocks']:>8.1f}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            slower = regressions(report, json.load(f), args.tolerance)
+        for name in slower:
+            print(f"REGRESSION: {name} throughput more than {args.tolerance:.0%} below baseline", file=sys.stderr)
+        return 1 if slower else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+"""Per-session memory held in Streamlit session state.
+
+Drives one fixed and one adaptive session of App.py to their final results,
+then measures the deep size of every app-owned session-state value. Objects
+shared by all sessions (the compiled bank and its question records) are not
+counted, since they are paid for once per process.
+
+    python -m benchmarks.session_memory
+"""
+
+import os
+import sys
+
+from benchmarks.load import SimulatedUser
+from benchmarks.respondents import make_respondents
+from trifactor import load_bank
+
+APP_KEYS = (
+    "session_id", "user_id", "stage", "lens", "active_questions", "idx", "followup_questions",
+    "followup_idx", "followup_targets", "seed", "adaptive", "adaptive_session", "scores",
+    "quality",
+)
+
+
+def deep_size(obj, shared, seen):
+    """Bytes reachable from ``obj``, skipping ``shared`` objects and anything already in ``seen``."""
+    if id(obj) in seen or shared(obj):
+        return 0
+    seen.add(id(obj))
+    n = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        n += sum(deep_size(k, shared, seen) + deep_size(v, shared, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        n += sum(deep_size(x, shared, seen) for x in obj)
+    else:
+        if hasattr(obj, "__dict__"):
+            n += deep_size(obj.__dict__, shared, seen)
+        for cls in type(obj).__mro__:
+            for slot in getattr(cls, "__slots__", ()):
+                if hasattr(obj, slot):
+                    n += deep_size(getattr(obj, slot), shared, seen)
+    return n
+
+
+def shared_objects(bank):
+    """Predicate for process-wide objects a session may reference without owning.
+
+    The app compiles its own bank instance, so its question records and
+    their ids and variable names are recognised by content rather than
+    identity. Small ints are interpreter-wide singletons.
+    """
+    from trifactor.bank import CompiledBank
+
+    names = set(bank.by_id) | {var for _, var in bank.buckets} | set(bank.lenses)
+
+    def shared(obj):
+        if isinstance(obj, (bool, CompiledBank)) or obj is None:
+            return True
+        if isinstance(obj, int):
+            return -5 <= obj <= 256
+        if isinstance(obj, str):
+            return obj in names
+        return isinstance(obj, dict) and "id" in obj and bank.by_id.get(obj["id"]) == obj
+    return shared
+
+
+def session_bytes(at, shared) -> dict:
+    seen = set()
+    ss = at.session_state
+    return {key: deep_size(ss[key], shared, seen) for key in APP_KEYS if key in ss}
+
+
+def main(argv=None):
+    os.environ.setdefault("TRIFACTOR_STORE", "memory://")
+    shared = shared_objects(load_bank())
+    people = make_respondents(2, seed=0)
+    for adaptive, person in zip((False, True), people):
+        user = SimulatedUser(person, "Interpersonal", adaptive)
+        while not user.done:
+            user.step()
+        sizes = session_bytes(user.at, shared)
+        print(f"{'adaptive' if adaptive else 'fixed'} session: {sum(sizes.values()):,} bytes")
+        for key, n in sorted(sizes.items(), key=lambda x: -x[1]):
+            if n > 200:
+                print(f"    {key:<20}{n:>8,}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1 @@
+"""Makes the repo root importable for ``pytest`` run without ``python -m``."""
@@ -0,0 +1,84 @@
+"""Adaptive runs: stopping once every zone is stable, and resuming from stored answers."""
+
+import random
+
+import pytest
+
+from trifactor.adaptive import MIN_ITEMS, AdaptiveSession
+from trifactor.bank import load_bank
+from trifactor.scoring import zone_name
+
+LENS = "Interpersonal"  # the lens with every variable
+
+
+@pytest.fixture(scope="module")
+def bank():
+    return load_bank()
+
+
+def clear(q):
+    """The best answer on every item: one that scores 100."""
+    return 0 if q.get("reverse") else 4
+
+
+def run(session, answer):
+    while (q := session.next_question()) is not None:
+        session.answer(q, answer(q))
+    return session
+
+
+def test_clear_answers_stop_early_with_every_zone_stable(bank):
+    session = run(AdaptiveSession(bank, LENS, seed=1), clear)
+    variables = bank.variables(LENS)
+    assert len(session.asked) == MIN_ITEMS * len(variables)
+    for var in variables:
+        assert session.is_stable(var)
+        pct, half = session.interval(var)
+        assert zone_name(pct - half) == zone_name(pct + half) == "GREEN"
+
+
+def test_answers_near_a_cutoff_need_more_items(bank):
+    rng = random.Random(3)
+    mixed = run(AdaptiveSession(bank, LENS, seed=1), lambda q: rng.choice((1, 2, 3)))
+    assert len(mixed.asked) > MIN_ITEMS * len(bank.variables(LENS))
+
+
+def test_max_items_caps_the_run(bank):
+    rng = random.Random(0)
+    session = run(AdaptiveSession(bank, LENS, seed=1, max_items=7), lambda q: rng.randrange(5))
+    assert len(session.asked) == 7
+    assert session.done
+
+
+def test_one_answer_is_never_stable(bank):
+    session = AdaptiveSession(bank, LENS, seed=1)
+    q = session.next_question()
+    assert session.interval(q["variable"]) == (None, float("inf"))
+    session.answer(q, clear(q))
+    assert not session.is_stable(q["variable"])
+    assert session.margin(q["variable"]) == -1.0
+
+
+def test_heaviest_items_are_asked_first(bank):
+    session = AdaptiveSession(bank, LENS, seed=1)
+    first = session.next_question()
+    assert first["weight"] == max(q["weight"] for q in bank.bucket(LENS, first["variable"]))
+
+
+def test_resume_replays_the_same_questions(bank):
+    rng = random.Random(5)
+    live = AdaptiveSession(bank, LENS, seed=9)
+    answers = {}
+    for _ in range(8):
+        q = live.next_question()
+        answers[q["id"]] = rng.randrange(5)
+        live.answer(q, answers[q["id"]])
+    current = live.next_question()
+
+    resumed = AdaptiveSession(bank, LENS, seed=9)
+    assert resumed.resume(answers) == current
+    assert resumed.asked.ids() == live.asked.ids()
+    assert resumed.scores.answers() == live.scores.answers()
+
+    finished = run(AdaptiveSession(bank, LENS, seed=9), clear)
+    assert AdaptiveSession(bank, LENS, seed=9).resume(finished.scores.answers()) is None
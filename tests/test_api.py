@@ -0,0 +1,182 @@
+"""The JSON API's handlers, routing and HTTP framing, run against an in-memory store."""
+
+import asyncio
+import json
+import socket
+
+import pytest
+
+from trifactor.api import ApiError, DiagnosticService, dispatch, serve
+from trifactor.bank import load_bank
+from trifactor.combined import COMBINED_LENS
+from trifactor.storage import MemoryStore
+
+
+@pytest.fixture(scope="module")
+def bank():
+    return load_bank()
+
+
+@pytest.fixture
+def service(bank):
+    service = DiagnosticService(bank, MemoryStore(bank))
+    yield service
+    service.prefetch.close()
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def answer_all(service, token, value=2):
+    """Answer every question of the current stage; returns the last answer response."""
+    listed = await service.questions(token, n=1000)
+    return await service.answer(token, {"answers": {q["id"]: value for q in listed["questions"]}})
+
+
+@pytest.mark.parametrize("body, message", [
+    ({"lens": "Nope"}, "lens must be one of"),
+    ({"lens": COMBINED_LENS, "adaptive": True}, "adaptive runs follow a single lens"),
+    ({"lens": "Financial", "user": 7}, "user must be a string"),
+])
+def test_start_rejects_bad_requests(service, body, message):
+    with pytest.raises(ApiError, match=message) as e:
+        run(service.start(body))
+    assert e.value.status == 400
+
+
+def test_fixed_run_from_start_to_final_results(service):
+    async def flow():
+        started = await service.start({"lens": "Interpersonal", "user": "alice"})
+        token = started["session"]
+        assert started["stage"] == "questions" and started["remaining"] > 0
+
+        with pytest.raises(ApiError) as e:
+            await service.results(token)
+        assert e.value.status == 409
+
+        reply = await service.answer(token, {"answers": {"x99": 2, "bad": "often"}})
+        assert reply["accepted"] == [] and set(reply["rejected"]) == {"x99", "bad"}
+
+        reply = await answer_all(service, token)
+        assert reply["stage"] == "results" and reply["remaining"] == 0
+        followups = await service.followups(token)
+        assert followups["stage"] == "followups" and followups["targets"]
+        final = await service.finish(token)
+        return token, final
+
+    token, final = run(flow())
+    assert final["stage"] == "final_results"
+    assert 0 <= final["overall"] <= 100
+    assert "straight_lining" in final["quality"]  # every answer was 2
+    assert service.store.load_session(token)["user"] == "alice"
+    assert service.store.trend("alice", "Interpersonal") is not None
+    assert list(service.store.results_since(0)) == []  # flagged results stay out of population data
+
+
+def test_session_reloads_from_the_store(bank, service):
+    async def start_and_answer():
+        token = (await service.start({"lens": "Financial"}))["session"]
+        listed = await service.questions(token, n=3)
+        await service.answer(token, {"answers": {q["id"]: i for i, q in enumerate(listed["questions"])}})
+        return token, listed["questions"]
+
+    token, answered = run(start_and_answer())
+    fresh = DiagnosticService(bank, service.store)  # a restarted server sharing the store
+    try:
+        status = run(fresh.status(token))
+        assert status["answered"] == 3 and status["stage"] == "questions"
+        remaining = run(fresh.questions(token, n=1000))["questions"]
+        assert not {q["id"] for q in answered} & {q["id"] for q in remaining}
+        with pytest.raises(ApiError) as e:
+            run(fresh.status("unknown"))
+        assert e.value.status == 404
+    finally:
+        fresh.prefetch.close()
+
+
+def test_adaptive_run_finishes_on_its_own(service):
+    async def flow():
+        token = (await service.start({"lens": "Financial", "adaptive": True}))["session"]
+        for _ in range(200):
+            listed = await service.questions(token)
+            if not listed["questions"]:
+                break
+            q = listed["questions"][0]
+            assert len(listed["questions"]) == 1
+            await service.answer(token, {"answers": {q["id"]: 3 if q["variable"] == "Baseline" else 1}})
+        return await service.results(token)
+
+    result = run(flow())
+    assert result["mode"] == "adaptive" and result["stage"] == "final_results"
+
+
+def test_dispatch_routes_and_errors(service):
+    async def flow():
+        status, started = await dispatch(service, "POST", "/sessions", b'{"lens": "Financial"}')
+        assert status == 201
+        token = started["session"]
+        status, listed = await dispatch(service, "GET", f"/sessions/{token}/questions?n=2", b"")
+        assert status == 200 and len(listed["questions"]) == 2
+        for method, target, body, code in [
+            ("GET", "/sessions", b"", 405),
+            ("GET", "/nowhere", b"", 404),
+            ("DELETE", f"/sessions/{token}", b"", 405),
+            ("POST", f"/sessions/{token}/answers", b"[1]", 400),
+            ("GET", f"/sessions/{token}/questions?n=x", b"", 400),
+        ]:
+            with pytest.raises(ApiError) as e:
+                await dispatch(service, method, target, body)
+            assert e.value.status == code, target
+
+    run(flow())
+
+
+def test_pipelined_requests_are_answered_in_order(service):
+    async def flow():
+        ready, stop, port = asyncio.Event(), asyncio.Event(), free_port()
+        server = asyncio.create_task(serve(service, port=port, ready=ready, stop=stop))
+        await ready.wait()
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        body = b'{"lens": "Financial"}'
+        writer.write(
+            b"GET /health HTTP/1.1\r\n\r\n"
+            b"POST /sessions HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s" % (len(body), body)
+            + b"GET /nowhere HTTP/1.1\r\nConnection: close\r\n\r\n"
+        )
+        raw = await reader.read()
+        writer.close()
+        stop.set()
+        await server
+        return raw
+
+    responses = run(flow()).split(b"HTTP/1.1 ")[1:]
+    assert [r.split(b" ", 1)[0] for r in responses] == [b"200", b"201", b"404"]
+    assert json.loads(responses[1].split(b"\r\n\r\n", 1)[1])["stage"] == "questions"
+
+
+@pytest.mark.parametrize("configured, authorization, status", [
+    ("", None, 401),
+    ("", "Bearer ", 401),
+    ("s3cret", None, 401),
+    ("s3cret", "Bearer wrong", 401),
+    ("s3cret", "Basic s3cret", 401),
+    ("s3cret", "Bearer s3cret", 200),
+])
+def test_metrics_need_the_admin_token(service, monkeypatch, configured, authorization, status):
+    monkeypatch.setenv("TRIFACTOR_ADMIN_TOKEN", configured)
+    headers = {} if authorization is None else {"authorization": authorization}
+
+    async def scrape():
+        try:
+            return (await dispatch(service, "GET", "/metrics", b"", headers))[0]
+        except ApiError as e:
+            return e.status
+
+    assert run(scrape()) == status
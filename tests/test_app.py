@@ -0,0 +1,99 @@
+"""The Streamlit app, driven headlessly through ``AppTest``."""
+
+import asyncio
+from pathlib import Path
+
+import pytest
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+from trifactor.api import DiagnosticService
+from trifactor.bank import load_bank
+from trifactor.storage import open_store
+
+APP = str(Path(__file__).resolve().parent.parent / "App.py")
+
+
+@pytest.fixture
+def store_url(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'sessions.db'}"
+    monkeypatch.setenv("TRIFACTOR_STORE", url)
+    st.cache_resource.clear()  # the app's store is a cached resource; open the one for this test
+    yield url
+    st.cache_resource.clear()
+
+
+def button(at, label):
+    return next(b for b in at.button if b.label.startswith(label))
+
+
+def test_resumed_api_session_keeps_its_user(store_url):
+    bank = load_bank()
+    store = open_store(store_url, bank)
+    service = DiagnosticService(bank, store)
+
+    async def answer_initial_questions():
+        started = await service.start({"lens": "Interpersonal", "user": "alice"})
+        token = started["session"]
+        listed = await service.questions(token, n=100)
+        await service.answer(token, {"answers": {q["id"]: 2 for q in listed["questions"]}})
+        return token
+
+    token = asyncio.run(answer_initial_questions())
+    service.prefetch.close()
+    store.close()
+
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.query_params["s"] = token
+    at.run()
+    assert at.session_state.stage == "results"
+    assert at.session_state.user_id == "alice"
+    assert at.query_params["u"] == "alice"
+
+    button(at, "Continue").click().run()
+    button(at, "Finish").click().run()
+    assert at.session_state.stage == "final_results"
+    assert not at.exception
+
+    store = open_store(store_url, bank)
+    try:
+        assert store.load_session(token)["user"] == "alice"
+        assert store.trend("alice", "Interpersonal") is not None
+    finally:
+        store.close()
+
+
+def test_followup_answers_are_recorded_on_change(store_url):
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.run()
+    at.radio[0].set_value("Interpersonal")
+    button(at, "Start").click().run()
+    while at.session_state.stage == "questions":
+        labels = [b.label for b in at.button]
+        button(at, "See Results" if "See Results" in labels else "Next").click().run()
+    button(at, "Continue").click().run()
+    ss = at.session_state
+    assert ss.stage == "followups"
+    first = ss.followup_questions[0]["id"]
+    answered = len(ss.scores)
+    assert ss.scores.get(first) == 2  # the preselected answer counts
+
+    radio = f"fu_{first}_0"
+    at.radio(key=radio).set_value(4).run()
+    assert at.session_state.scores.get(first) == 4
+    button(at, "Next").click().run()
+    button(at, "← Back").click().run()
+    assert at.radio(key=radio).value == 4
+    assert at.session_state.scores.get(first) == 4
+    assert len(at.session_state.quality) == len(at.session_state.scores) == answered + 1
+    assert not at.exception
+
+
+@pytest.mark.parametrize("given, shown", [("s3cret", True), ("wrong", False)])
+def test_all_sessions_export_is_admin_only(store_url, monkeypatch, given, shown):
+    monkeypatch.setenv("TRIFACTOR_ADMIN_TOKEN", "s3cret")
+    at = AppTest.from_file(APP, default_timeout=60)
+    at.query_params["admin"] = given
+    at.run()
+    assert ("download_button" in [el.type for el in at.sidebar]) is shown
+    assert not at.exception
@@ -0,0 +1,166 @@
+"""Bank files: validation, the formats they come in, and the binary snapshot."""
+
+import csv
+import json
+import os
+
+import pytest
+
+from trifactor.bank import (
+    DEFAULT_BANK_PATH, FIELDS, BankError, BankSnapshot, load_bank, read_bank_file, read_synonyms,
+    snapshot_path, synonyms_path, validate_bank, write_snapshot,
+)
+
+
+@pytest.fixture(scope="module")
+def raw():
+    return read_bank_file(DEFAULT_BANK_PATH)
+
+
+@pytest.fixture
+def source(tmp_path, raw):
+    path = tmp_path / "questions.json"
+    path.write_text(json.dumps(raw), encoding="utf-8")
+    return path
+
+
+def question(**fields):
+    return {"id": "q1", "text": "Often?", "variable": "Baseline", "weight": 1.0, "reverse": False, **fields}
+
+
+def test_shipped_bank_is_valid(raw):
+    assert validate_bank(raw) == []
+
+
+@pytest.mark.parametrize("bank, problem", [
+    ([], "bank must map lens names to lists of questions"),
+    ({"L": {}}, "L: expected a list of questions"),
+    ({"L": ["q"]}, "L[0]: expected an object"),
+    ({"L": [question(id="")]}, "L[0]: id must be a non-empty string"),
+    ({"L": [question()], "M": [question()]}, "M/q1: duplicate id (also in L)"),
+    ({"L": [{"id": "q1"}]}, "L/q1: missing text, variable, weight, reverse"),
+    ({"L": [question(extra=1)]}, "L/q1: unknown field(s) extra"),
+    ({"L": [question(text=" ")]}, "L/q1: text must be a non-empty string"),
+    ({"L": [question(variable="Mood")]}, "L/q1: unknown variable 'Mood'"),
+    ({"L": [question(weight=True)]}, "L/q1: weight must be a number, got True"),
+    ({"L": [question(weight=3)]}, "L/q1: weight 3 outside 0.5–2.0"),
+    ({"L": [question(reverse="yes")]}, "L/q1: reverse must be true/false, got 'yes'"),
+])
+def test_validate_bank_names_each_problem(bank, problem):
+    assert problem in validate_bank(bank)
+
+
+def test_toml_and_csv_read_like_json(tmp_path, raw):
+    small = {lens: qs[:3] for lens, qs in raw.items()}
+
+    csv_path = tmp_path / "bank.csv"
+    with csv_path.open("w", encoding="utf-8", newline="") as f:
+        writer = csv.DictWriter(f, ["lens", *FIELDS])
+        writer.writeheader()
+        for lens, qs in small.items():
+            writer.writerows({"lens": lens, **q} for q in qs)
+
+    toml_path = tmp_path / "bank.toml"
+    toml_path.write_text("".join(
+        f'[[{json.dumps(lens)}]]\nid = "{q["id"]}"\ntext = {json.dumps(q["text"])}\n'
+        f'variable = "{q["variable"]}"\nweight = {float(q["weight"])}\nreverse = {str(q["reverse"]).lower()}\n'
+        for lens, qs in small.items() for q in qs
+    ), encoding="utf-8")
+
+    expected = {lens: [{**q, "weight": float(q["weight"])} for q in qs] for lens, qs in small.items()}
+    assert read_bank_file(csv_path) == expected
+    assert read_bank_file(toml_path) == expected
+    with pytest.raises(BankError, match="unsupported bank format"):
+        read_bank_file(tmp_path / "bank.yaml")
+
+
+def test_invalid_file_lists_every_problem(tmp_path):
+    path = tmp_path / "bad.json"
+    path.write_text(json.dumps({"L": [question(weight=9), question(id="q2", variable="Mood")]}))
+    with pytest.raises(BankError) as e:
+        load_bank(path)
+    assert [p.split(": ", 1)[1] for p in e.value.problems] == ["L/q1: weight 9 outside 0.5–2.0", "L/q2: unknown variable 'Mood'"]
+
+
+def test_snapshot_round_trips_the_bank(tmp_path, source):
+    bank = load_bank(source, use_snapshot=False)
+    path = tmp_path / "bank.qbank"
+    write_snapshot(bank, path, source.stat())
+
+    with BankSnapshot(path) as snapshot:
+        assert snapshot.version == bank.version
+        assert snapshot.is_fresh(source)
+        raw = snapshot.to_bank()
+    assert raw == read_bank_file(source)  # plain objects, valid after the file is closed
+    with pytest.raises(ValueError):
+        snapshot.to_bank()
+
+
+def test_load_bank_writes_and_reuses_its_snapshot(source, monkeypatch):
+    first = load_bank(source)
+    snap = snapshot_path(source)
+    assert snap.exists()
+
+    def unparsed(path):
+        raise AssertionError("a fresh snapshot skips parsing the source")
+
+    monkeypatch.setattr("trifactor.bank.read_bank_file", unparsed)
+    os.utime(snap, ns=(0, 0))  # the snapshot's own mtime is not what freshness checks
+    again = load_bank(source)
+    assert again.version == first.version and again.layout == first.layout
+    assert again.by_lens.keys() == first.by_lens.keys()
+
+
+def test_stale_or_corrupt_snapshot_is_rebuilt(source, raw):
+    load_bank(source)
+    snap = snapshot_path(source)
+
+    edited = {lens: [dict(q) for q in qs] for lens, qs in raw.items()}
+    first = next(iter(edited))
+    edited[first][0]["text"] = "Edited text?"
+    source.write_text(json.dumps(edited), encoding="utf-8")
+    assert load_bank(source).questions(first)[0]["text"] == "Edited text?"
+    assert BankSnapshot(snap).is_fresh(source)
+
+    snap.write_bytes(b"not a snapshot")
+    assert load_bank(source).questions(first)[0]["text"] == "Edited text?"
+    assert BankSnapshot(snap).is_fresh(source)
+
+
+def test_weights_file_changes_version_not_layout(tmp_path, source):
+    base = load_bank(source)
+    qid = base.by_lens[base.lenses[0]][0]["id"]
+    weights = tmp_path / "weights.json"
+    weights.write_text(json.dumps({qid: 1.75}))
+
+    weighted = load_bank(source, weights=weights)
+    assert weighted.by_id[qid]["weight"] == 1.75
+    assert weighted.layout == base.layout
+    assert weighted.version != base.version and weighted.base_version == base.version
+
+    weights.write_text(json.dumps({"nope": 1.0, qid: 5}))
+    with pytest.raises(BankError) as e:
+        load_bank(source, weights=weights)
+    assert "weights: unknown question id 'nope'" in e.value.problems
+
+
+def test_synonyms_file_sits_beside_the_bank(source):
+    assert load_bank(source).synonyms == {}  # none written for this copy
+    synonyms_path(source).write_text(json.dumps({"money": ["cash", "funds"]}))
+    assert load_bank(source).synonyms == {"cash": "money", "funds": "money"}
+    assert load_bank(source, use_snapshot=False).synonyms == {"cash": "money", "funds": "money"}
+    assert load_bank().synonyms["bracing"] == "brace"  # the shipped bank's curated list
+
+
+@pytest.mark.parametrize("groups, problem", [
+    (["cash"], "expected an object mapping a term to the words folded onto it"),
+    ({"money": "cash"}, "money: expected a list of lower-case words"),
+    ({"money": ["Cash"]}, "money: expected a list of lower-case words"),
+    ({"money": ["cash"], "pay": ["cash"]}, "'cash' is listed under both 'money' and 'pay'"),
+])
+def test_bad_synonyms_file_is_rejected(tmp_path, groups, problem):
+    path = tmp_path / "bank.synonyms.json"
+    path.write_text(json.dumps(groups))
+    with pytest.raises(BankError) as e:
+        read_synonyms(path)
+    assert e.value.problems == [f"{path}: {problem}"]
@@ -0,0 +1,67 @@
+"""Result cache: content-addressed keys, LRU eviction and expiry."""
+
+from trifactor import scoring
+from trifactor.cache import ResultCache, fingerprint
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_fingerprint_depends_on_content_not_order():
+    key = fingerprint("v1", "Financial", {"f01": 3, "f02": 1})
+    assert fingerprint("v1", "Financial", [("f02", 1), ("f01", 3)]) == key
+    assert fingerprint("v2", "Financial", {"f01": 3, "f02": 1}) != key
+    assert fingerprint("v1", "Interpersonal", {"f01": 3, "f02": 1}) != key
+    assert fingerprint("v1", "Financial", {"f01": 3, "f02": 2}) != key
+    assert fingerprint("v1", "Financial", {"f01": 3}) != key
+
+
+def test_fingerprint_changes_with_variable_weights(monkeypatch):
+    key = fingerprint("v1", "Financial", {"f01": 3})
+    monkeypatch.setitem(scoring.VARIABLE_WEIGHTS, "Baseline", scoring.VARIABLE_WEIGHTS["Baseline"] + 1)
+    assert fingerprint("v1", "Financial", {"f01": 3}) != key
+
+
+def test_get_or_compute_counts_hits_and_misses():
+    cache = ResultCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"overall": 50.0}
+
+    assert cache.get("k") is None
+    first = cache.get_or_compute("k", compute)
+    assert cache.get_or_compute("k", compute) is first
+    assert (cache.hits, cache.misses, len(calls)) == (1, 1, 1)
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+    assert (cache.get("a"), cache.get("b"), cache.get("c")) == (1, None, 3)
+    assert len(cache) == 2
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = ResultCache(ttl=10, clock=clock)
+    cache.put("a", 1)
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    clock.now = 10.0
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+    cache.put("a", 2)
+    cache.clear()
+    assert cache.get("a") is None
+
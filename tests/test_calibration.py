@@ -0,0 +1,103 @@
+"""Item analysis: correlations from running sums, weak items, suggested weights, incremental sync."""
+
+import random
+import statistics
+
+import pytest
+
+from trifactor.bank import WEIGHT_RANGE, load_bank
+from trifactor.calibration import MIN_RESPONSES, WEAK_ITEM, ItemAnalysis, correlation
+from trifactor.storage import MemoryStore
+
+LENS, VARIABLE = "Interpersonal", "Execution"
+
+
+@pytest.fixture(scope="module")
+def bank():
+    return load_bank()
+
+
+@pytest.fixture(scope="module")
+def bucket(bank):
+    return bank.bucket(LENS, VARIABLE)
+
+
+def respondent(bucket, rng, noisy):
+    """Answers driven by one trait, except ``noisy``, which is answered at random."""
+    trait = rng.uniform(0, 4)
+    answers = {}
+    for q in bucket:
+        x = rng.randrange(5) if q["id"] == noisy else min(4, max(0, round(trait + rng.gauss(0, 0.5))))
+        answers[q["id"]] = 4 - x if q.get("reverse") else x
+    return answers
+
+
+@pytest.fixture(scope="module")
+def analysis(bank, bucket):
+    rng = random.Random(0)
+    ia = ItemAnalysis(bank)
+    for _ in range(400):
+        ia.add_session(respondent(bucket, rng, noisy=bucket[0]["id"]))
+    return ia
+
+
+def test_correlation_matches_statistics():
+    rng = random.Random(1)
+    xs = [rng.random() for _ in range(50)]
+    ys = [x + rng.random() for x in xs]
+    sums = (len(xs), sum(xs), sum(ys), sum(x * x for x in xs), sum(y * y for y in ys),
+            sum(x * y for x, y in zip(xs, ys)))
+    assert correlation(*sums) == pytest.approx(statistics.correlation(xs, ys))
+    assert correlation(3, 3, 6, 3, 14, 6) is None  # x never varies
+    assert correlation(1, 1, 1, 1, 1, 1) is None
+
+
+def test_random_item_is_flagged_and_down_weighted(analysis, bucket):
+    report = analysis.variable_report(LENS, VARIABLE)
+    items = {it["qid"]: it for it in report["items"]}
+    noisy, steady = items[bucket[0]["id"]], [items[q["id"]] for q in bucket[1:]]
+
+    assert noisy["item_rest"] < WEAK_ITEM
+    assert all(it["item_rest"] > 0.7 for it in steady)
+    assert report["alpha"] > 0.9
+    assert report["sessions"] == 400 and report["items_per_session"] == len(bucket)
+
+    lo, hi = WEIGHT_RANGE
+    assert noisy["suggested"] == lo
+    assert all(lo <= it["suggested"] <= hi for it in steady)
+    assert min(it["suggested"] for it in steady) > noisy["suggested"]
+
+
+def test_items_with_few_responses_keep_their_weight(bank, bucket):
+    rng = random.Random(2)
+    ia = ItemAnalysis(bank)
+    for _ in range(MIN_RESPONSES - 1):
+        ia.add_session(respondent(bucket, rng, noisy=bucket[0]["id"]))
+    assert ia.suggested_weights() == {}
+
+
+def test_state_round_trips_through_json(bank, analysis):
+    restored = ItemAnalysis.from_json(bank, analysis.to_json())
+    assert restored.report() == analysis.report()
+    assert restored.suggested_weights() == analysis.suggested_weights()
+
+
+def test_sync_folds_in_each_clean_result_once(bank, bucket):
+    rng = random.Random(3)
+    store = MemoryStore(bank)
+    questions = [q["id"] for q in bucket]
+
+    def complete(token, flags=()):
+        store.save_session(token, {"lens": LENS, "stage": "final_results", "questions": questions})
+        for qid, value in respondent(bucket, rng, noisy=None).items():
+            store.record_answer(token, qid, value)
+        store.save_result(token, 50.0, {}, flags=flags)
+
+    ia = ItemAnalysis(bank)
+    complete("a")
+    complete("flagged", flags=("straight_lining",))
+    assert ia.sync(store) == 1
+    complete("b")
+    assert ia.sync(store) == 1
+    assert ia.sync(store) == 0
+    assert ia.variables[(LENS, VARIABLE)] == [2, 2 * len(bucket)]
@@ -0,0 +1,36 @@
+"""Bulk rescoring: one output record per input line, errors reported per line."""
+
+import json
+
+import pytest
+
+from trifactor.bank import load_bank
+from trifactor.rescore import read_records, rescore
+
+
+@pytest.fixture(scope="module")
+def question_ids():
+    return [q["id"] for q in load_bank().questions("Financial")[:5]]
+
+
+def test_parse_errors_are_kept_apart_from_records():
+    assert list(read_records(['{"error": "x"}', "", "{bad"])) == [
+        (1, {"error": "x"}, None),
+        (3, None, "invalid JSON: Expecting property name enclosed in double quotes: line 1 column 2 (char 1)"),
+    ]
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_record_with_an_error_field_is_still_scored(question_ids, workers):
+    lines = [
+        json.dumps({"id": "a", "question_ids": question_ids, "answers": {q: 3 for q in question_ids}, "error": "stale"}),
+        "{bad",
+        json.dumps([1]),
+        json.dumps({"answers": {"zzz": 1}}),
+    ]
+    out = list(rescore(lines, workers=workers, chunk_size=2))
+    assert out[0]["id"] == "a" and "error" not in out[0]
+    assert out[0]["overall"] == pytest.approx(next(rescore(lines[:1]))["overall"])
+    assert out[1]["line"] == 2 and out[1]["error"].startswith("invalid JSON")
+    assert out[2] == {"line": 3, "error": "record must be a JSON object"}
+    assert out[3] == {"line": 4, "error": "unknown question ids: zzz"}
@@ -0,0 +1,85 @@
+"""Weighted question draws: alias tables, bitsets, and seeded follow-up selection."""
+
+import random
+from collections import Counter
+from itertools import combinations
+
+import pytest
+
+from trifactor.bank import load_bank
+from trifactor.sampling import AliasTable, Bitset
+from trifactor.scoring import GREEN_FROM, pick_followup_questions, pick_initial_questions, target_weight
+
+LENS = "Interpersonal"
+
+
+@pytest.fixture(scope="module")
+def bank():
+    return load_bank()
+
+
+def test_alias_table_draws_in_proportion_to_weight():
+    weights = [0.5, 1.0, 2.0, 0.0, 4.5]
+    table = AliasTable("abcde", weights)
+    rng = random.Random(0)
+    draws = Counter(table.draw(rng) for _ in range(80_000))
+    assert "d" not in draws
+    for item, w in zip("abcde", weights):
+        assert draws[item] / 80_000 == pytest.approx(w / sum(weights), abs=0.01)
+
+
+def test_alias_table_with_no_weight_draws_uniformly():
+    table = AliasTable("xyz", [0, 0, 0])
+    rng = random.Random(1)
+    draws = Counter(table.draw(rng) for _ in range(30_000))
+    assert all(n / 30_000 == pytest.approx(1 / 3, abs=0.01) for n in draws.values())
+
+
+def test_bitset():
+    bits = Bitset(20, [0, 7, 8, 19])
+    copy = bits.copy()
+    copy.add(3)
+    assert [i for i in range(20) if i in bits] == [0, 7, 8, 19]
+    assert 3 in copy and 3 not in bits
+
+
+def test_target_weight_leans_towards_the_weakest():
+    per_variable = {"Clarity": {"pct": 20.0}, "Feedback": {"pct": 90.0}}
+    assert target_weight("Clarity", per_variable) == 1.0 + GREEN_FROM - 20.0
+    assert target_weight("Feedback", per_variable) == 1.0
+    assert target_weight("Clarity") == 1.0
+
+
+def test_followups_are_reproducible_unasked_and_targeted(bank):
+    asked = {q["id"] for q in pick_initial_questions(bank, LENS, seed=4)}
+    targets = ["Boundaries", "Clarity"]
+    per_variable = {"Boundaries": {"pct": 10.0}, "Clarity": {"pct": 60.0}}
+
+    picks = pick_followup_questions(bank, LENS, targets, asked, per_variable=per_variable, seed=11)
+    again = pick_followup_questions(bank, LENS, targets, asked, per_variable=per_variable, seed=11)
+    assert [q["id"] for q in picks] == [q["id"] for q in again]
+
+    ids = [q["id"] for q in picks]
+    assert len(ids) == len(set(ids)) == 10
+    assert not asked & set(ids)
+    targeted = [q for q in picks if q["variable"] in targets]
+    available = sum(q["id"] not in asked for var in targets for q in bank.bucket(LENS, var))
+    assert len(targeted) == min(10, available)
+
+
+def test_followups_skip_near_duplicates_of_asked_questions(bank):
+    near = bank.near_duplicates()
+    a, b = next((bank.by_index[i], bank.by_index[j]) for _, i, j in near.pairs
+                if bank.lens_of[bank.by_index[i]["id"]] == LENS)
+    for seed in range(30):
+        picks = pick_followup_questions(bank, LENS, [a["variable"]], {a["id"]}, seed=seed)
+        assert b["id"] not in {q["id"] for q in picks}
+        idx = [bank.index[q["id"]] for q in picks]
+        assert not any(j in near.neighbors.get(i, ()) for i, j in combinations(idx, 2))
+
+
+def test_followups_stop_when_the_lens_runs_out(bank):
+    everything = [q["id"] for q in bank.questions(LENS)]
+    left = everything[-3:]
+    picks = pick_followup_questions(bank, LENS, ["Baseline"], everything[:-3], seed=0)
+    assert sorted(q["id"] for q in picks) == sorted(left)
@@ -0,0 +1,92 @@
+"""Near-duplicate questions: term normalization, the LSH index, and duplicate-free sampling."""
+
+import random
+from collections import Counter
+from itertools import combinations
+
+import pytest
+
+from trifactor.bank import CompiledBank, load_bank
+from trifactor.similarity import NearDuplicateIndex, jaccard, terms
+
+WORDS = """apple river stone cloud ember lantern meadow harbor violet summit canyon orchard
+    thunder willow marble compass falcon glacier quartz saddle timber beacon""".split()
+
+
+@pytest.fixture(scope="module")
+def bank():
+    return load_bank()
+
+
+def synthetic_bank(seed, n=120, twins=15):
+    """One lens of random five-word questions, the first ``twins`` of them each paraphrased once."""
+    rng = random.Random(seed)
+    texts = [" ".join(rng.sample(WORDS, 5)) for _ in range(n)]
+    for k in range(twins):
+        words = texts[k].split()
+        words[rng.randrange(5)] = rng.choice([w for w in WORDS if w not in words])
+        texts.append(" ".join(words))  # shares 4 of 6 distinct words: Jaccard 0.67
+    questions = [{"id": f"s{k:03d}", "text": t, "variable": "Baseline", "weight": 1.0, "reverse": False}
+                 for k, t in enumerate(texts)]
+    return CompiledBank({"Synthetic": questions})
+
+
+def test_terms_drop_scaffolding_and_fold_word_forms(bank):
+    synonyms = bank.synonyms
+    assert terms("How often do you feel braced for the worst?", synonyms) == {"brace", "bad"}
+    assert terms("Bracing for bad news", synonyms) == {"brace", "bad", "news"}
+    assert terms("Checking accounts", synonyms) == {"review", "money"}
+    assert terms("Checking accounts") == {"check", "account"}  # word forms only, without the bank's list
+    assert terms("How often do you feel tense?") == {"tense"}
+
+
+def test_jaccard():
+    assert jaccard({"a", "b"}, {"b", "c"}) == pytest.approx(1 / 3)
+    assert jaccard(frozenset(), frozenset()) == 0.0
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_index_finds_the_same_pairs_as_comparing_every_pair(seed):
+    bank = synthetic_bank(seed, n=300, twins=40)
+    index = NearDuplicateIndex(bank, max_df=1.0)
+    expected = {
+        (i, j) for i, j in combinations(range(len(bank.by_index)), 2)
+        if jaccard(index.terms[i], index.terms[j]) >= index.threshold
+    }
+    assert len(expected) >= 40
+    assert {(i, j) for _, i, j in index.pairs} == expected
+    assert all(j in index.neighbors[i] and i in index.neighbors[j] for i, j in expected)
+
+
+def test_shipped_bank_clusters(bank):
+    index = bank.near_duplicates()
+    assert [[q["id"] for q in c] for c in index.clusters()][0] == ["f07", "f30", "f48"]
+    assert [q["id"] for q, _ in index.similar("How braced do you feel for bad news?", "Financial")] == [
+        "f07", "f48", "f30"
+    ]
+
+
+def test_sample_never_picks_near_duplicates_while_others_remain(bank):
+    for lens in bank.lenses:
+        neighbors = bank.near_duplicates().neighbors
+        for seed in range(50):
+            picks = bank.sample(lens, 25, rng=random.Random(seed))
+            ids = [bank.index[q["id"]] for q in picks]
+            assert len(set(ids)) == len(picks) == 25
+            assert not any(j in neighbors.get(i, ()) for i, j in combinations(ids, 2))
+
+
+def test_sample_falls_back_to_duplicates_only_when_it_must():
+    bank = synthetic_bank(2, n=20, twins=10)
+    # Every word is common in so small a vocabulary; keep them all rather than pruning by frequency
+    bank._near_duplicates = NearDuplicateIndex(bank, max_df=1.0)
+    neighbors = bank.near_duplicates().neighbors
+    distinct = len(bank.by_index) - sum(1 for i in neighbors if i >= 20)
+
+    picks = bank.sample("Synthetic", len(bank.by_index), rng=random.Random(0))
+    assert Counter(q["id"] for q in picks).most_common(1)[0][1] == 1
+    assert len(picks) == len(bank.by_index)
+
+    picks = bank.sample("Synthetic", distinct, rng=random.Random(0))
+    ids = [bank.index[q["id"]] for q in picks]
+    assert not any(j in neighbors.get(i, ()) for i, j in combinations(ids, 2))
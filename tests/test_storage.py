@@ -0,0 +1,167 @@
+"""Session stores: round-trips, the SQLite write-behind buffer, and schema migration."""
+
+import sqlite3
+import time
+
+import pytest
+
+from trifactor.bank import load_bank
+from trifactor.storage import MemoryStore, SQLiteStore, open_store
+
+
+@pytest.fixture(scope="module")
+def bank():
+    return load_bank()
+
+
+@pytest.fixture
+def db(tmp_path):
+    return tmp_path / "sessions.db"
+
+
+@pytest.fixture
+def sqlite_store(bank, db):
+    # No background flushes unless a test asks for them, so the buffer can be inspected
+    store = SQLiteStore(db, bank, batch_size=10_000, flush_interval=3600)
+    yield store
+    store.close()
+
+
+def state(bank, **fields):
+    qs = [q["id"] for q in bank.questions("Interpersonal")]
+    return {
+        "lens": "Interpersonal", "stage": "followups", "mode": "fixed", "seed": 7,
+        "questions": qs[:5], "followups": qs[5:7], "targets": ["Boundaries"],
+        "idx": 5, "followup_idx": 1, "user": "alice", **fields,
+    }
+
+
+def stored_answers(db):
+    with sqlite3.connect(db) as conn:
+        return conn.execute("SELECT count(*) FROM answers").fetchone()[0]
+
+
+@pytest.mark.parametrize("url", ["memory://", "sqlite"])
+def test_session_round_trip(bank, db, url):
+    store = open_store(f"sqlite:///{db}" if url == "sqlite" else url, bank)
+    try:
+        saved = state(bank)
+        store.save_session("t1", saved)
+        for qid in saved["questions"]:
+            store.record_answer("t1", qid, 3)
+        store.record_answer("t1", saved["questions"][0], 1)  # a later answer wins
+
+        loaded = store.load_session("t1")
+        assert {k: loaded[k] for k in saved} == saved
+        assert loaded["answers"] == {**{qid: 3 for qid in saved["questions"]}, saved["questions"][0]: 1}
+
+        store.save_session("t1", state(bank, user=None, stage="final_results"))
+        assert store.load_session("t1")["user"] == "alice"  # a save without a user keeps it
+        assert store.load_session("missing") is None
+        assert [token for token, _ in store.iter_sessions()] == ["t1"]
+    finally:
+        store.close()
+
+
+def test_results_leave_out_flagged_runs(bank):
+    store = MemoryStore(bank)
+    for token in ("clean", "flagged"):
+        store.save_session(token, state(bank))
+    store.save_result("clean", 50.0, {"Boundaries": {"pct": 50.0}})
+    store.save_result("flagged", 10.0, {"Boundaries": {"pct": 10.0}}, flags=("speeding",))
+    assert [row[2] for row in store.results_since(0)] == [50.0]
+    assert [rid for rid, _ in store.completed_since(0)] == [1]
+
+
+def test_answers_are_written_behind_until_flushed(bank, db, sqlite_store):
+    saved = state(bank)
+    sqlite_store.save_session("t1", saved)
+    for qid in saved["questions"]:
+        sqlite_store.record_answer("t1", qid, 2)
+    assert stored_answers(db) == 0
+
+    sqlite_store.flush()
+    assert stored_answers(db) == len(saved["questions"])
+
+
+def test_full_batch_is_flushed_in_the_background(bank, db):
+    store = SQLiteStore(db, bank, batch_size=3, flush_interval=3600)
+    try:
+        saved = state(bank)
+        store.save_session("t1", saved)
+        for qid in saved["questions"][:3]:
+            store.record_answer("t1", qid, 2)
+        deadline = time.monotonic() + 10
+        while stored_answers(db) < 3 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert stored_answers(db) == 3
+    finally:
+        store.close()
+
+
+def test_failed_batch_is_requeued_ahead_of_newer_answers(bank, sqlite_store, monkeypatch):
+    saved = state(bank)
+    qid = saved["questions"][0]
+    sqlite_store.save_session("t1", saved)
+    sqlite_store.record_answer("t1", qid, 1)
+
+    transaction = sqlite_store.pool.transaction
+
+    def locked():
+        raise sqlite3.OperationalError("database is locked")
+
+    monkeypatch.setattr(sqlite_store.pool, "transaction", locked)
+    with pytest.raises(sqlite3.OperationalError):
+        sqlite_store.flush()
+    sqlite_store.record_answer("t1", qid, 4)  # arrives while the failed batch waits
+    assert [value for _, value, _ in sqlite_store._pending] == [1, 4]
+
+    monkeypatch.setattr(sqlite_store.pool, "transaction", transaction)
+    assert sqlite_store.load_session("t1")["answers"] == {qid: 4}
+
+
+def test_requeue_drops_the_oldest_beyond_max_pending(bank, db):
+    store = SQLiteStore(db, bank, batch_size=10_000, flush_interval=3600, max_pending=2)
+    try:
+        store._requeue([(0, 1, "t"), (1, 2, "t"), (2, 3, "t")])
+        assert store._pending == [(1, 2, "t"), (2, 3, "t")]
+    finally:
+        store.close()
+
+
+def test_older_store_gains_added_columns(bank, db):
+    with sqlite3.connect(db) as conn:
+        conn.executescript("""
+            CREATE TABLE sessions (
+                sid INTEGER PRIMARY KEY, token TEXT NOT NULL UNIQUE, bank_version TEXT NOT NULL,
+                lens TEXT NOT NULL, stage TEXT NOT NULL, mode TEXT NOT NULL DEFAULT 'fixed',
+                seed INTEGER NOT NULL DEFAULT 0, questions BLOB NOT NULL, followups BLOB NOT NULL,
+                targets TEXT NOT NULL DEFAULT '', idx INTEGER NOT NULL DEFAULT 0,
+                followup_idx INTEGER NOT NULL DEFAULT 0, updated_at REAL NOT NULL
+            );
+            CREATE TABLE results (
+                rid INTEGER PRIMARY KEY AUTOINCREMENT, sid INTEGER NOT NULL UNIQUE, lens TEXT NOT NULL,
+                completed_at REAL NOT NULL, overall REAL NOT NULL, per_variable TEXT NOT NULL
+            );
+        """)
+        conn.execute(
+            "INSERT INTO sessions (token, bank_version, lens, stage, questions, followups, updated_at)"
+            " VALUES ('old', ?, 'Interpersonal', 'final_results', x'', x'', 0)",
+            (bank.layout,),
+        )
+        conn.execute(
+            "INSERT INTO results (sid, lens, completed_at, overall, per_variable)"
+            " VALUES (1, 'Interpersonal', 0, 42.0, '{}')"
+        )
+    conn.close()
+
+    store = SQLiteStore(db, bank)
+    try:
+        assert store.load_session("old")["user"] is None
+        assert list(store.results_since(0)) == [(1, "Interpersonal", 42.0, {})]  # earlier results count as clean
+        store.save_session("old", state(bank, stage="final_results"))
+        assert store.load_session("old")["user"] == "alice"
+    finally:
+        store.close()
+
+    SQLiteStore(db, bank).close()  # migrating again is a no-op
@@ -0,0 +1,58 @@
+"""The batch (``score_sessions``) and incremental (``ScoreAccumulator``) scorers must match ``compute_scores``."""
+
+import random
+
+import pytest
+
+from trifactor.accumulator import ScoreAccumulator
+from trifactor.bank import load_bank
+from trifactor.scoring import compute_scores
+from trifactor.vectorized import score_sessions
+
+SESSIONS = 400
+TOLERANCE = 1e-9
+# Valid answers, plus the invalid and out-of-range values every scorer must skip
+ANSWERS = (0, 1, 2, 3, 4, "3", 2.0, -1, 5, 9, None, "", "often", [2])
+
+
+@pytest.fixture(scope="module")
+def bank():
+    return load_bank()
+
+
+def random_sessions(bank, seed):
+    """``(questions, answers)`` pairs; some listed questions are left unanswered."""
+    rng = random.Random(seed)
+    sessions = []
+    for _ in range(SESSIONS):
+        pool = bank.questions(rng.choice(bank.lenses))
+        questions = rng.sample(pool, rng.randint(1, min(len(pool), 40)))
+        answers = {q["id"]: rng.choice(ANSWERS) for q in questions if rng.random() < 0.9}
+        sessions.append((questions, answers))
+    return sessions
+
+
+def assert_matches(expected, overall, per_variable):
+    exp_overall, exp_per_var, _ = expected
+    assert list(per_variable) == list(exp_per_var)
+    for var, info in exp_per_var.items():
+        assert per_variable[var]["zone"] == info["zone"]
+        assert per_variable[var]["pct"] == pytest.approx(info["pct"], abs=TOLERANCE)
+        assert per_variable[var]["volatility"] == pytest.approx(info["volatility"], abs=TOLERANCE)
+    assert overall == pytest.approx(exp_overall, abs=TOLERANCE)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_score_sessions_matches_compute_scores(bank, seed):
+    sessions = random_sessions(bank, seed)
+    batch = score_sessions(bank, [([q["id"] for q in qs], answers) for qs, answers in sessions])
+    for i, (questions, answers) in enumerate(sessions):
+        assert_matches(compute_scores(questions, answers), float(batch.overall[i]), batch.per_variable(i))
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_accumulator_matches_compute_scores(bank, seed):
+    for questions, answers in random_sessions(bank, seed):
+        acc = ScoreAccumulator.from_answers(bank, questions, answers)
+        per_variable = acc.per_variable()
+        assert_matches(compute_scores(questions, answers), acc.overall(per_variable), per_variable)
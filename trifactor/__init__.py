@@ -0,0 +1,26 @@
+"""Trifactor diagnostic: question bank and scoring, independent of the UI.
+
+Importing the package is cheap (no Streamlit, no NumPy); the batch engine
+lives in ``trifactor.vectorized`` and is imported only where needed.
+"""
+
+from trifactor.bank import CompiledBank, load_bank
+from trifactor.scoring import (
+    VARIABLE_WEIGHTS,
+    choose_followup_targets,
+    compute_scores,
+    pick_followup_questions,
+    pick_initial_questions,
+    zone_name,
+)
+
+__all__ = [
+    "CompiledBank",
+    "VARIABLE_WEIGHTS",
+    "choose_followup_targets",
+    "compute_scores",
+    "load_bank",
+    "pick_followup_questions",
+    "pick_initial_questions",
+    "zone_name",
+]
@@ -0,0 +1,180 @@
+"""Incremental scoring: per-variable running sums updated per answer.
+
+``ScoreAccumulator`` keeps, for each variable, the answered-item count, the
+weighted score sum, the weight total and the unweighted Σs / Σs² needed for
+volatility. Setting, changing or clearing one answer applies a delta to a
+single variable in O(1), so results render without re-walking every item.
+Item scores are small integers, so the count and power sums are exact and
+every change is exactly reversible; the weighted sums are plain floats.
+
+Per session, the state is sized by the answers given, not by the bank:
+- answers are one insertion-ordered dict of bank index -> value, so looking
+  up, setting or clearing an answer is O(1) and iteration follows answer
+  order (a changed answer moves to the end);
+- each variable (by its bank code) has a row of five doubles.
+
+Question dicts, weights and variable names come from the shared
+``CompiledBank``.
+
+Results match ``compute_scores`` on the same answers (to float rounding).
+"""
+
+import heapq
+from array import array
+from math import sqrt
+from operator import add
+
+from trifactor.scoring import VARIABLE_WEIGHTS, clamp, parse_answer, zone_name
+
+
+N, WSUM, SWSUM, S1, S2 = range(5)  # per-variable row: count, Σ weight, Σ score·weight, Σ score, Σ score²
+ROW = 5
+
+
+def _info(row) -> dict:
+    n, wsum, swsum, s1, s2 = row
+    pct = clamp(swsum / wsum / 4 * 100, 0, 100)
+    volatility = sqrt(max(n * s2 - s1 * s1, 0)) / n / 4 * 100 if n > 1 else 0.0
+    return {"pct": pct, "zone": zone_name(pct), "volatility": volatility}
+
+
+class ScoreAccumulator:
+    """Running scores for one session, updated answer by answer."""
+
+    __slots__ = ("bank", "values", "sums", "var_order")
+
+    def __init__(self, bank):
+        self.bank = bank
+        self.values = {}  # answered bank index -> answer (0–4), in answer order
+        self.sums = array("d", bytes(8 * ROW * len(bank.var_names)))  # ROW doubles per variable code
+        self.var_order = bytearray()  # codes of variables with answers, in first-answered order
+
+    @classmethod
+    def from_answers(cls, bank, questions, answers):
+        acc = cls(bank)
+        for q in questions:
+            if q["id"] in answers:
+                acc.set(q, answers[q["id"]])
+        return acc
+
+    @classmethod
+    def merged(cls, accumulators):
+        """One accumulator over the answers of several (same bank, disjoint questions).
+
+        Every row is a plain sum, so per-variable results are as if all the
+        answers had been given to a single accumulator.
+        """
+        accumulators = list(accumulators)
+        acc = cls(accumulators[0].bank)
+        for other in accumulators:
+            acc.values.update(other.values)
+            acc.var_order.extend(code for code in other.var_order if code not in acc.var_order)
+            acc.sums = array("d", map(add, acc.sums, other.sums))
+        return acc
+
+    def __len__(self):
+        return len(self.values)
+
+    def get(self, qid):
+        """The recorded answer for ``qid``, or None."""
+        return self.values.get(self.bank.index.get(qid))
+
+    def set(self, q, answer) -> bool:
+        """Record ``answer`` for question ``q``; returns True if anything changed.
+
+        An invalid answer clears any previous one, as ``compute_scores`` would
+        skip it. A changed answer moves to the end of the answer order.
+        """
+        bank = self.bank
+        i = bank.index[q["id"]]
+        a = parse_answer(answer)
+        old = self.values.get(i)
+        if a == old:
+            return False
+
+        if old is not None:
+            self._remove(i)
+        if a is None:
+            return True
+
+        code = bank.var_code[i]
+        if not self.sums[code * ROW + N]:
+            self.var_order.append(code)
+        self._add(code, (4 - a) if bank.item_reverse[i] else a, bank.item_weight[i], 1)
+        self.values[i] = a
+        return True
+
+    def discard(self, qid):
+        i = self.bank.index.get(qid)
+        if i in self.values:
+            self._remove(i)
+
+    def _add(self, code, score, w, sign):
+        sums, base = self.sums, code * ROW
+        sums[base + N] += sign
+        sums[base + WSUM] += sign * w
+        sums[base + SWSUM] += sign * score * w
+        sums[base + S1] += sign * score
+        sums[base + S2] += sign * score * score
+
+    def _remove(self, i):
+        bank = self.bank
+        a = self.values.pop(i)
+        code = bank.var_code[i]
+        self._add(code, (4 - a) if bank.item_reverse[i] else a, bank.item_weight[i], -1)
+        if not self.sums[code * ROW + N]:
+            self.sums[code * ROW:(code + 1) * ROW] = array("d", bytes(8 * ROW))  # drop float residue too
+            self.var_order.remove(code)
+
+    def count(self, var) -> int:
+        """Number of answered items for ``var``."""
+        code = self.bank.var_index.get(var)
+        return 0 if code is None else int(self.sums[code * ROW + N])
+
+    def info(self, var):
+        """``{"pct", "zone", "volatility"}`` for one variable, or None if it has no answers."""
+        if not self.count(var):
+            return None
+        code = self.bank.var_index[var]
+        return _info(self.sums[code * ROW:(code + 1) * ROW])
+
+    def items(self):
+        """``(var, score, weight, question_dict, answer)`` per answered item, in answer order."""
+        bank = self.bank
+        for i, a in self.values.items():
+            yield (bank.var_names[bank.var_code[i]], (4 - a) if bank.item_reverse[i] else a,
+                   bank.item_weight[i], bank.by_index[i], a)
+
+    def answers(self) -> dict:
+        """{qid: answer} for every scored item (invalid answers are already dropped)."""
+        by_index = self.bank.by_index
+        return {by_index[i]["id"]: a for i, a in self.values.items()}
+
+    def per_variable(self) -> dict:
+        names, sums = self.bank.var_names, self.sums
+        return {
+            names[code]: _info(sums[code * ROW:(code + 1) * ROW])
+            for code in self.var_order if sums[code * ROW + WSUM] > 0
+        }
+
+    def overall(self, per_variable=None) -> float:
+        per_variable = self.per_variable() if per_variable is None else per_variable
+        num = den = 0.0
+        for var, info in per_variable.items():
+            w = VARIABLE_WEIGHTS.get(var, 1.0)
+            num += info["pct"] * w
+            den += w
+        return num / den if den > 0 else 0.0
+
+    def lowest(self, k=None, var=None) -> list:
+        """Scored items lowest first, then heaviest (optionally one variable, top ``k``)."""
+        items = self.items()
+        if var is not None:
+            items = [t for t in items if t[0] == var]
+        key = lambda x: (x[1], -x[2])
+        return heapq.nsmallest(k, items, key=key) if k is not None else sorted(items, key=key)
+
+    def result(self):
+        """``(overall, per_variable, scored_items)``, as returned by ``compute_scores``."""
+        per_variable = self.per_variable()
+        return self.overall(per_variable), per_variable, self.lowest()
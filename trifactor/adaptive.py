@@ -0,0 +1,117 @@
+"""Adaptive (CAT-style) question flow that stops once every zone is stable.
+
+Instead of a fixed 25 + 10 items, ``AdaptiveSession`` repeatedly asks about
+the variable whose zone is least certain and stops when every variable's
+confidence interval sits inside a single zone (RED < 45 ≤ YELLOW < 70 ≤
+GREEN), or when its bucket runs out, or at ``max_items``.
+
+Uncertainty is the standard error of a variable's mean on the 0–100 scale.
+The observed item spread is shrunk towards ``PRIOR_SD`` so one or two
+identical answers do not look certain. Within a variable the next item is
+the heaviest one not yet asked, since weight is the item's share of the
+mean (and so its information).
+
+    session = AdaptiveSession(bank, "Financial", seed=7)
+    while (q := session.next_question()) is not None:
+        session.answer(q, ask(q))
+    overall, per_variable, scored_items = session.scores.result()
+"""
+
+import random
+from array import array
+from math import inf, sqrt
+from statistics import NormalDist
+
+from trifactor.accumulator import ScoreAccumulator
+from trifactor.bank import QuestionList
+from trifactor.metrics import timed
+from trifactor.scoring import GREEN_FROM, RED_BELOW, zone_name
+
+PRIOR_SD = 25.0      # one scale point, in 0–100 units
+PRIOR_WEIGHT = 2     # pseudo-items of PRIOR_SD blended into the observed spread
+MIN_ITEMS = 2        # never call a variable stable on fewer answers
+MAX_ITEMS = 35       # same ceiling as the fixed 25 + 10 flow
+
+
+class AdaptiveSession:
+    __slots__ = ("bank", "lens", "z", "max_items", "min_items", "scores", "asked", "_queue")
+
+    def __init__(self, bank, lens, confidence=0.8, max_items=MAX_ITEMS, min_items=MIN_ITEMS,
+                 scores=None, rng=random, seed=None):
+        if seed is not None:
+            rng = random.Random(seed)
+        self.bank = bank
+        self.lens = lens
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.max_items = max_items
+        self.min_items = min_items
+        self.scores = scores if scores is not None else ScoreAccumulator(bank)
+        self.asked = QuestionList(bank)
+
+        # Per variable, bank indexes of unasked items heaviest first (random order among equal weights).
+        self._queue = {}
+        for var in bank.variables(lens):
+            items = list(bank.bucket(lens, var))
+            rng.shuffle(items)
+            items.sort(key=lambda q: -float(q.get("weight", 1.0)))
+            self._queue[var] = array("H", (bank.index[q["id"]] for q in reversed(items)))  # pop() takes the heaviest
+
+    def interval(self, var):
+        """``(pct, half_width)`` of the variable's confidence interval; ``(None, inf)`` if unanswered."""
+        n = self.scores.count(var)
+        if n == 0:
+            return None, inf
+        info = self.scores.info(var)
+        sd = sqrt((n * info["volatility"] ** 2 + PRIOR_WEIGHT * PRIOR_SD ** 2) / (n + PRIOR_WEIGHT))
+        return info["pct"], self.z * sd / sqrt(n)
+
+    def margin(self, var) -> float:
+        """Distance to the nearest zone cutoff in half-widths; < 1 means the zone may still flip."""
+        pct, half = self.interval(var)
+        if pct is None:
+            return -inf
+        if self.scores.count(var) < self.min_items:
+            return -1.0  # answered, but too few items to judge
+        nearest = min(abs(pct - RED_BELOW), abs(pct - GREEN_FROM))
+        return nearest / half if half > 0 else inf
+
+    def is_stable(self, var) -> bool:
+        pct, half = self.interval(var)
+        if pct is not None and zone_name(pct - half) == zone_name(pct + half):
+            return self.scores.count(var) >= self.min_items
+        return False
+
+    @property
+    def done(self) -> bool:
+        return self.next_variable() is None
+
+    def next_variable(self):
+        """The least certain variable that is not yet stable and still has items."""
+        if len(self.asked) >= self.max_items:
+            return None
+        open_vars = [v for v, q in self._queue.items() if q and not self.is_stable(v)]
+        return min(open_vars, key=self.margin, default=None)
+
+    @timed("adaptive.next_question")
+    def next_question(self):
+        var = self.next_variable()
+        if var is None:
+            return None
+        q = self.bank.by_index[self._queue[var].pop()]
+        self.asked.append(q)
+        return q
+
+    def answer(self, q, value):
+        self.scores.set(q, value)
+
+    def resume(self, answers):
+        """Replay a stored session from its answers; returns the current question (or None if done).
+
+        Selection is deterministic for a given seed, bank and answers, so the
+        order questions were asked in does not need to be stored.
+        """
+        while (q := self.next_question()) is not None:
+            if q["id"] not in answers:
+                return q
+            self.answer(q, answers[q["id"]])
+        return None
@@ -0,0 +1,545 @@
+"""Asyncio JSON API for the diagnostic, alongside the Streamlit UI.
+
+Stateless JSON requests over plain HTTP/1.1 (stdlib ``asyncio`` streams, no
+framework). Connections are kept alive and requests may be pipelined: each
+connection answers its requests in order as they arrive, without waiting
+for the client to read earlier responses.
+
+    POST /sessions                      {"lens", "adaptive"?, "user"?}  -> session, stage
+    GET  /sessions/<token>                                              -> stage and progress
+    GET  /sessions/<token>/questions?n=5                                -> next unanswered questions
+    POST /sessions/<token>/answers      {"answers": {qid: 0-4, ...}}    -> accepted, rejected, stage
+    GET  /sessions/<token>/results                                      -> scores, follow-up targets, quality flags
+    POST /sessions/<token>/followups                                    -> targeted follow-up questions
+    POST /sessions/<token>/finish                                       -> final results
+    GET  /health
+    GET  /metrics                       Authorization: Bearer $TRIFACTOR_ADMIN_TOKEN  -> Prometheus text
+
+Sessions use the same bank, scoring, question selection and store as
+App.py, and save the same state. A session started here can be resumed in
+the app with ``?s=<token>``, and the other way round when both share a
+store. Live sessions stay in memory (the most recent ``MAX_LIVE``); others
+reload from the store on first use. Store calls that may block run on
+worker threads, so SQLite never stalls the event loop.
+
+    python -m trifactor.api [--port 8765] [--store sqlite:///sessions.db]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import secrets
+import signal
+import sys
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlsplit
+
+from trifactor import metrics
+from trifactor.accumulator import ScoreAccumulator
+from trifactor.adaptive import AdaptiveSession
+from trifactor.bank import QuestionList, load_bank
+from trifactor.combined import COMBINED_LENS, CombinedScores, pick_combined_questions
+from trifactor.prefetch import FollowupPrefetch, select_followups
+from trifactor.quality import QualityTracker
+from trifactor.scoring import choose_followup_targets, parse_answer, pick_initial_questions, zone_name
+from trifactor.storage import DEFAULT_STORE_URL, open_store
+
+DEFAULT_PORT = 8765
+MAX_BODY = 64 * 1024   # bytes per request body
+MAX_HEADER = 16 * 1024 # bytes of request line plus headers
+MAX_LIVE = 10_000      # sessions held in memory; older ones reload from the store
+PAGE_SIZE = 5          # default ``n`` for /questions
+
+REASONS = {200: "OK", 201: "Created", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 431: "Request Header Fields Too Large",
+           500: "Internal Server Error", 501: "Not Implemented"}
+
+
+class ApiError(Exception):
+    """An error answered as ``{"error": message}`` with HTTP ``status``."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+# ──────────────────────────────────────────────────────────────
+# Sessions
+# ──────────────────────────────────────────────────────────────
+
+class Run:
+    """One session's live state, in the same shape App.py keeps in ``st.session_state``."""
+
+    __slots__ = ("token", "user", "lens", "stage", "seed", "questions", "followups", "targets",
+                 "scores", "quality", "adaptive", "lock")
+
+    def __init__(self, token, lens, seed, user=None):
+        self.token = token
+        self.user = user
+        self.lens = lens
+        self.stage = "questions"
+        self.seed = seed
+        self.questions = []   # QuestionList of initial (or adaptive) questions
+        self.followups = []   # QuestionList once follow-ups are chosen
+        self.targets = []
+        self.scores = None
+        self.quality = None   # QualityTracker
+        self.adaptive = None  # AdaptiveSession in adaptive mode
+        self.lock = asyncio.Lock()  # one request at a time per session
+
+    @property
+    def mode(self) -> str:
+        if self.adaptive is not None:
+            return "adaptive"
+        return "combined" if isinstance(self.scores, CombinedScores) else "fixed"
+
+    def state(self) -> dict:
+        """Stored state, as ``App.save_session`` writes it."""
+        answered = self.scores.answers()
+        return {
+            "lens": self.lens,
+            "stage": self.stage,
+            "mode": self.mode,
+            "seed": self.seed,
+            "questions": [q["id"] for q in self.questions],
+            "followups": [q["id"] for q in self.followups],
+            "targets": self.targets,
+            "idx": sum(q["id"] in answered for q in self.questions),
+            "followup_idx": min(sum(q["id"] in answered for q in self.followups),
+                                max(len(self.followups) - 1, 0)),
+            "user": self.user,
+        }
+
+    def current(self) -> list:
+        """Questions of the current stage, in order."""
+        if self.stage == "adaptive":
+            return [self.questions[-1]] if self.questions else []
+        if self.stage == "questions":
+            return list(self.questions)
+        if self.stage == "followups":
+            return list(self.followups)
+        return []
+
+    def unanswered(self) -> list:
+        return [q for q in self.current() if self.scores.get(q["id"]) is None]
+
+
+def question_json(bank, q) -> dict:
+    return {"id": q["id"], "text": q["text"], "variable": q["variable"], "lens": bank.lens_of[q["id"]]}
+
+
+# ──────────────────────────────────────────────────────────────
+# Service (transport-independent handlers)
+# ──────────────────────────────────────────────────────────────
+
+class DiagnosticService:
+    def __init__(self, bank, store, prefetch=None, max_live=MAX_LIVE):
+        self.bank = bank
+        self.store = store
+        self.prefetch = prefetch or FollowupPrefetch(bank)
+        self.max_live = max_live
+        self.lenses = [*bank.lenses, COMBINED_LENS]
+        self._live = OrderedDict()  # token -> Run, least recently used first
+
+    # ── session lookup ────────────────────────────────────────
+
+    def _keep(self, run):
+        self._live[run.token] = run
+        self._live.move_to_end(run.token)
+        while len(self._live) > self.max_live:
+            self._live.popitem(last=False)  # its state is in the store
+
+    async def _run(self, token) -> Run:
+        run = self._live.get(token)
+        if run is None:
+            saved = await asyncio.to_thread(self.store.load_session, token)
+            if saved is None:
+                raise ApiError(404, f"unknown session {token!r}")
+            run = self._live.get(token) or self._restore(token, saved)
+        self._keep(run)
+        return run
+
+    def _restore(self, token, saved) -> Run:
+        """Rebuild a session from the store (mirrors ``App.restore_session``)."""
+        bank, answers = self.bank, saved["answers"]
+        run = Run(token, saved["lens"], saved["seed"], user=saved.get("user"))
+        run.stage = saved["stage"]
+        run.targets = saved["targets"]
+        run.quality = QualityTracker.from_answers(bank, answers)
+        if saved["mode"] == "adaptive":
+            run.adaptive = AdaptiveSession(bank, run.lens, seed=run.seed)
+            current = run.adaptive.resume(answers)
+            run.scores = run.adaptive.scores
+            run.questions = run.adaptive.asked
+            if current is None:
+                run.stage = "final_results"
+            return run
+        run.questions = QuestionList.from_ids(bank, saved["questions"])
+        run.followups = QuestionList.from_ids(bank, saved["followups"])
+        scores_cls = CombinedScores if saved["mode"] == "combined" else ScoreAccumulator
+        run.scores = scores_cls.from_answers(bank, [*run.questions, *run.followups], answers)
+        return run
+
+    async def _save(self, run):
+        await asyncio.to_thread(self.store.save_session, run.token, run.state())
+        if run.stage == "final_results":
+            overall, per_var = self._scores(run)
+            flags = run.quality.flags()
+            for flag in flags:
+                metrics.inc("response_quality", flag=flag)
+            await asyncio.to_thread(self.store.save_result, run.token, overall, per_var, flags)
+            if run.user:
+                await asyncio.to_thread(
+                    self.store.append_history, run.user, run.token, run.lens, overall, per_var
+                )
+
+    def _scores(self, run):
+        per_var = run.scores.per_variable()
+        return run.scores.overall(per_var), per_var
+
+    def _status(self, run) -> dict:
+        return {
+            "session": run.token,
+            "lens": run.lens,
+            "mode": run.mode,
+            "stage": run.stage,
+            "answered": len(run.scores),
+            "remaining": len(run.unanswered()),
+        }
+
+    # ── handlers ──────────────────────────────────────────────
+
+    async def start(self, body) -> dict:
+        lens = body.get("lens")
+        if lens not in self.lenses:
+            raise ApiError(400, f"lens must be one of: {', '.join(self.lenses)}")
+        adaptive = bool(body.get("adaptive", False))
+        if adaptive and lens == COMBINED_LENS:
+            raise ApiError(400, "adaptive runs follow a single lens")
+        user = body.get("user")
+        if user is not None and not isinstance(user, str):
+            raise ApiError(400, "user must be a string")
+        if not any(self.bank.questions(l) for l in (self.bank.lenses if lens == COMBINED_LENS else [lens])):
+            raise ApiError(409, f"question bank for {lens!r} is empty")
+
+        bank, seed = self.bank, secrets.randbits(32)
+        run = Run(secrets.token_urlsafe(12), lens, seed, user=user)
+        run.quality = QualityTracker(bank)
+        if lens == COMBINED_LENS:
+            run.scores = CombinedScores(bank)
+            run.questions = QuestionList(bank, pick_combined_questions(bank, seed=seed))
+        elif adaptive:
+            run.adaptive = AdaptiveSession(bank, lens, seed=seed)
+            run.scores = run.adaptive.scores
+            run.adaptive.next_question()
+            run.questions = run.adaptive.asked
+            run.stage = "adaptive"
+        else:
+            run.scores = ScoreAccumulator(bank)
+            run.questions = QuestionList(bank, pick_initial_questions(bank, lens, seed=seed))
+        self._keep(run)
+        await self._save(run)
+        return self._status(run)
+
+    async def status(self, token) -> dict:
+        return self._status(await self._run(token))
+
+    async def questions(self, token, n=PAGE_SIZE) -> dict:
+        run = await self._run(token)
+        pending = run.unanswered()
+        return {
+            **self._status(run),
+            "questions": [question_json(self.bank, q) for q in pending[:max(n, 0)]],
+        }
+
+    async def answer(self, token, body) -> dict:
+        answers = body.get("answers")
+        if not isinstance(answers, dict):
+            raise ApiError(400, 'expected {"answers": {question id: 0-4, ...}}')
+        run = await self._run(token)
+        async with run.lock:
+            if run.stage not in ("questions", "followups", "adaptive"):
+                raise ApiError(409, f"session is in stage {run.stage!r}; nothing to answer")
+
+            before = run.stage
+            accepted, rejected = [], {}
+            allowed = {q["id"]: q for q in run.current()}
+            for qid, value in answers.items():
+                a = parse_answer(value)
+                if a is None:
+                    rejected[qid] = "answer must be an integer 0–4"
+                    continue
+                q = allowed.get(qid)
+                if q is None:
+                    rejected[qid] = "not a question of the current stage"
+                    continue
+                previous = run.scores.get(qid)
+                if run.scores.set(q, a):
+                    run.quality.update(q, previous, a)
+                    self.store.record_answer(run.token, qid, a)  # buffered; never blocks on I/O
+                accepted.append(qid)
+                if run.stage == "adaptive":
+                    # Each answer decides the next question
+                    nxt = run.adaptive.next_question()
+                    if nxt is None:
+                        run.stage = "final_results"
+                    allowed = {} if nxt is None else {nxt["id"]: nxt}
+
+            if run.stage in ("questions", "followups") and not run.unanswered():
+                run.stage = "results" if run.stage == "questions" else "final_results"
+            if before == "questions" and accepted:
+                # Follow-ups are ready by the time they are asked for
+                self.prefetch.submit(run.token, run.lens, run.questions, run.scores.answers(), run.seed)
+            if run.stage != before:
+                await self._save(run)  # answers themselves are already recorded
+        return {**self._status(run), "accepted": accepted, "rejected": rejected}
+
+    async def followups(self, token) -> dict:
+        run = await self._run(token)
+        async with run.lock:
+            if run.stage == "results":
+                answers = run.scores.answers()
+                picked = self.prefetch.take(run.token, run.lens, run.questions, answers, run.seed)
+                followups, run.targets = picked or await asyncio.to_thread(
+                    select_followups, self.bank, run.lens, list(run.questions), answers, run.seed
+                )
+                run.followups = QuestionList(self.bank, followups)
+                run.stage = "followups" if followups else "final_results"
+                await self._save(run)
+            elif run.stage != "followups":
+                raise ApiError(409, f"follow-ups come after the initial questions (stage {run.stage!r})")
+        return {
+            **self._status(run),
+            "targets": run.targets,
+            "questions": [question_json(self.bank, q) for q in run.unanswered()],
+        }
+
+    async def finish(self, token) -> dict:
+        run = await self._run(token)
+        async with run.lock:
+            if run.stage in ("questions", "adaptive"):
+                raise ApiError(409, "answer the initial questions first")
+            if run.stage != "final_results":
+                run.stage = "final_results"
+                await self._save(run)
+        return await self.results(token)
+
+    async def results(self, token) -> dict:
+        run = await self._run(token)
+        if run.stage in ("questions", "adaptive"):
+            raise ApiError(409, "no results until the initial questions are answered")
+        overall, per_var = self._scores(run)
+        result = {
+            **self._status(run),
+            "overall": overall,
+            "zone": zone_name(overall),
+            "per_variable": per_var,
+            "targets": run.targets or choose_followup_targets(per_var),
+            "quality": list(run.quality.flags()),
+        }
+        if isinstance(run.scores, CombinedScores):
+            result["matrix"] = run.scores.matrix()
+            result["lens_overall"] = run.scores.lens_overall()
+        return result
+
+    async def health(self) -> dict:
+        return {"ok": True, "bank": self.bank.version, "live_sessions": len(self._live),
+                "cpu_seconds": time.process_time()}
+
+
+# ──────────────────────────────────────────────────────────────
+# HTTP
+# ──────────────────────────────────────────────────────────────
+
+_SESSION = re.compile(r"^/sessions/([A-Za-z0-9_-]+)(?:/(questions|answers|results|followups|finish))?/?$")
+
+
+async def dispatch(service, method, target, body, headers=None) -> tuple:
+    """``(status, payload)`` for one request; payload is JSON-serializable (or text for /metrics).
+
+    ``headers`` maps lower-cased header names to values.
+    """
+    url = urlsplit(target)
+    path = url.path
+
+    if path in ("/sessions", "/sessions/"):
+        if method != "POST":
+            raise ApiError(405, "use POST to start a session")
+        return 201, await service.start(_json(body))
+    if path == "/health":
+        return 200, await service.health()
+    if path == "/metrics":
+        # Same token as the app's admin views: metrics name routes and internals
+        if not metrics.authorized((headers or {}).get("authorization")):
+            raise ApiError(401, "metrics need Authorization: Bearer <TRIFACTOR_ADMIN_TOKEN>")
+        return 200, metrics.REGISTRY.render_prometheus()
+
+    m = _SESSION.match(path)
+    if m is None:
+        raise ApiError(404, f"no route for {path}")
+    token, action = m.groups()
+    routes = {
+        (None, "GET"): lambda: service.status(token),
+        ("questions", "GET"): lambda: service.questions(token, _int_param(url.query, "n", PAGE_SIZE)),
+        ("answers", "POST"): lambda: service.answer(token, _json(body)),
+        ("results", "GET"): lambda: service.results(token),
+        ("followups", "POST"): lambda: service.followups(token),
+        ("finish", "POST"): lambda: service.finish(token),
+    }
+    handler = routes.get((action, method))
+    if handler is None:
+        raise ApiError(405, f"{method} not allowed on {path}")
+    return 200, await handler()
+
+
+def route_name(target) -> str:
+    """The request path with the session token masked, for metrics."""
+    path = urlsplit(target).path
+    m = _SESSION.match(path)
+    return path if m is None else f"/sessions/*/{m[2] or ''}".rstrip("/")
+
+
+def _json(body: bytes) -> dict:
+    try:
+        value = json.loads(body or b"{}")
+    except ValueError:
+        raise ApiError(400, "request body is not valid JSON") from None
+    if not isinstance(value, dict):
+        raise ApiError(400, "request body must be a JSON object")
+    return value
+
+
+def _int_param(query, name, default) -> int:
+    values = parse_qs(query).get(name)
+    try:
+        return int(values[0]) if values else default
+    except ValueError:
+        raise ApiError(400, f"{name} must be an integer") from None
+
+
+def _response(status, payload, keep_alive) -> bytes:
+    if isinstance(payload, str):
+        body, ctype = payload.encode("utf-8"), "text/plain; version=0.0.4"
+    else:
+        body, ctype = json.dumps(payload, separators=(",", ":")).encode("utf-8"), "application/json"
+    head = (f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: {ctype}\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+async def handle_connection(service, reader, writer):
+    """Serve requests on one connection in arrival order until it closes."""
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except asyncio.IncompleteReadError:
+                break  # client closed between requests
+            except asyncio.LimitOverrunError:
+                writer.write(_response(431, {"error": "request head too large"}, False))
+                break
+
+            lines = head.decode("latin-1").split("\r\n")
+            try:
+                method, target, version = lines[0].split(" ", 2)
+            except ValueError:
+                writer.write(_response(400, {"error": "malformed request line"}, False))
+                break
+            headers = {}
+            for line in lines[1:]:
+                name, _, value = line.partition(":")
+                if name:
+                    headers[name.strip().lower()] = value.strip()
+
+            if "transfer-encoding" in headers:
+                writer.write(_response(501, {"error": "chunked bodies are not supported"}, False))
+                break
+            try:
+                length = int(headers.get("content-length", 0))
+            except ValueError:
+                length = -1
+            if not 0 <= length <= MAX_BODY:
+                writer.write(_response(413, {"error": f"body must be at most {MAX_BODY} bytes"}, False))
+                break
+            body = await reader.readexactly(length) if length else b""
+
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+
+            with metrics.span(f"api.{method} {route_name(target)}"):
+                try:
+                    status, payload = await dispatch(service, method, target, body, headers)
+                except ApiError as e:
+                    status, payload = e.status, {"error": str(e)}
+                except Exception as e:  # a broken request must not take the connection's others with it
+                    status, payload = 500, {"error": f"{type(e).__name__}: {e}"}
+            metrics.inc("api_requests", method=method, status=status)
+
+            writer.write(_response(status, payload, keep_alive))
+            if not keep_alive:
+                break
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        try:
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+async def serve(service, host="127.0.0.1", port=DEFAULT_PORT, ready=None, stop=None):
+    """Run the API until ``stop`` (an asyncio.Event) is set, or until cancelled without one.
+
+    ``ready`` (an asyncio.Event) is set once the server is listening.
+    """
+    server = await asyncio.start_server(
+        lambda r, w: handle_connection(service, r, w), host, port, limit=MAX_HEADER
+    )
+    if ready is not None:
+        ready.set()
+    async with server:
+        if stop is None:
+            await server.serve_forever()
+        else:
+            await stop.wait()
+
+
+async def _serve_until_signalled(service, host, port):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    await serve(service, host, port, stop=stop)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the diagnostic as a JSON API.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--store", default=os.environ.get("TRIFACTOR_STORE", DEFAULT_STORE_URL),
+                        help="session store URL (default: $TRIFACTOR_STORE, else sqlite)")
+    parser.add_argument("--weights", default=os.environ.get("TRIFACTOR_WEIGHTS"),
+                        help="weights file the app runs with (default: $TRIFACTOR_WEIGHTS)")
+    args = parser.parse_args(argv)
+
+    bank = load_bank(weights=args.weights)
+    store = open_store(args.store, bank)
+    service = DiagnosticService(bank, store)
+    print(f"Serving on http://{args.host}:{args.port} (store {args.store})", file=sys.stderr)
+    try:
+        asyncio.run(_serve_until_signalled(service, args.host, args.port))
+    finally:
+        service.prefetch.close()
+        store.close()  # flushes buffered answers
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
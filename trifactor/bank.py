@@ -0,0 +1,646 @@
+"""Question bank: file loading, validation, binary snapshot and compiled index.
+
+The bank lives in ``questions.json`` next to this module (TOML and CSV are
+accepted too). ``load_bank`` validates it and returns a ``CompiledBank`` with
+the lookup structures the app needs (per-lens arrays, an id index,
+per-variable buckets), built once per process instead of on every Streamlit
+rerun. A compact binary snapshot of the validated bank is written beside the
+source and read on later startups instead of parsing and validating it again.
+The snapshot only shortens loading: the ``CompiledBank`` built from it holds
+the same Python objects as one built from the source, and the file is closed
+once it has been read.
+
+An optional ``<name>.synonyms.json`` beside the bank file (here
+``questions.synonyms.json``) lists the paraphrases this bank uses for one
+idea, for near-duplicate detection (``trifactor.similarity``). It is curated
+per bank from its own wording, not a general thesaurus, so a new or edited
+bank needs its own.
+
+    python -m trifactor.bank [PATH] [--snapshot] [--lint]
+"""
+
+import csv
+import hashlib
+import json
+import mmap
+import random
+import struct
+import sys
+import tomllib
+from array import array
+from pathlib import Path
+
+from trifactor.metrics import timed
+from trifactor.sampling import AliasTable, Bitset
+from trifactor.similarity import NearDuplicateIndex
+
+DEFAULT_BANK_PATH = Path(__file__).with_name("questions.json")
+
+VARIABLES = ("Baseline", "Clarity", "Resources", "Boundaries", "Execution", "Feedback")
+FIELDS = ("id", "text", "variable", "weight", "reverse")
+WEIGHT_RANGE = (0.5, 2.0)
+
+
+class BankError(ValueError):
+    """Raised when a bank file fails validation; ``problems`` lists every issue."""
+
+    def __init__(self, problems):
+        self.problems = list(problems)
+        super().__init__("\n".join(self.problems))
+
+
+# ──────────────────────────────────────────────────────────────
+# Source Files & Validation
+# ──────────────────────────────────────────────────────────────
+
+def _parse_csv_value(field, value):
+    if field == "weight":
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    if field == "reverse" and value.strip().lower() in ("true", "false"):
+        return value.strip().lower() == "true"
+    return value
+
+
+def read_bank_file(path) -> dict:
+    """Parse a bank file into ``{lens: [question, ...]}`` (no validation).
+
+    JSON and TOML hold one list of questions per lens; CSV has one row per
+    question with a leading ``lens`` column.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+
+    if suffix == ".json":
+        with path.open(encoding="utf-8") as f:
+            return json.load(f)
+    if suffix == ".toml":
+        with path.open("rb") as f:
+            return tomllib.load(f)
+    if suffix == ".csv":
+        bank = {}
+        with path.open(encoding="utf-8", newline="") as f:
+            for row in csv.DictReader(f):
+                lens = row.pop("lens")
+                q = {k: _parse_csv_value(k, v) for k, v in row.items()}
+                bank.setdefault(lens, []).append(q)
+        return bank
+
+    raise BankError([f"{path}: unsupported bank format {suffix!r} (use .json, .toml or .csv)"])
+
+
+def validate_bank(bank, variables=VARIABLES) -> list:
+    """Return a list of human-readable problems; empty means the bank is valid."""
+    if not isinstance(bank, dict):
+        return ["bank must map lens names to lists of questions"]
+
+    problems = []
+    seen = {}  # qid -> lens
+    lo, hi = WEIGHT_RANGE
+
+    for lens, questions in bank.items():
+        if not isinstance(questions, list):
+            problems.append(f"{lens}: expected a list of questions")
+            continue
+
+        for n, q in enumerate(questions):
+            where = f"{lens}[{n}]"
+            if not isinstance(q, dict):
+                problems.append(f"{where}: expected an object")
+                continue
+
+            qid = q.get("id")
+            if isinstance(qid, str) and qid:
+                where = f"{lens}/{qid}"
+                if qid in seen:
+                    problems.append(f"{where}: duplicate id (also in {seen[qid]})")
+                else:
+                    seen[qid] = lens
+            elif "id" in q:
+                problems.append(f"{where}: id must be a non-empty string")
+
+            missing = [k for k in FIELDS if k not in q]
+            unknown = [k for k in q if k not in FIELDS]
+            if missing:
+                problems.append(f"{where}: missing {', '.join(missing)}")
+            if unknown:
+                problems.append(f"{where}: unknown field(s) {', '.join(unknown)}")
+
+            text = q.get("text")
+            if "text" in q and not (isinstance(text, str) and text.strip()):
+                problems.append(f"{where}: text must be a non-empty string")
+
+            var = q.get("variable")
+            if "variable" in q and var not in variables:
+                problems.append(f"{where}: unknown variable {var!r}")
+
+            w = q.get("weight")
+            if "weight" in q:
+                if isinstance(w, bool) or not isinstance(w, (int, float)):
+                    problems.append(f"{where}: weight must be a number, got {w!r}")
+                elif not lo <= w <= hi:
+                    problems.append(f"{where}: weight {w} outside {lo}–{hi}")
+
+            if "reverse" in q and not isinstance(q["reverse"], bool):
+                problems.append(f"{where}: reverse must be true/false, got {q['reverse']!r}")
+
+    return problems
+
+
+# ──────────────────────────────────────────────────────────────
+# Binary Snapshot
+# ──────────────────────────────────────────────────────────────
+#
+# Layout (little-endian, sections 8-byte aligned):
+#   header           _HEADER
+#   string offsets   u32[n_strings + 1]   into the UTF-8 blob
+#   weight           f64[n_questions]
+#   id, text         u32[n_questions] each (string indexes)
+#   lens, variable   u8[n_questions] each (codes into the name tables)
+#   reverse          u8[n_questions]
+#   lens names       u32[n_lenses]        (string indexes)
+#   variable names   u32[n_vars]          (string indexes)
+#   blob             UTF-8, every distinct string stored once
+
+_MAGIC = b"TFQB"
+_FORMAT = 1
+_HEADER = struct.Struct("<4sHHIHHIIqq16s")
+
+
+def _pad8(n):
+    return -n % 8
+
+
+def write_snapshot(bank: "CompiledBank", path, source_stat=None):
+    """Serialize ``bank`` to ``path``; ``source_stat`` ties it to its source file."""
+    strings = {}  # str -> index; interns every repeated name/id/text
+
+    def intern(s):
+        return strings.setdefault(s, len(strings))
+
+    lenses = list(bank.lenses)
+    variables = []
+    for lens in lenses:
+        for var in bank.variables(lens):
+            if var not in variables:
+                variables.append(var)
+    var_code = {v: i for i, v in enumerate(variables)}
+
+    weight, ids, texts = array("d"), array("I"), array("I")
+    lens_col, var_col, rev_col = array("B"), array("B"), array("B")
+    for code, lens in enumerate(lenses):
+        for q in bank.questions(lens):
+            weight.append(float(q.get("weight", 1.0)))
+            ids.append(intern(q["id"]))
+            texts.append(intern(q["text"]))
+            lens_col.append(code)
+            var_col.append(var_code[q["variable"]])
+            rev_col.append(bool(q.get("reverse", False)))
+    lens_names = array("I", (intern(l) for l in lenses))
+    var_names = array("I", (intern(v) for v in variables))
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = array("I", [0])
+    for b in encoded:
+        offsets.append(offsets[-1] + len(b))
+    blob = b"".join(encoded)
+
+    size, mtime = (source_stat.st_size, source_stat.st_mtime_ns) if source_stat else (0, 0)
+    header = _HEADER.pack(
+        _MAGIC, _FORMAT, len(lenses), len(weight), len(variables), 0,
+        len(strings), len(blob), size, mtime, bytes.fromhex(bank.version),
+    )
+
+    parts = [header]
+    for col in (offsets, weight, ids, texts, lens_col, var_col, rev_col, lens_names, var_names):
+        raw = col.tobytes()
+        parts.append(raw + b"\0" * _pad8(len(raw)))
+    parts.append(blob)
+
+    tmp = Path(path).with_suffix(".tmp")
+    tmp.write_bytes(b"".join(parts))
+    tmp.replace(path)
+
+
+class BankSnapshot:
+    """A snapshot file mapped for reading; columns are memoryviews into it until ``close``."""
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        mv = self._mv = memoryview(self._mm)
+
+        (magic, fmt, n_lenses, n, n_vars, _, n_strings, blob_size,
+         self.source_size, self.source_mtime_ns, version) = _HEADER.unpack_from(mv)
+        if magic != _MAGIC or fmt != _FORMAT:
+            raise BankError([f"{path}: not a format-{_FORMAT} bank snapshot"])
+        self.version = version.hex()
+
+        pos = _HEADER.size
+
+        def column(fmt, count, itemsize):
+            nonlocal pos
+            nbytes = count * itemsize
+            col = mv[pos:pos + nbytes].cast(fmt)
+            pos += nbytes + _pad8(nbytes)
+            return col
+
+        self.offsets = column("I", n_strings + 1, 4)
+        self.weight = column("d", n, 8)
+        self.id = column("I", n, 4)
+        self.text = column("I", n, 4)
+        self.lens = column("B", n, 1)
+        self.variable = column("B", n, 1)
+        self.reverse = column("B", n, 1)
+        lens_names = column("I", n_lenses, 4)
+        var_names = column("I", n_vars, 4)
+        self._blob = mv[pos:pos + blob_size]
+
+        self.lens_names = tuple(self.string(i) for i in lens_names)
+        self.var_names = tuple(self.string(i) for i in var_names)
+
+    def __len__(self):
+        return len(self.id)
+
+    def string(self, index: int) -> str:
+        return sys.intern(str(self._blob[self.offsets[index]:self.offsets[index + 1]], "utf-8"))
+
+    def is_fresh(self, source_path) -> bool:
+        st = Path(source_path).stat()
+        return (st.st_size, st.st_mtime_ns) == (self.source_size, self.source_mtime_ns)
+
+    def close(self):
+        """Release the columns and unmap the file; ``to_bank`` results stay valid."""
+        for view in (self.offsets, self.weight, self.id, self.text, self.lens, self.variable,
+                     self.reverse, self._blob, self._mv):
+            view.release()
+        self._mm.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def to_bank(self) -> dict:
+        """The bank as plain ``{lens: [question, ...]}``, copied out of the file."""
+        bank = {lens: [] for lens in self.lens_names}
+        for i in range(len(self)):
+            bank[self.lens_names[self.lens[i]]].append({
+                "id": self.string(self.id[i]),
+                "text": self.string(self.text[i]),
+                "variable": self.var_names[self.variable[i]],
+                "weight": self.weight[i],
+                "reverse": bool(self.reverse[i]),
+            })
+        return bank
+
+
+def snapshot_path(source_path) -> Path:
+    return Path(source_path).with_suffix(".qbank")
+
+
+def synonyms_path(source_path) -> Path:
+    source_path = Path(source_path)
+    return source_path.with_name(f"{source_path.stem}.synonyms.json")
+
+
+def read_synonyms(path) -> dict:
+    """``{word: term}`` from a synonyms file of ``{term: [word, ...]}``; empty if there is none."""
+    path = Path(path)
+    if not path.exists():
+        return {}
+    with path.open(encoding="utf-8") as f:
+        groups = json.load(f)
+    if not isinstance(groups, dict):
+        raise BankError([f"{path}: expected an object mapping a term to the words folded onto it"])
+    synonyms, problems = {}, []
+    for term, words in groups.items():
+        if not (isinstance(words, list) and all(isinstance(w, str) and w.islower() for w in words)):
+            problems.append(f"{path}: {term}: expected a list of lower-case words")
+            continue
+        for word in words:
+            if synonyms.setdefault(word, term) != term:
+                problems.append(f"{path}: {word!r} is listed under both {synonyms[word]!r} and {term!r}")
+    if problems:
+        raise BankError(problems)
+    return synonyms
+
+
+def read_weights(path) -> dict:
+    """``{qid: weight}`` from a weights file (as written by ``trifactor.calibration``)."""
+    with Path(path).open(encoding="utf-8") as f:
+        weights = json.load(f)
+    if not isinstance(weights, dict):
+        raise BankError([f"{path}: expected an object mapping question ids to weights"])
+    return weights
+
+
+def apply_weights(bank: dict, weights: dict) -> list:
+    """Override item weights in a parsed bank in place; returns problems (unknown ids)."""
+    found = set()
+    for questions in bank.values():
+        for q in questions:
+            if q["id"] in weights:
+                q["weight"] = weights[q["id"]]
+                found.add(q["id"])
+    return [f"weights: unknown question id {qid!r}" for qid in weights if qid not in found]
+
+
+@timed("bank.load")
+def load_bank(path=DEFAULT_BANK_PATH, use_snapshot=True, weights=None) -> "CompiledBank":
+    """Load, validate and compile a bank file.
+
+    With ``use_snapshot`` a fresh snapshot is read instead of parsing the
+    source; a stale or missing one is (re)written after validation when the
+    directory is writable.
+
+    ``weights`` (a weights file path) overrides item weights after loading;
+    the overridden bank is validated again and gets its own version (so
+    cached results are not reused), but keeps its ``layout``.
+
+    The bank's synonyms file (``synonyms_path``), if any, is read every time.
+    """
+    path = Path(path)
+    snap = snapshot_path(path)
+    synonyms = read_synonyms(synonyms_path(path))
+
+    if use_snapshot and snap.exists():
+        try:
+            with BankSnapshot(snap) as snapshot:
+                fresh = snapshot.is_fresh(path)
+                raw = snapshot.to_bank() if fresh else None
+                version = snapshot.version
+            if fresh:
+                if weights is None:
+                    return CompiledBank(raw, version=version, synonyms=synonyms)
+                return _reweighted(raw, weights, version, synonyms)
+        except (BankError, OSError, ValueError, struct.error):
+            pass  # corrupt or foreign file: rebuild from source
+
+    raw = read_bank_file(path)
+    problems = validate_bank(raw)
+    if problems:
+        raise BankError([f"{path}: {p}" for p in problems])
+
+    bank = CompiledBank(raw, synonyms=synonyms)
+
+    if use_snapshot:
+        try:
+            write_snapshot(bank, snap, path.stat())
+        except OSError:
+            pass  # read-only deploy: keep serving from the parsed source
+    return bank if weights is None else _reweighted(raw, weights, bank.version, synonyms)
+
+
+def _reweighted(raw: dict, weights, base_version, synonyms) -> "CompiledBank":
+    problems = apply_weights(raw, read_weights(weights))
+    problems += [f"{weights}: {p}" for p in validate_bank(raw)]
+    if problems:
+        raise BankError(problems)
+    bank = CompiledBank(raw, synonyms=synonyms)
+    bank.base_version = base_version
+    return bank
+
+
+# ──────────────────────────────────────────────────────────────
+# Compiled Bank
+# ──────────────────────────────────────────────────────────────
+
+
+class CompiledBank:
+    """Read-only index over a question bank.
+
+    Question dicts are shared, never copied: every lookup returns the same
+    objects that sit in the source bank, so session state can hold them
+    without duplicating text.
+    """
+
+    def __init__(self, bank: dict, version: str = None, synonyms: dict = None):
+        # Content hash of the bank; changes whenever any question changes.
+        self.version = version or hashlib.blake2b(
+            json.dumps(bank, sort_keys=True).encode("utf-8"), digest_size=16
+        ).hexdigest()
+        # Hash of lens names and question ids in order only: what stored bank indexes depend on.
+        # Unlike ``version`` it survives text and weight edits (e.g. a weights file).
+        self.layout = hashlib.blake2b(
+            json.dumps([[lens, [q["id"] for q in qs]] for lens, qs in bank.items()]).encode("utf-8"),
+            digest_size=16,
+        ).hexdigest()
+        self.base_version = self.version  # content version before any weights file was applied
+        self.lenses = tuple(bank)
+        self.by_lens = {}      # lens -> tuple of question dicts
+        self.by_id = {}        # qid -> question dict
+        self.lens_of = {}      # qid -> lens
+        self.position = {}     # qid -> index in its lens array
+        self.buckets = {}      # (lens, variable) -> tuple of question dicts
+        self.weights = {}      # lens -> array('d') aligned with by_lens[lens]
+        self.reverse = {}      # lens -> array('b') aligned with by_lens[lens]
+        self.index = {}        # qid -> bank-wide index (Bitset membership, QuestionList, ScoreAccumulator)
+        self._alias = {}       # (lens, variable or None) -> AliasTable, built on first use
+        self._near_duplicates = None  # NearDuplicateIndex, built on first use
+        self.synonyms = synonyms or {}  # word -> term, from the bank's synonyms file
+
+        # Struct-of-arrays record per bank-wide index; variables are small interned codes.
+        self.by_index = []             # index -> question dict
+        self.var_names = []            # code -> variable name
+        self.var_index = {}            # variable name -> code
+        self.var_code = array("B")     # index -> variable code
+        self.item_weight = array("d")  # index -> weight
+        self.item_reverse = array("b") # index -> reverse-scored flag
+
+        for lens, questions in bank.items():
+            questions = tuple(questions)
+            self.by_lens[lens] = questions
+            self.weights[lens] = array("d", (float(q.get("weight", 1.0)) for q in questions))
+            self.reverse[lens] = array("b", (bool(q.get("reverse", False)) for q in questions))
+
+            buckets = {}
+            for i, q in enumerate(questions):
+                qid = q["id"]
+                if qid in self.by_id:
+                    raise ValueError(f"Duplicate question id {qid!r} in lens {lens!r}")
+                self.by_id[qid] = q
+                self.lens_of[qid] = lens
+                self.position[qid] = i
+                self.index[qid] = len(self.index)
+                self.by_index.append(q)
+                var = q["variable"] = sys.intern(q["variable"])
+                if var not in self.var_index:
+                    self.var_index[var] = len(self.var_names)
+                    self.var_names.append(var)
+                self.var_code.append(self.var_index[var])
+                self.item_weight.append(float(q.get("weight", 1.0)))
+                self.item_reverse.append(bool(q.get("reverse", False)))
+                buckets.setdefault(var, []).append(q)
+
+            for var, qs in buckets.items():
+                self.buckets[(lens, var)] = tuple(qs)
+
+    def questions(self, lens: str) -> tuple:
+        return self.by_lens.get(lens, ())
+
+    def get(self, qid: str):
+        return self.by_id.get(qid)
+
+    def bucket(self, lens: str, var: str) -> tuple:
+        return self.buckets.get((lens, var), ())
+
+    def variables(self, lens: str) -> list:
+        return [var for (l, var) in self.buckets if l == lens]
+
+    @timed("bank.sample")
+    def sample(self, lens: str, k: int, rng=random) -> list:
+        """Random sample of ``k`` questions (or all if fewer) from one lens.
+
+        No two picks are near-duplicates: a pick that duplicates an earlier
+        one is swapped for a random question that duplicates none of them.
+        Duplicates come back only once the lens has run out of others.
+        """
+        questions = self.questions(lens)
+        k = min(k, len(questions))
+        picks = rng.sample(questions, k=k)
+        index, neighbors = self.index, self.near_duplicates().neighbors
+
+        blocked, selected = set(), []  # blocked: bank indexes of near-duplicates of a pick
+        for q in picks:
+            i = index[q["id"]]
+            if i not in blocked:
+                blocked.update(neighbors.get(i, ()))
+                selected.append(q)
+        if len(selected) == k:
+            return selected
+
+        taken = blocked.union(index[q["id"]] for q in picks)
+        rest = [q for q in questions if index[q["id"]] not in taken]
+        for q in rng.sample(rest, k=len(rest)):
+            if len(selected) == k:
+                break
+            i = index[q["id"]]
+            if i not in blocked:
+                blocked.update(neighbors.get(i, ()))
+                selected.append(q)
+        if len(selected) < k:  # the lens has too few distinct questions
+            chosen = {q["id"] for q in selected}
+            selected += [q for q in picks if q["id"] not in chosen][:k - len(selected)]
+        return selected
+
+    def near_duplicates(self) -> NearDuplicateIndex:
+        """Near-duplicate index over every question, built on first use."""
+        if self._near_duplicates is None:
+            self._near_duplicates = NearDuplicateIndex(self)
+        return self._near_duplicates
+
+    @timed("bank.alias")
+    def alias(self, lens: str, var: str = None) -> AliasTable:
+        """Item-weighted alias table over one bucket (or the whole lens if ``var`` is None)."""
+        table = self._alias.get((lens, var))
+        if table is None:
+            questions = self.questions(lens) if var is None else self.bucket(lens, var)
+            table = AliasTable(questions, [float(q.get("weight", 1.0)) for q in questions])
+            self._alias[(lens, var)] = table
+        return table
+
+    def question_list(self, questions=()) -> "QuestionList":
+        return QuestionList(self, questions)
+
+    def id_set(self, qids=()) -> Bitset:
+        """Bitset over bank indexes holding ``qids`` (unknown ids are ignored)."""
+        index = self.index
+        return Bitset(len(index), (index[qid] for qid in qids if qid in index))
+
+
+class QuestionList:
+    """List-like sequence of bank questions stored as two-byte bank indexes.
+
+    Iterating, indexing and slicing yield the bank's shared question dicts,
+    so it stands in for a list of questions in session state at a fraction
+    of the memory.
+    """
+
+    __slots__ = ("bank", "indexes")
+
+    def __init__(self, bank: CompiledBank, questions=()):
+        self.bank = bank
+        self.indexes = array("H", (bank.index[q["id"]] for q in questions))
+
+    @classmethod
+    def from_ids(cls, bank: CompiledBank, qids):
+        ql = cls(bank)
+        ql.indexes.extend(bank.index[qid] for qid in qids)
+        return ql
+
+    def __len__(self):
+        return len(self.indexes)
+
+    def __iter__(self):
+        by_index = self.bank.by_index
+        return (by_index[i] for i in self.indexes)
+
+    def __getitem__(self, i):
+        by_index = self.bank.by_index
+        if isinstance(i, slice):
+            return [by_index[j] for j in self.indexes[i]]
+        return by_index[self.indexes[i]]
+
+    def append(self, q):
+        self.indexes.append(self.bank.index[q["id"]])
+
+    def ids(self) -> list:
+        by_index = self.bank.by_index
+        return [by_index[i]["id"] for i in self.indexes]
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Validate a question bank file.")
+    parser.add_argument("path", nargs="?", default=DEFAULT_BANK_PATH)
+    parser.add_argument("--snapshot", action="store_true", help="also write the binary snapshot")
+    parser.add_argument("--lint", action="store_true", help="also list clusters of near-duplicate questions")
+    args = parser.parse_args(argv)
+
+    try:
+        raw = read_bank_file(args.path)
+        synonyms = read_synonyms(synonyms_path(args.path))
+    except (OSError, ValueError) as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    problems = validate_bank(raw)
+    for p in problems:
+        print(f"{args.path}: {p}", file=sys.stderr)
+    if problems:
+        return 1
+
+    bank = CompiledBank(raw, synonyms=synonyms)
+    print(f"OK: {len(bank.by_id)} questions across {len(bank.lenses)} lenses (version {bank.version})")
+    if args.snapshot:
+        out = snapshot_path(args.path)
+        write_snapshot(bank, out, Path(args.path).stat())
+        print(f"Snapshot written to {out}")
+    if args.lint:
+        lint_near_duplicates(bank)
+    return 0
+
+
+def lint_near_duplicates(bank: CompiledBank, out=sys.stdout):
+    """Print each cluster of near-duplicate questions with its closest pair's similarity."""
+    near = bank.near_duplicates()
+    clusters = near.clusters()
+    best = {}  # bank index -> highest similarity to a neighbour
+    for sim, i, j in near.pairs:
+        best.setdefault(i, sim)
+        best.setdefault(j, sim)
+    for group in clusters:
+        top = max(best[bank.index[q["id"]]] for q in group)
+        print(f"near-duplicates ({len(group)} questions, similarity up to {top:.2f}):", file=out)
+        for q in group:
+            print(f"  {bank.lens_of[q['id']]}/{q['id']} [{q['variable']}] {q['text']}", file=out)
+    print(f"{len(clusters)} near-duplicate cluster(s) at similarity ≥ {near.threshold}", file=out)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
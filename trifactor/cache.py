@@ -0,0 +1,86 @@
+"""Content-addressed cache for computed results.
+
+A result depends only on the bank, the variable weights, the lens and the
+answers given, so ``fingerprint`` hashes exactly those. The answers are
+hashed as sorted (qid, answer) pairs. Refreshing, revisiting or sharing a
+result therefore hits the cache no matter which session or order produced
+the answers.
+
+The key includes the bank version and the current ``VARIABLE_WEIGHTS``.
+Editing either one changes every key, so stale entries are never served;
+they just age out.
+
+``ResultCache`` evicts least recently used entries past ``max_entries`` and
+drops entries older than ``ttl`` seconds on access, so memory stays bounded.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from trifactor import metrics
+from trifactor.scoring import VARIABLE_WEIGHTS
+
+
+def fingerprint(bank_version: str, lens: str, answers) -> str:
+    """Hash of the bank version, variable weights, lens and ``answers`` ({qid: answer} or pairs)."""
+    pairs = sorted(answers.items() if hasattr(answers, "items") else answers)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr((bank_version, sorted(VARIABLE_WEIGHTS.items()), lens)).encode("utf-8"))
+    for qid, answer in pairs:
+        h.update(f"\x1f{qid}\x1e{answer}".encode("utf-8"))
+    return h.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, max_entries=4096, ttl=3600.0, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        """The cached value, or None if absent or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """Cached value for ``key``, computing and storing it on a miss.
+
+        Values are shared between callers and must be treated as read-only.
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            metrics.inc("result_cache", outcome="hit")
+            return value
+        self.misses += 1
+        metrics.inc("result_cache", outcome="miss")
+        value = compute()
+        self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,246 @@
+"""Item analysis: how well each question discriminates, from streaming sufficient statistics.
+
+Each completed session is folded in once; sessions flagged for response
+quality (``trifactor.quality``) are skipped. Within each (lens, variable) a
+session's answered items update:
+
+- per item: n, Σx, Σx², Σr, Σr², Σxr, where x is the reverse-adjusted item
+  score and r the mean of the session's other items for that variable;
+- per pair of items answered together: n, Σx, Σy, Σx², Σy², Σxy.
+
+The item-rest (corrected item-total) correlation comes from the item sums.
+Sessions answer a random subset of each bucket, so Cronbach's alpha is the
+standardized form k·r̄ / (1 + (k−1)·r̄). Here r̄ is the mean pairwise
+inter-item correlation and k the mean number of items a session answers
+for the variable, so alpha is the reliability of the score as administered.
+
+Suggested weights are proportional to item-rest correlation (floored at
+``MIN_CORRELATION``). They are rescaled so the variable's mean weight is
+unchanged, then clamped to the bank's ``WEIGHT_RANGE``. Items with fewer
+than ``MIN_RESPONSES`` responses keep their weight. ``VARIABLE_WEIGHTS``
+express how much each area matters and are not calibrated.
+
+State (sums plus the last result id folded in) is saved as JSON, so each
+report reads only the sessions completed since the previous one:
+
+    python -m trifactor.calibration --store sqlite:///sessions.db --state calibration.json \\
+        --weights-out weights.json
+    TRIFACTOR_WEIGHTS=weights.json streamlit run App.py
+"""
+
+import argparse
+import json
+import os
+import sys
+from itertools import combinations
+from math import sqrt
+from pathlib import Path
+
+from trifactor.bank import WEIGHT_RANGE, load_bank
+from trifactor.scoring import clamp, parse_answer
+from trifactor.storage import DEFAULT_STORE_URL, open_store
+
+MIN_RESPONSES = 30      # responses (with a rest score) before an item's weight is recalibrated
+MIN_PAIR_RESPONSES = 10 # co-answers before a pair counts towards r̄
+MIN_CORRELATION = 0.05  # floor for item-rest correlation when deriving weights
+WEAK_ITEM = 0.2         # item-rest correlation below this flags the item
+
+
+def correlation(n, sx, sy, sxx, syy, sxy):
+    """Pearson correlation from sums, or None when either side has no variance."""
+    if n < 2:
+        return None
+    vx, vy = sxx - sx * sx / n, syy - sy * sy / n
+    if vx <= 1e-12 or vy <= 1e-12:
+        return None
+    return (sxy - sx * sy / n) / sqrt(vx * vy)
+
+
+def _add(sums, x, y):
+    sums[0] += 1
+    sums[1] += x
+    sums[2] += y
+    sums[3] += x * x
+    sums[4] += y * y
+    sums[5] += x * y
+
+
+class ItemAnalysis:
+    """Streaming item statistics for one bank, fed one completed session at a time."""
+
+    def __init__(self, bank):
+        self.bank = bank
+        self.items = {}      # qid -> [n, Σx, Σr, Σx², Σr², Σxr]
+        self.pairs = {}      # (qid, qid) sorted -> [n, Σx, Σy, Σx², Σy², Σxy]
+        self.variables = {}  # (lens, variable) -> [sessions, Σ items answered]
+        self.watermark = 0   # last store result id folded in
+
+    def add_session(self, answers):
+        """Fold in one session's ``{qid: answer}``; unknown ids and invalid answers are skipped."""
+        bank = self.bank
+        groups = {}  # (lens, variable) -> [(qid, x)]
+        for qid, answer in answers.items():
+            i = bank.index.get(qid)
+            a = parse_answer(answer)
+            if i is None or a is None:
+                continue
+            x = (4 - a) if bank.item_reverse[i] else a
+            groups.setdefault((bank.lens_of[qid], bank.var_names[bank.var_code[i]]), []).append((qid, x))
+
+        for key, answered in groups.items():
+            seen = self.variables.setdefault(key, [0, 0])
+            seen[0] += 1
+            seen[1] += len(answered)
+            if len(answered) < 2:
+                continue
+            total, k = sum(x for _, x in answered), len(answered)
+            for qid, x in answered:
+                _add(self.items.setdefault(qid, [0.0] * 6), x, (total - x) / (k - 1))
+            for (qa, xa), (qb, xb) in combinations(sorted(answered), 2):
+                _add(self.pairs.setdefault((qa, qb), [0.0] * 6), xa, xb)
+
+    def sync(self, store):
+        """Fold in sessions completed in ``store`` since the last sync; returns how many."""
+        n = 0
+        for rid, state in store.completed_since(self.watermark):
+            self.add_session(state["answers"])
+            self.watermark = rid
+            n += 1
+        return n
+
+    # ──────────────────────────────────────────────────────────────
+    # Statistics
+    # ──────────────────────────────────────────────────────────────
+
+    def item_rest(self, qid):
+        sums = self.items.get(qid)
+        return None if sums is None else correlation(*sums)
+
+    def variable_report(self, lens, var) -> dict:
+        """Reliability and per-item statistics for one (lens, variable) bucket."""
+        bucket = self.bank.bucket(lens, var)
+        ids = {q["id"] for q in bucket}
+        sessions, answered = self.variables.get((lens, var), (0, 0))
+        k = answered / sessions if sessions else 0.0
+
+        rs = [
+            r for (qa, qb), sums in self.pairs.items()
+            if qa in ids and sums[0] >= MIN_PAIR_RESPONSES and (r := correlation(*sums)) is not None
+        ]
+        mean_r = sum(rs) / len(rs) if rs else None
+        alpha = None
+        if mean_r is not None and k > 1:
+            alpha = k * mean_r / (1 + (k - 1) * mean_r)
+
+        items = []
+        for q in bucket:
+            sums = self.items.get(q["id"])
+            n = int(sums[0]) if sums else 0
+            items.append({
+                "qid": q["id"],
+                "n": n,
+                "mean": sums[1] / n if n else None,
+                "item_rest": self.item_rest(q["id"]),
+                "weight": float(q.get("weight", 1.0)),
+            })
+        _suggest_weights(items)
+        return {"lens": lens, "variable": var, "sessions": sessions, "items_per_session": k,
+                "mean_inter_item_r": mean_r, "alpha": alpha, "items": items}
+
+    def report(self) -> list:
+        return [self.variable_report(lens, var) for lens, var in self.bank.buckets]
+
+    def suggested_weights(self) -> dict:
+        """``{qid: weight}`` for every item whose suggested weight differs from its current one."""
+        return {
+            item["qid"]: item["suggested"]
+            for rep in self.report() for item in rep["items"]
+            if item["suggested"] != item["weight"]
+        }
+
+    # ──────────────────────────────────────────────────────────────
+    # Persistence
+    # ──────────────────────────────────────────────────────────────
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "watermark": self.watermark,
+            "items": self.items,
+            "pairs": {f"{a}\t{b}": sums for (a, b), sums in self.pairs.items()},
+            "variables": {f"{lens}\t{var}": v for (lens, var), v in self.variables.items()},
+        })
+
+    @classmethod
+    def from_json(cls, bank, text):
+        raw = json.loads(text)
+        ia = cls(bank)
+        ia.watermark = raw["watermark"]
+        ia.items = raw["items"]
+        ia.pairs = {tuple(key.split("\t")): sums for key, sums in raw["pairs"].items()}
+        ia.variables = {tuple(key.split("\t")): v for key, v in raw["variables"].items()}
+        return ia
+
+
+def _suggest_weights(items):
+    """Set ``item["suggested"]``: weight ∝ item-rest correlation, same mean weight per variable."""
+    lo, hi = WEIGHT_RANGE
+    rated = [it for it in items if it["n"] >= MIN_RESPONSES and it["item_rest"] is not None]
+    for it in items:
+        it["suggested"] = it["weight"]
+    if not rated:
+        return
+    raw = [max(it["item_rest"], MIN_CORRELATION) for it in rated]
+    scale = sum(it["weight"] for it in rated) / sum(raw)
+    for it, r in zip(rated, raw):
+        it["suggested"] = round(clamp(r * scale, lo, hi), 2)
+
+
+def _fmt(x, spec=".2f"):
+    return "—" if x is None else format(x, spec)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Item analysis and weight recalibration from completed sessions.")
+    parser.add_argument("--store", default=DEFAULT_STORE_URL, help="session store URL")
+    parser.add_argument("--weights", default=os.environ.get("TRIFACTOR_WEIGHTS"),
+                        help="weights file the app runs with (default: $TRIFACTOR_WEIGHTS)")
+    parser.add_argument("--state", help="JSON file of running statistics, read and updated in place")
+    parser.add_argument("--weights-out", help="write suggested weights ({qid: weight}) here")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    bank = load_bank(weights=args.weights)
+    state = Path(args.state) if args.state else None
+    analysis = ItemAnalysis.from_json(bank, state.read_text()) if state and state.exists() else ItemAnalysis(bank)
+
+    store = open_store(args.store, bank)
+    try:
+        added = analysis.sync(store)
+    finally:
+        store.close()
+    if state:
+        tmp = state.with_suffix(".tmp")
+        tmp.write_text(analysis.to_json())
+        tmp.replace(state)
+
+    report = analysis.report()
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print(f"{added} new session(s) folded in (through result {analysis.watermark})")
+        print(f"{'lens':<14}{'variable':<12}{'sessions':>9}{'k':>6}{'r̄':>7}{'alpha':>7}  weak items")
+        for rep in report:
+            weak = [it["qid"] for it in rep["items"]
+                    if it["n"] >= MIN_RESPONSES and (it["item_rest"] is None or it["item_rest"] < WEAK_ITEM)]
+            print(f"{rep['lens']:<14}{rep['variable']:<12}{rep['sessions']:>9}{rep['items_per_session']:>6.1f}"
+                  f"{_fmt(rep['mean_inter_item_r']):>7}{_fmt(rep['alpha']):>7}  {', '.join(weak) or '—'}")
+
+    if args.weights_out:
+        weights = analysis.suggested_weights()
+        Path(args.weights_out).write_text(json.dumps(weights, indent=2, sort_keys=True) + "\n")
+        print(f"{len(weights)} weight change(s) written to {args.weights_out}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
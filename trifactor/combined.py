@@ -0,0 +1,132 @@
+"""Combined runs: every lens in one session, scored per lens and pooled per variable.
+
+All lenses measure the same variables (Baseline … Feedback) through their
+own questions. A combined run samples from every lens at once and keeps one
+``ScoreAccumulator`` per lens. Each lens is therefore scored on its own
+questions. Because the running sums add up, the same answers also give a
+pooled cross-lens score per variable at no extra cost. One combined session
+yields the full variable × lens matrix that used to take one session per
+lens.
+
+    scores = CombinedScores(bank)
+    for q in pick_combined_questions(bank, seed=7):
+        scores.set(q, ask(q))
+    matrix = scores.matrix()                                 # {variable: {lens: info or None}}
+    overall, per_variable, scored_items = scores.result()    # pooled across lenses
+
+``CombinedScores`` has the same interface as ``ScoreAccumulator``, so
+pages and caches that take one accept the other.
+"""
+
+import random
+from itertools import chain, zip_longest
+
+from trifactor.accumulator import ScoreAccumulator
+from trifactor.metrics import timed
+from trifactor.scoring import choose_followup_targets, pick_followup_questions
+
+COMBINED_LENS = "All Lenses"  # stored as the session's lens; results pool under it
+PER_LENS = 12                 # initial questions per lens (3 × 12 instead of 3 × 25)
+FOLLOWUPS_PER_LENS = 4
+
+
+def _interleave(groups) -> list:
+    """Round-robin over ``groups`` so every page of questions spans the lenses."""
+    return [q for row in zip_longest(*groups) for q in row if q is not None]
+
+
+@timed("combined.pick_initial")
+def pick_combined_questions(bank, lenses=None, per_lens=PER_LENS, rng=random, seed=None):
+    """``per_lens`` random questions from each lens (or all if fewer), interleaved."""
+    if seed is not None:
+        rng = random.Random(seed)
+    return _interleave(bank.sample(lens, per_lens, rng) for lens in lenses or bank.lenses)
+
+
+@timed("combined.pick_followups")
+def pick_combined_followups(bank, scores, already_asked_ids, per_lens=FOLLOWUPS_PER_LENS,
+                            rng=random, seed=None):
+    """Up to ``per_lens`` follow-ups per lens, aimed at that lens's own weakest variables.
+
+    Returns ``(questions, targets)`` with ``targets`` as ``{lens: [variable, ...]}``.
+    """
+    if seed is not None:
+        rng = random.Random(seed)
+
+    asked = set(already_asked_ids)
+    picks, targets = [], {}
+    for lens, acc in scores.by_lens.items():
+        per_var = acc.per_variable()
+        targets[lens] = choose_followup_targets(per_var)
+        picks.append(pick_followup_questions(
+            bank, lens, targets[lens], asked, n=per_lens, rng=rng, per_variable=per_var
+        ))
+    return _interleave(picks), targets
+
+
+class CombinedScores:
+    """Running scores for a combined run: one accumulator per lens, pooled on demand."""
+
+    __slots__ = ("bank", "by_lens")
+
+    def __init__(self, bank, lenses=None):
+        self.bank = bank
+        self.by_lens = {lens: ScoreAccumulator(bank) for lens in lenses or bank.lenses}
+
+    @classmethod
+    def from_answers(cls, bank, questions, answers):
+        scores = cls(bank)
+        for q in questions:
+            if q["id"] in answers:
+                scores.set(q, answers[q["id"]])
+        return scores
+
+    def _acc(self, qid):
+        return self.by_lens.get(self.bank.lens_of.get(qid))
+
+    def __len__(self):
+        return sum(len(acc) for acc in self.by_lens.values())
+
+    def get(self, qid):
+        acc = self._acc(qid)
+        return None if acc is None else acc.get(qid)
+
+    def set(self, q, answer) -> bool:
+        return self.by_lens[self.bank.lens_of[q["id"]]].set(q, answer)
+
+    def discard(self, qid):
+        acc = self._acc(qid)
+        if acc is not None:
+            acc.discard(qid)
+
+    def items(self):
+        return chain.from_iterable(acc.items() for acc in self.by_lens.values())
+
+    def answers(self) -> dict:
+        return {qid: a for acc in self.by_lens.values() for qid, a in acc.answers().items()}
+
+    def pooled(self) -> ScoreAccumulator:
+        """Every lens's answers in one accumulator (variables scored across lenses)."""
+        return ScoreAccumulator.merged(self.by_lens.values())
+
+    def per_variable(self) -> dict:
+        return self.pooled().per_variable()
+
+    def overall(self, per_variable=None) -> float:
+        return self.pooled().overall(per_variable)
+
+    def lowest(self, k=None, var=None) -> list:
+        return self.pooled().lowest(k, var)
+
+    def result(self):
+        return self.pooled().result()
+
+    def matrix(self) -> dict:
+        """``{variable: {lens: {"pct", "zone", "volatility"} or None}}`` for every variable answered anywhere."""
+        per_lens = {lens: acc.per_variable() for lens, acc in self.by_lens.items()}
+        variables = dict.fromkeys(var for pv in per_lens.values() for var in pv)
+        return {var: {lens: pv.get(var) for lens, pv in per_lens.items()} for var in variables}
+
+    def lens_overall(self) -> dict:
+        """``{lens: overall}`` for every lens with answers."""
+        return {lens: acc.overall() for lens, acc in self.by_lens.items() if len(acc)}
@@ -0,0 +1,167 @@
+"""Export of scored sessions: raw items, per-variable scores and the overall score.
+
+Every session becomes a run of flat records sharing one schema (``COLUMNS``):
+
+    kind="item"      qid, variable, answer, score (reverse-adjusted), weight
+    kind="variable"  variable, pct, zone, volatility
+    kind="overall"   pct (the overall score), zone
+
+Records come from generators and are encoded ``CHUNK_ROWS`` at a time (one
+Parquet row group or Arrow record batch per chunk), so exporting every
+stored session streams with memory bounded by one chunk. Parquet and Arrow
+need ``pyarrow``, which is imported only when one of them is written.
+
+    python -m trifactor.export -o results.csv
+    python -m trifactor.export --store sqlite:///sessions.db -o results.parquet
+"""
+
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from itertools import islice
+
+from trifactor.accumulator import ScoreAccumulator
+from trifactor.bank import load_bank
+from trifactor.combined import CombinedScores
+from trifactor.scoring import zone_name
+from trifactor.storage import DEFAULT_STORE_URL, open_store
+
+COLUMNS = ("session", "lens", "kind", "qid", "variable", "answer", "score", "weight", "pct", "zone", "volatility")
+FORMATS = {  # format -> MIME type
+    "csv": "text/csv",
+    "jsonl": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.file",
+}
+CHUNK_ROWS = 5000
+
+
+def chunked(iterable, size):
+    it = iter(iterable)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+
+# ──────────────────────────────────────────────────────────────
+# Records
+# ──────────────────────────────────────────────────────────────
+
+def session_records(token, lens, scores):
+    """Records for one session from its running scores (``ScoreAccumulator`` or ``CombinedScores``)."""
+    base = {"session": token, "lens": lens}
+    for var, score, weight, q, answer in scores.items():
+        yield {**base, "kind": "item", "qid": q["id"], "variable": var,
+               "answer": answer, "score": score, "weight": weight}
+    per_var = scores.per_variable()
+    for var, info in per_var.items():
+        yield {**base, "kind": "variable", "variable": var,
+               "pct": info["pct"], "zone": info["zone"], "volatility": info["volatility"]}
+    overall = scores.overall(per_var)
+    yield {**base, "kind": "overall", "pct": overall, "zone": zone_name(overall)}
+
+
+def stored_scores(bank, state):
+    """Rebuild a stored session's scores from its saved state and answers."""
+    questions = [bank.by_id[qid] for qid in (*state["questions"], *state["followups"]) if qid in bank.by_id]
+    scores_cls = CombinedScores if state["mode"] == "combined" else ScoreAccumulator
+    return scores_cls.from_answers(bank, questions, state["answers"])
+
+
+def store_records(store, bank):
+    """Records for every session in ``store``, one session at a time."""
+    for token, state in store.iter_sessions():
+        yield from session_records(token, state["lens"], stored_scores(bank, state))
+
+
+# ──────────────────────────────────────────────────────────────
+# Encoders
+# ──────────────────────────────────────────────────────────────
+
+def iter_csv(records):
+    """CSV text in chunks of ``CHUNK_ROWS`` rows, header first."""
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, COLUMNS, lineterminator="\n")
+    writer.writeheader()
+    for chunk in chunked(records, CHUNK_ROWS):
+        writer.writerows(chunk)
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()  # header of an empty export
+
+
+def iter_jsonl(records):
+    """JSON Lines text in chunks of ``CHUNK_ROWS`` records (absent columns are omitted)."""
+    for chunk in chunked(records, CHUNK_ROWS):
+        yield "".join(json.dumps(rec) + "\n" for rec in chunk)
+
+
+def _arrow_schema():
+    import pyarrow as pa
+
+    return pa.schema([
+        ("session", pa.string()), ("lens", pa.string()), ("kind", pa.string()),
+        ("qid", pa.string()), ("variable", pa.string()), ("answer", pa.int8()),
+        ("score", pa.int8()), ("weight", pa.float64()), ("pct", pa.float64()),
+        ("zone", pa.string()), ("volatility", pa.float64()),
+    ])
+
+
+def write_columnar(records, out, fmt="parquet"):
+    """Write ``records`` to binary ``out`` as Parquet (one row group per chunk) or an Arrow IPC file."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _arrow_schema()
+    writer = pq.ParquetWriter(out, schema) if fmt == "parquet" else pa.ipc.new_file(out, schema)
+    with writer:
+        for chunk in chunked(records, CHUNK_ROWS):
+            writer.write_table(pa.Table.from_pylist(chunk, schema=schema))
+
+
+def write_export(records, fmt, out):
+    """Stream ``records`` to the binary file ``out`` in ``fmt`` (a key of ``FORMATS``)."""
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown export format {fmt!r} (use {', '.join(FORMATS)})")
+    if fmt in ("parquet", "arrow"):
+        write_columnar(records, out, fmt)
+        return
+    for text in (iter_csv if fmt == "csv" else iter_jsonl)(records):
+        out.write(text.encode("utf-8"))
+
+
+def export_bytes(records, fmt) -> bytes:
+    out = io.BytesIO()
+    write_export(records, fmt, out)
+    return out.getvalue()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export every stored session as flat records.")
+    parser.add_argument("-o", "--output", default="-", help="output file (default: stdout)")
+    parser.add_argument("--format", choices=FORMATS, help="default: from the output suffix, else csv")
+    parser.add_argument("--store", default=DEFAULT_STORE_URL, help="session store URL")
+    parser.add_argument("--weights", default=os.environ.get("TRIFACTOR_WEIGHTS"),
+                        help="weights file the app runs with (default: $TRIFACTOR_WEIGHTS)")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or next((f for f in FORMATS if args.output.endswith(f".{f}")), "csv")
+    bank = load_bank(weights=args.weights)
+    store = open_store(args.store, bank)
+    try:
+        if args.output == "-":
+            write_export(store_records(store, bank), fmt, sys.stdout.buffer)
+        else:
+            with open(args.output, "wb") as out:
+                write_export(store_records(store, bank), fmt, out)
+    finally:
+        store.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
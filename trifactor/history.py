@@ -0,0 +1,105 @@
+"""Per-user score history: append-only runs with incrementally maintained trends.
+
+Each completed run is appended to its user's series for that lens, and the
+series' ``Trend`` is updated from the new run alone, in O(variables). The
+store saves the trend next to the series, so showing it never rereads or
+re-scores earlier runs, however long the history. Tracked per variable
+(and overall, under ``OVERALL``):
+
+- delta: the change since the variable's previous run;
+- slope: least-squares points per run, kept as running means and a
+  co-moment (Welford-style, like ``PopulationIndex``);
+- zone transitions: each change of zone and the run it happened on (the
+  most recent ``TRANSITIONS_KEPT``).
+"""
+
+import json
+
+from trifactor.population import OVERALL
+from trifactor.scoring import zone_name
+
+TRANSITIONS_KEPT = 10
+
+
+class VariableTrend:
+    __slots__ = ("count", "mean_run", "mean_pct", "m2_run", "co", "pct", "zone", "delta", "transitions")
+
+    def __init__(self):
+        self.count = 0
+        self.mean_run = 0.0
+        self.mean_pct = 0.0
+        self.m2_run = 0.0   # Σ (run - mean_run)²
+        self.co = 0.0       # Σ (run - mean_run)(pct - mean_pct)
+        self.pct = None     # latest score
+        self.zone = None
+        self.delta = None   # latest minus previous score
+        self.transitions = []  # [run, from_zone, to_zone], oldest first
+
+    def add(self, run, pct, zone):
+        self.count += 1
+        d_run = run - self.mean_run
+        self.mean_run += d_run / self.count
+        self.mean_pct += (pct - self.mean_pct) / self.count
+        self.m2_run += d_run * (run - self.mean_run)
+        self.co += d_run * (pct - self.mean_pct)
+
+        if self.pct is not None:
+            self.delta = pct - self.pct
+            if zone != self.zone:
+                self.transitions.append([run, self.zone, zone])
+                del self.transitions[:-TRANSITIONS_KEPT]
+        self.pct, self.zone = pct, zone
+
+    @property
+    def slope(self) -> float:
+        """Least-squares change in points per run (0 until there are two runs)."""
+        return self.co / self.m2_run if self.m2_run > 0 else 0.0
+
+    def to_list(self) -> list:
+        return [getattr(self, name) for name in self.__slots__]
+
+    @classmethod
+    def from_list(cls, values):
+        vt = cls()
+        for name, value in zip(cls.__slots__, values):
+            setattr(vt, name, value)
+        return vt
+
+
+class Trend:
+    """Running trend of one user's series for one lens."""
+
+    __slots__ = ("runs", "last_at", "variables")
+
+    def __init__(self):
+        self.runs = 0
+        self.last_at = None
+        self.variables = {}  # variable (or OVERALL) -> VariableTrend
+
+    def add(self, overall, per_variable, completed_at):
+        """Fold in the next run of the series."""
+        self.runs += 1
+        self.last_at = completed_at
+        for var, info in per_variable.items():
+            self.variables.setdefault(var, VariableTrend()).add(self.runs, info["pct"], info["zone"])
+        self.variables.setdefault(OVERALL, VariableTrend()).add(self.runs, overall, zone_name(overall))
+
+    @property
+    def overall(self) -> VariableTrend:
+        return self.variables.get(OVERALL) or VariableTrend()
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "runs": self.runs,
+            "last_at": self.last_at,
+            "variables": {var: vt.to_list() for var, vt in self.variables.items()},
+        })
+
+    @classmethod
+    def from_json(cls, text):
+        raw = json.loads(text)
+        trend = cls()
+        trend.runs = raw["runs"]
+        trend.last_at = raw["last_at"]
+        trend.variables = {var: VariableTrend.from_list(v) for var, v in raw["variables"].items()}
+        return trend
@@ -0,0 +1,239 @@
+"""Opt-in latency histograms and counters for the hot paths.
+
+Set ``TRIFACTOR_METRICS=1`` before the process starts to turn recording on.
+When it is off, ``timed`` returns the function it decorates unchanged and
+``span`` returns a shared no-op context, so instrumented code runs at full
+speed.
+
+    @timed("scoring.compute_scores")
+    def compute_scores(...): ...
+
+    with span("render.results"):
+        ...
+
+    inc("reruns", stage="results", scope="fragment")
+
+Latencies go into fixed log-spaced buckets, so recording is O(log buckets)
+and memory does not grow with traffic. ``render_prometheus`` formats
+everything in the Prometheus text exposition format. ``write_textfile``
+writes it for a node_exporter textfile collector, and ``serve`` exposes it
+over HTTP on a side port. Served metrics (here and at the JSON API's
+``/metrics``) need ``Authorization: Bearer $TRIFACTOR_ADMIN_TOKEN``, the
+token that unlocks the app's admin views; without one set they are not
+served at all.
+"""
+
+import os
+import secrets
+import threading
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from functools import wraps
+from pathlib import Path
+
+ENABLED = os.environ.get("TRIFACTOR_METRICS", "") not in ("", "0")
+
+# 10 µs … 10 s, 1-2.5-5 steps
+BUCKETS = tuple(m * 10.0 ** e for e in range(-5, 1) for m in (1, 2.5, 5)) + (10.0,)
+
+_NULL = nullcontext()
+
+
+class Histogram:
+    __slots__ = ("counts", "count", "sum")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def quantile(self, q) -> float:
+        """Estimate of the ``q`` quantile (0–1), interpolated within its bucket."""
+        if not self.count:
+            return float("nan")
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lo = BUCKETS[i - 1] if i > 0 else 0.0
+                hi = BUCKETS[i] if i < len(BUCKETS) else BUCKETS[-1]
+                return lo + (hi - lo) * (rank - seen) / n
+            seen += n
+        return BUCKETS[-1]
+
+
+class Registry:
+    def __init__(self):
+        self.histograms = {}   # span name -> Histogram
+        self.counters = {}     # (name, sorted label items) -> int
+        self._lock = threading.Lock()
+
+    def observe(self, name, seconds):
+        with self._lock:
+            hist = self.histograms.get(name)
+            if hist is None:
+                hist = self.histograms[name] = Histogram()
+            hist.observe(seconds)
+
+    def inc(self, name, n=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def counts(self, name) -> list:
+        """``(labels dict, value)`` for every series of counter ``name``."""
+        with self._lock:
+            return [(dict(labels), n) for (key, labels), n in sorted(self.counters.items()) if key == name]
+
+    def summary(self) -> list:
+        """One row per span: count, mean and p50/p95/p99 in milliseconds, slowest total first."""
+        with self._lock:
+            rows = [
+                {
+                    "span": name,
+                    "count": h.count,
+                    "mean ms": h.sum / h.count * 1e3,
+                    "p50 ms": h.quantile(0.50) * 1e3,
+                    "p95 ms": h.quantile(0.95) * 1e3,
+                    "p99 ms": h.quantile(0.99) * 1e3,
+                    "total s": h.sum,
+                }
+                for name, h in self.histograms.items() if h.count
+            ]
+        return sorted(rows, key=lambda r: -r["total s"])
+
+    def render_prometheus(self) -> str:
+        lines = [
+            "# HELP trifactor_span_seconds Latency of instrumented functions and page renders.",
+            "# TYPE trifactor_span_seconds histogram",
+        ]
+        with self._lock:
+            for name, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS + (float("inf"),), h.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    lines.append(f'trifactor_span_seconds_bucket{{span="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'trifactor_span_seconds_sum{{span="{name}"}} {h.sum!r}')
+                lines.append(f'trifactor_span_seconds_count{{span="{name}"}} {h.count}')
+
+            families = {}
+            for (name, labels), n in sorted(self.counters.items()):
+                families.setdefault(name, []).append((labels, n))
+        for name, samples in families.items():
+            lines.append(f"# TYPE trifactor_{name}_total counter")
+            for labels, n in samples:
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"trifactor_{name}_total{{{label_text}}} {n}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+# ──────────────────────────────────────────────────────────────
+# Recording
+# ──────────────────────────────────────────────────────────────
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        # Also records spans cut short by st.rerun()/st.stop(), which unwind via exceptions.
+        REGISTRY.observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def span(name):
+    return _Span(name) if ENABLED else _NULL
+
+
+def timed(name):
+    """Decorator recording every call's latency under ``name``; a no-op when metrics are off."""
+    def decorate(fn):
+        if not ENABLED:
+            return fn
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                REGISTRY.observe(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+def inc(name, n=1, **labels):
+    if ENABLED:
+        REGISTRY.inc(name, n, **labels)
+
+
+# ──────────────────────────────────────────────────────────────
+# Export
+# ──────────────────────────────────────────────────────────────
+
+_written_at = 0.0
+
+
+def write_textfile(path, min_interval=0.0):
+    """Atomically write the metrics to ``path``, at most once per ``min_interval`` seconds."""
+    global _written_at
+    now = time.monotonic()
+    if now - _written_at < min_interval:
+        return
+    _written_at = now
+    path = Path(path)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(REGISTRY.render_prometheus())
+    os.replace(tmp, path)
+
+
+def authorized(authorization) -> bool:
+    """Whether an ``Authorization`` header value carries the admin token (never, if none is set)."""
+    token = os.environ.get("TRIFACTOR_ADMIN_TOKEN", "")
+    scheme, _, given = (authorization or "").partition(" ")
+    if not token or scheme.lower() != "bearer":
+        return False
+    return secrets.compare_digest(given.strip().encode(), token.encode())
+
+
+def serve(port, host="0.0.0.0"):
+    """Serve ``/metrics`` on a daemon thread; returns the server (``shutdown()`` to stop)."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # only the exporting process pays for it
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            if not authorized(self.headers.get("Authorization")):
+                self.send_error(401)
+                return
+            body = REGISTRY.render_prometheus().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
@@ -0,0 +1,90 @@
+"""Result narrative: zone messages, lens focus, variable labels and pressure summaries.
+
+Texts live in locale packs, one JSON file per locale in ``locales/`` next to
+this module. A pack is loaded the first time its locale is asked for and
+compiled once per process into flat lookup tables:
+
+- keys become plain ``zone`` / ``lens`` / ``(lens, variable)`` keys, so every
+  lookup is one dict probe;
+- templates are checked at load time and kept as bound ``str.format``
+  methods, and each rendered summary is memoized per (lens, variable),
+  since both come from small fixed sets.
+
+A pack may be partial; anything it leaves out falls back to
+``DEFAULT_LOCALE``.
+
+    text = get_pack("en")
+    text.variable_translation("Financial", "Resources")   # "Income, buffer, tools"
+    text.pressure_focus_summary("Financial", "Buffer")
+"""
+
+import json
+from functools import cache
+from pathlib import Path
+from string import Formatter
+
+LOCALE_DIR = Path(__file__).with_name("locales")
+DEFAULT_LOCALE = "en"
+TEMPLATE_FIELDS = {"var"}  # placeholders a pressure template may use
+ANY_LENS = "*"             # pressure template for lenses without their own
+
+
+def available_locales() -> list:
+    return sorted(p.stem for p in LOCALE_DIR.glob("*.json"))
+
+
+def _compile(template: str, where: str):
+    fields = {name for _, name, _, _ in Formatter().parse(template) if name is not None}
+    if not fields <= TEMPLATE_FIELDS:
+        raise ValueError(f"{where}: unknown placeholder(s) {', '.join(sorted(fields - TEMPLATE_FIELDS))}")
+    return template.format
+
+
+class NarrativePack:
+    """Compiled texts for one locale; every lookup is a single dict probe."""
+
+    __slots__ = ("locale", "_zones", "_focus", "_variables", "_pressure", "_rendered")
+
+    def __init__(self, locale: str, raw: dict, fallback: "NarrativePack" = None):
+        self.locale = locale
+        self._zones = dict(fallback._zones) if fallback else {}
+        self._focus = dict(fallback._focus) if fallback else {}
+        self._variables = dict(fallback._variables) if fallback else {}
+        self._pressure = dict(fallback._pressure) if fallback else {}
+
+        self._zones.update(raw.get("zones", {}))
+        self._focus.update(raw.get("lens_focus", {}))
+        for lens, labels in raw.get("variables", {}).items():
+            self._variables.update(((lens, var), label) for var, label in labels.items())
+        for lens, template in raw.get("pressure", {}).items():
+            self._pressure[lens] = _compile(template, f"{locale}: pressure[{lens!r}]")
+        self._rendered = {}  # (lens, var) -> pressure summary
+
+    def zone_message(self, zone: str) -> str:
+        return self._zones[zone]
+
+    def lens_focus(self, lens: str) -> str:
+        return self._focus[lens]
+
+    def variable_translation(self, lens: str, var: str) -> str:
+        """The lens's label for ``var``, or ``var`` itself if the lens has none."""
+        return self._variables.get((lens, var), var)
+
+    def pressure_focus_summary(self, lens: str, weakest_var: str) -> str:
+        text = self._rendered.get((lens, weakest_var))
+        if text is None:
+            template = self._pressure.get(lens) or self._pressure[ANY_LENS]
+            text = self._rendered[(lens, weakest_var)] = template(var=weakest_var)
+        return text
+
+
+@cache
+def get_pack(locale: str = DEFAULT_LOCALE) -> NarrativePack:
+    """The compiled pack for ``locale``, loaded on first use; ValueError if there is none."""
+    locales = available_locales()
+    if locale not in locales:
+        raise ValueError(f"unknown locale {locale!r} (available: {', '.join(locales)})")
+    with (LOCALE_DIR / f"{locale}.json").open(encoding="utf-8") as f:
+        raw = json.load(f)
+    fallback = None if locale == DEFAULT_LOCALE else get_pack(DEFAULT_LOCALE)
+    return NarrativePack(locale, raw, fallback)
@@ -0,0 +1,157 @@
+"""Population statistics over completed diagnostics.
+
+``PopulationIndex`` keeps, per (lens, variable), a running count, mean and
+variance (Welford) plus a fixed-bin histogram of scores on the 0–100 scale
+backed by a Fenwick tree. Adding a result and answering "what percentile is
+this score" are both O(log bins), independent of how many sessions have
+been recorded. The overall score is tracked under the variable name
+``OVERALL``.
+
+The index is fed incrementally from a session store: ``sync`` pulls only
+results recorded since the last call, so every replica converges on the
+same population without rescanning history. Results flagged for response
+quality (``trifactor.quality``) are not part of the population.
+"""
+
+import threading
+import time
+from math import sqrt
+
+from trifactor.metrics import timed
+
+OVERALL = "Overall"
+BINS = 200           # 0.5-point bins over 0–100
+MIN_POPULATION = 20  # below this, percentiles are too noisy to show
+
+
+class Histogram:
+    """Fixed-bin histogram over [0, 100] with O(log n) updates and rank queries."""
+
+    __slots__ = ("bins", "tree", "total")
+
+    def __init__(self, bins=BINS):
+        self.bins = bins
+        self.tree = [0] * (bins + 1)  # Fenwick tree, 1-based
+        self.total = 0
+
+    def _bin(self, x) -> int:
+        return min(max(int(x / 100 * self.bins), 0), self.bins - 1)
+
+    def add(self, x, count=1):
+        self.total += count
+        i = self._bin(x) + 1
+        while i <= self.bins:
+            self.tree[i] += count
+            i += i & -i
+
+    def _prefix(self, i) -> int:
+        """Number of values in bins [0, i)."""
+        n = 0
+        while i > 0:
+            n += self.tree[i]
+            i -= i & -i
+        return n
+
+    def percentile(self, x) -> float:
+        """Share of values below ``x`` (half of its own bin counted), 0–100."""
+        if not self.total:
+            return 0.0
+        b = self._bin(x)
+        below, through = self._prefix(b), self._prefix(b + 1)
+        return (below + (through - below) / 2) / self.total * 100
+
+    def quantile(self, q) -> float:
+        """Approximate value at quantile ``q`` (0–1): midpoint of the bin holding it."""
+        if not self.total:
+            return float("nan")
+        target = max(1, round(q * self.total))
+        pos, step = 0, 1 << self.bins.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.bins and self.tree[nxt] < target:
+                pos = nxt
+                target -= self.tree[nxt]
+            step >>= 1
+        return (pos + 0.5) * 100 / self.bins
+
+
+class VariableStats:
+    __slots__ = ("count", "mean", "m2", "hist")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.hist = Histogram()
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        self.hist.add(x)
+
+    @property
+    def sd(self) -> float:
+        return sqrt(self.m2 / self.count) if self.count > 1 else 0.0
+
+
+class PopulationIndex:
+    def __init__(self):
+        self.stats = {}        # (lens, variable) -> VariableStats
+        self.watermark = 0     # last store result id folded in
+        self._lock = threading.Lock()
+        self._sync_lock = threading.Lock()
+        self._synced_at = 0.0
+
+    def add_result(self, lens, overall, per_variable):
+        with self._lock:
+            for var, info in per_variable.items():
+                self._stats(lens, var).add(info["pct"])
+            self._stats(lens, OVERALL).add(overall)
+
+    def _stats(self, lens, var) -> VariableStats:
+        stats = self.stats.get((lens, var))
+        if stats is None:
+            stats = self.stats[(lens, var)] = VariableStats()
+        return stats
+
+    def count(self, lens, var=OVERALL) -> int:
+        stats = self.stats.get((lens, var))
+        return stats.count if stats else 0
+
+    def percentile(self, lens, var, pct):
+        """Percentile of ``pct`` among completed sessions, or None if the population is too small."""
+        stats = self.stats.get((lens, var))
+        if stats is None or stats.count < MIN_POPULATION:
+            return None
+        return stats.hist.percentile(pct)
+
+    def summary(self, lens, var) -> dict:
+        stats = self.stats.get((lens, var))
+        if stats is None:
+            return {"count": 0}
+        h = stats.hist
+        return {
+            "count": stats.count,
+            "mean": stats.mean,
+            "sd": stats.sd,
+            "p25": h.quantile(0.25),
+            "median": h.quantile(0.5),
+            "p75": h.quantile(0.75),
+        }
+
+    @timed("population.sync")
+    def sync(self, store, min_interval=0.0):
+        """Fold in results recorded in ``store`` since the last sync.
+
+        ``min_interval`` (seconds) throttles how often the store is queried.
+        """
+        with self._sync_lock:
+            now = time.monotonic()
+            if now - self._synced_at < min_interval:
+                return
+            self._synced_at = now
+            for rid, lens, overall, per_variable in store.results_since(self.watermark):
+                self.add_result(lens, overall, per_variable)
+                self.watermark = max(self.watermark, rid)
@@ -0,0 +1,108 @@
+"""Follow-up selection, computed speculatively while the initial questions are answered.
+
+Choosing follow-ups means scoring the answers, picking target variables and
+drawing questions. ``select_followups`` does all three from plain inputs, so
+it can run anywhere. ``FollowupPrefetch`` runs it on a worker thread each
+time a session's answers change. When the user asks for follow-ups, the
+prefetched set is handed over if it was computed from exactly the current
+answers (waiting for it if it is mid-computation); otherwise (stale,
+still queued or failed) the caller selects synchronously, as before.
+
+Every selection is keyed by the bank version, lens, seed and answer
+fingerprint, so a prefetched set is always the one synchronous selection
+would have produced and seeded runs replay identically. A newer submission
+for a session supersedes (and cancels, if not started) the previous one.
+
+    prefetch = FollowupPrefetch(bank)
+    prefetch.submit(token, lens, questions, answers, seed)   # after each page
+    ...
+    picked = prefetch.take(token, lens, questions, answers, seed)
+    followups, targets = picked or select_followups(bank, lens, questions, answers, seed)
+"""
+
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from trifactor import metrics
+from trifactor.accumulator import ScoreAccumulator
+from trifactor.cache import fingerprint
+from trifactor.combined import COMBINED_LENS, CombinedScores, pick_combined_followups
+from trifactor.metrics import timed
+from trifactor.scoring import choose_followup_targets, pick_followup_questions
+
+FOLLOWUPS = 10       # follow-ups in a single-lens run
+MAX_PENDING = 1024   # sessions with a prefetch outstanding; the oldest are dropped past this
+
+
+@timed("prefetch.select")
+def select_followups(bank, lens, questions, answers, seed):
+    """``(followups, targets)`` for a run's initial ``questions`` and their ``answers``."""
+    scores_cls = CombinedScores if lens == COMBINED_LENS else ScoreAccumulator
+    scores = scores_cls.from_answers(bank, questions, answers)
+    per_var = scores.per_variable()
+    targets = choose_followup_targets(per_var)
+    already = {q["id"] for q in questions}
+    if lens == COMBINED_LENS:
+        # Each lens aims at its own weakest variables
+        followups, _ = pick_combined_followups(bank, scores, already, seed=seed)
+    else:
+        followups = pick_followup_questions(
+            bank, lens, targets, already, n=FOLLOWUPS, per_variable=per_var, seed=seed
+        )
+    return followups, targets
+
+
+class FollowupPrefetch:
+    """Per-session speculative ``select_followups`` on a shared worker thread."""
+
+    def __init__(self, bank, workers=1):
+        self.bank = bank
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="followup-prefetch")
+        self._pending = OrderedDict()  # session token -> (key, Future), oldest first
+        self._lock = threading.Lock()
+
+    def _key(self, lens, questions, answers, seed) -> str:
+        asked = [(q["id"], answers.get(q["id"])) for q in questions]
+        return f"{seed}:{fingerprint(self.bank.version, lens, asked)}"
+
+    def submit(self, token, lens, questions, answers, seed):
+        """Start selecting follow-ups for the current answers, superseding any earlier request."""
+        questions, answers = list(questions), dict(answers)  # snapshot: the session keeps changing
+        key = self._key(lens, questions, answers, seed)
+        with self._lock:
+            previous = self._pending.pop(token, None)
+            if previous is not None:
+                if previous[0] == key:
+                    self._pending[token] = previous
+                    return
+                previous[1].cancel()
+            future = self._pool.submit(select_followups, self.bank, lens, questions, answers, seed)
+            self._pending[token] = (key, future)
+            while len(self._pending) > MAX_PENDING:
+                self._pending.popitem(last=False)[1][1].cancel()
+
+    def take(self, token, lens, questions, answers, seed):
+        """The prefetched ``(followups, targets)`` if ready and current, else None."""
+        with self._lock:
+            pending = self._pending.pop(token, None)
+        if pending is None:
+            outcome = "miss"
+        elif pending[0] != self._key(lens, questions, answers, seed):
+            pending[1].cancel()
+            outcome = "stale"
+        elif pending[1].cancel():
+            outcome = "queued"  # not started yet: selecting here is no slower
+        else:
+            try:
+                picked = pending[1].result()  # done, or running and about to be
+            except Exception:
+                outcome = "failed"
+            else:
+                metrics.inc("followup_prefetch", outcome="hit")
+                return picked
+        metrics.inc("followup_prefetch", outcome=outcome)
+        return None
+
+    def close(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,146 @@
+"""Response quality: flags for runs whose answers say more about the clicking than the person.
+
+``QualityTracker`` is updated with each answer change as it is captured,
+alongside the running scores. It keeps no answers of its own (the session's
+scores already hold them; callers pass the previous answer), only O(1)
+counts and sums per answer value and per variable. A completed run's
+``flags()`` name what looks wrong:
+
+- ``straight_lining``: the raw answers (as clicked, before reverse scoring)
+  barely vary, e.g. "Sometimes" on every radio. Judged by their standard
+  deviation on the 0–4 scale against ``MIN_SD``.
+- ``reverse_inconsistent``: reverse-scored and plain items of the same
+  variable disagree. Example: "Almost always" to both i06 ("say yes when
+  you mean no") and i08 ("communicate your limits early"). Per variable, the
+  gap between the mean reverse-adjusted score of each direction is averaged
+  (weighted by the smaller side's count), and flagged at ``MAX_REVERSE_GAP``.
+- ``speeding``: answers captured by this tracker came in faster than
+  ``MIN_SECONDS_PER_ITEM`` each on average, counted from when it started.
+
+Nothing is flagged from fewer than ``MIN_ITEMS`` answers (``MIN_REVERSE_PAIRS``
+for the reverse check). A tracker rebuilt from stored answers
+(``from_answers``) judges variance and consistency on all of them, but
+timing only on answers captured after the rebuild.
+
+Flagged runs keep their scores for the respondent. The store saves the flags
+with the result, and population statistics and calibration leave flagged
+results out.
+
+    quality = QualityTracker(bank)          # when the run starts
+    previous = scores.get(q["id"])
+    if scores.set(q, answer):               # with every captured answer that changes
+        quality.update(q, previous, answer)
+    store.save_result(token, overall, per_variable, flags=quality.flags())
+"""
+
+import time
+from array import array
+from math import sqrt
+
+from trifactor.scoring import parse_answer
+
+MIN_ITEMS = 10               # answers before any flag is judged
+MIN_SD = 0.5                 # raw answer standard deviation below this is straight-lining
+MAX_REVERSE_GAP = 2.0        # mean reverse vs plain gap (0–4 scale) at which answers contradict
+MIN_REVERSE_PAIRS = 3        # Σ min(plain, reverse) answers per variable before the gap is judged
+MIN_SECONDS_PER_ITEM = 1.5   # faster than this on average is not reading the questions
+
+FLAGS = ("straight_lining", "reverse_inconsistent", "speeding")
+
+FWD_N, FWD_SUM, REV_N, REV_SUM = range(4)  # per-variable row: plain count, Σ score, reverse count, Σ score
+ROW = 4
+
+
+class QualityTracker:
+    """Running response-quality statistics for one session."""
+
+    __slots__ = ("bank", "counts", "sums", "started", "last", "timed")
+
+    def __init__(self, bank, started=None):
+        self.bank = bank
+        self.counts = array("I", bytes(4 * 5))  # answers per raw value
+        self.sums = array("d", bytes(8 * ROW * len(bank.var_names)))  # ROW doubles per variable code
+        self.started = time.monotonic() if started is None else started
+        self.last = self.started          # when the latest timed answer arrived
+        self.timed = 0                    # answers given (not changed) through this tracker
+
+    @classmethod
+    def from_answers(cls, bank, answers):
+        """A tracker over stored ``{qid: answer}``; timing starts now, with none of them timed."""
+        tracker = cls(bank)
+        for qid, answer in answers.items():
+            a = parse_answer(answer)
+            if qid in bank.by_id and a is not None:
+                tracker._count(bank.index[qid], a, 1)
+        return tracker
+
+    def __len__(self):
+        return sum(self.counts)
+
+    def update(self, q, previous, answer, at=None):
+        """Apply question ``q``'s answer changing from ``previous`` (None if unanswered) to ``answer``.
+
+        Invalid answers count as unanswered, as in scoring.
+        """
+        i = self.bank.index[q["id"]]
+        old, a = parse_answer(previous), parse_answer(answer)
+        if old == a:
+            return
+        if old is not None:
+            self._count(i, old, -1)
+        if a is not None:
+            self._count(i, a, 1)
+            if old is None:
+                self.timed += 1
+                self.last = time.monotonic() if at is None else at
+
+    def _count(self, i, a, sign):
+        bank = self.bank
+        self.counts[a] += sign
+        base = bank.var_code[i] * ROW
+        if bank.item_reverse[i]:
+            self.sums[base + REV_N] += sign
+            self.sums[base + REV_SUM] += sign * (4 - a)
+        else:
+            self.sums[base + FWD_N] += sign
+            self.sums[base + FWD_SUM] += sign * a
+
+    # ──────────────────────────────────────────────────────────────
+    # Statistics
+    # ──────────────────────────────────────────────────────────────
+
+    def answer_sd(self) -> float:
+        """Standard deviation of the raw answers."""
+        n = len(self)
+        if n < 2:
+            return 0.0
+        s1 = sum(a * c for a, c in enumerate(self.counts))
+        s2 = sum(a * a * c for a, c in enumerate(self.counts))
+        return sqrt(max(n * s2 - s1 * s1, 0)) / n
+
+    def reverse_gap(self):
+        """``(mean gap, pairs)`` between plain and reverse items of the same variable."""
+        sums, gap, pairs = self.sums, 0.0, 0
+        for base in range(0, len(sums), ROW):
+            fwd_n, fwd_sum, rev_n, rev_sum = sums[base:base + ROW]
+            if fwd_n and rev_n:
+                w = min(fwd_n, rev_n)
+                gap += w * abs(fwd_sum / fwd_n - rev_sum / rev_n)
+                pairs += w
+        return (gap / pairs if pairs else 0.0), int(pairs)
+
+    def seconds_per_item(self):
+        """Mean seconds per timed answer, or None if none were timed."""
+        return (self.last - self.started) / self.timed if self.timed else None
+
+    def flags(self) -> tuple:
+        """Names (from ``FLAGS``) of the checks the answers so far fail."""
+        flags = []
+        if len(self) >= MIN_ITEMS and self.answer_sd() < MIN_SD:
+            flags.append("straight_lining")
+        gap, pairs = self.reverse_gap()
+        if pairs >= MIN_REVERSE_PAIRS and gap >= MAX_REVERSE_GAP:
+            flags.append("reverse_inconsistent")
+        if self.timed >= MIN_ITEMS and self.seconds_per_item() < MIN_SECONDS_PER_ITEM:
+            flags.append("speeding")
+        return tuple(flags)
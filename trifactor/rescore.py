@@ -0,0 +1,165 @@
+"""Headless bulk rescoring of stored sessions.
+
+Reads session records as JSON Lines and writes one scored record per input
+line, in order. Records are streamed in fixed-size chunks through the
+vectorized engine, so memory stays flat however large the input is.
+
+Input record::
+
+    {"id": "...", "lens": "Financial", "question_ids": ["f01", ...], "answers": {"f01": 3, ...}}
+
+``id`` is optional and echoed back; ``question_ids`` defaults to the answer
+keys. Output record::
+
+    {"id": ..., "lens": ..., "overall": 61.2, "per_variable": {...}, "targets": [...]}
+
+Records that cannot be scored (bad JSON, a record of the wrong shape,
+unknown question ids) produce ``{"line": N, "error": "..."}`` instead.
+
+    python -m trifactor.rescore sessions.jsonl -o scored.jsonl --workers 4
+    python -m trifactor.rescore sessions.jsonl -o rescored.jsonl --weights weights.json
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from trifactor.bank import DEFAULT_BANK_PATH, load_bank
+from trifactor.export import chunked
+from trifactor.scoring import choose_followup_targets
+from trifactor.vectorized import ItemTable, score_arrays
+
+DEFAULT_CHUNK_SIZE = 5000
+
+_table = None  # per-process ItemTable, built once by _init_worker
+
+
+def _init_worker(bank_path, weights):
+    global _table
+    _table = ItemTable(load_bank(bank_path, weights=weights))
+
+
+def read_records(lines):
+    """Yield ``(line_no, record, parse_error)`` for each non-blank JSONL line.
+
+    Exactly one of ``record`` and ``parse_error`` is None, so a record's own
+    fields (even one named ``error``) are never mistaken for a parse failure.
+    """
+    for n, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield n, json.loads(line), None
+        except json.JSONDecodeError as e:
+            yield n, None, f"invalid JSON: {e}"
+
+
+def shape_error(rec):
+    """Why ``rec`` is not a scorable record, or None."""
+    if not isinstance(rec, dict):
+        return "record must be a JSON object"
+    if not isinstance(rec.get("answers") or {}, dict):
+        return "answers must be an object of question id to answer"
+    question_ids = rec.get("question_ids")
+    if question_ids is not None and not (
+        isinstance(question_ids, list) and all(isinstance(qid, str) for qid in question_ids)
+    ):
+        return "question_ids must be a list of question ids"
+    return None
+
+
+def score_chunk(chunk, table=None):
+    """Score one chunk of ``read_records`` triples; returns output records in order."""
+    table = table or _table
+    out = [None] * len(chunk)
+    batch, slots = [], []
+
+    for i, (n, rec, parse_error) in enumerate(chunk):
+        error = parse_error or shape_error(rec)
+        if error:
+            out[i] = {"line": n, "error": error}
+            continue
+        answers = rec.get("answers") or {}
+        question_ids = rec.get("question_ids") or list(answers)
+        unknown = [qid for qid in question_ids if qid not in table.row]
+        if unknown:
+            out[i] = {"line": n, "error": f"unknown question ids: {', '.join(unknown)}"}
+            continue
+        batch.append((question_ids, answers))
+        slots.append(i)
+
+    scores = score_arrays(table.encode(batch))
+    for j, i in enumerate(slots):
+        rec = chunk[i][1]
+        per_var = scores.per_variable(j)
+        out[i] = {
+            "id": rec.get("id"),
+            "lens": rec.get("lens"),
+            "overall": float(scores.overall[j]),
+            "per_variable": per_var,
+            "targets": choose_followup_targets(per_var),
+        }
+    return out
+
+
+def rescore(lines, bank_path=DEFAULT_BANK_PATH, chunk_size=DEFAULT_CHUNK_SIZE, workers=1, weights=None):
+    """Yield scored output records for JSONL ``lines``, preserving input order.
+
+    ``weights`` (a weights file path, see ``trifactor.calibration``) overrides
+    the bank's item weights.
+
+    With ``workers > 1`` chunks are scored in a process pool; at most two
+    chunks per worker are in flight so memory stays bounded.
+    """
+    chunks = chunked(read_records(lines), chunk_size)
+
+    if workers <= 1:
+        table = ItemTable(load_bank(bank_path, weights=weights))
+        for chunk in chunks:
+            yield from score_chunk(chunk, table)
+        return
+
+    with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(bank_path, weights)) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(score_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rescore stored diagnostic sessions (JSON Lines).")
+    parser.add_argument("input", nargs="?", default="-", help="input JSONL file (default: stdin)")
+    parser.add_argument("-o", "--output", default="-", help="output JSONL file (default: stdout)")
+    parser.add_argument("--bank", default=DEFAULT_BANK_PATH, help="question bank file")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=1, help="score chunks in N processes")
+    parser.add_argument("--weights", default=os.environ.get("TRIFACTOR_WEIGHTS"),
+                        help="weights file to score with (default: $TRIFACTOR_WEIGHTS)")
+    args = parser.parse_args(argv)
+
+    src = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    errors = 0
+    try:
+        for rec in rescore(src, args.bank, args.chunk_size, args.workers, args.weights):
+            errors += "error" in rec
+            dst.write(json.dumps(rec) + "\n")
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+
+    if errors:
+        print(f"{errors} record(s) could not be scored", file=sys.stderr)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
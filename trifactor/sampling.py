@@ -0,0 +1,56 @@
+"""Constant-time weighted sampling primitives used by question selection."""
+
+from array import array
+
+
+class AliasTable:
+    """Walker/Vose alias table: O(n) to build, O(1) per weighted draw."""
+
+    __slots__ = ("items", "prob", "alias")
+
+    def __init__(self, items, weights):
+        self.items = tuple(items)
+        n = len(self.items)
+        total = float(sum(weights))
+        scaled = [w * n / total for w in weights] if total > 0 else [1.0] * n
+
+        self.prob = array("d", [1.0]) * n
+        self.alias = array("I", range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s] = scaled[s]
+            self.alias[s] = l
+            scaled[l] += scaled[s] - 1.0
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Leftovers are 1.0 up to rounding; prob already defaults to 1.0.
+
+    def __len__(self):
+        return len(self.items)
+
+    def draw(self, rng):
+        i = int(rng.random() * len(self.items))
+        return self.items[i] if rng.random() < self.prob[i] else self.items[self.alias[i]]
+
+
+class Bitset:
+    """Fixed-size set of small non-negative integers backed by a bytearray."""
+
+    __slots__ = ("bits",)
+
+    def __init__(self, size, members=()):
+        self.bits = bytearray((size + 7) >> 3)
+        for i in members:
+            self.add(i)
+
+    def add(self, i):
+        self.bits[i >> 3] |= 1 << (i & 7)
+
+    def copy(self) -> "Bitset":
+        other = Bitset(0)
+        other.bits = bytearray(self.bits)
+        return other
+
+    def __contains__(self, i):
+        return bool(self.bits[i >> 3] & (1 << (i & 7)))
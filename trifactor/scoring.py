@@ -0,0 +1,215 @@
+"""Scoring and question selection, independent of the UI.
+
+Per-variable percentages, zones, volatility, the overall score, follow-up
+targets and the questions asked. This module (and ``trifactor.bank``) must
+stay cheap to import: no Streamlit, no NumPy. ``compute_scores`` is the
+reference implementation; the batch engine in ``trifactor.vectorized`` must
+match it.
+"""
+
+import random
+from collections import defaultdict
+from statistics import pstdev
+
+from trifactor.metrics import timed
+
+VARIABLE_WEIGHTS = {
+    "Baseline": 1.2,
+    "Clarity": 1.1,
+    "Resources": 1.1,
+    "Boundaries": 1.1,
+    "Execution": 1.2,
+    "Feedback": 1.0,
+}
+
+# Zone cutoffs on the 0–100 scale: below RED_BELOW is RED, below GREEN_FROM is YELLOW.
+RED_BELOW = 45
+GREEN_FROM = 70
+ZONES = ("RED", "YELLOW", "GREEN")
+
+
+def clamp(n, lo, hi):
+    return max(lo, min(hi, n))
+
+
+def zone_name(score: float) -> str:  # 0–100
+    if score < RED_BELOW:
+        return "RED"
+    if score < GREEN_FROM:
+        return "YELLOW"
+    return "GREEN"
+
+
+def parse_answer(value):
+    """Answer as an int 0–4, or None for missing/invalid data."""
+    try:
+        a = int(value)
+    except (ValueError, TypeError, OverflowError):
+        return None
+    return a if 0 <= a <= 4 else None
+
+
+@timed("scoring.compute_scores")
+def compute_scores(questions, answers):
+    """
+    Scores answered questions per variable.
+    Skips invalid/missing answers silently.
+
+    Returns:
+        (overall, per_variable, scored_items)
+        - overall:       VARIABLE_WEIGHTS-weighted mean of per-variable pct (0–100)
+        - per_variable:  {variable: {"pct", "zone", "volatility"}}
+        - scored_items:  list of (var, score, weight, question_dict, original_answer),
+                         lowest score first, then heaviest
+    """
+    per_var_items = defaultdict(list)  # var -> [(score, weight)]
+    scored_items = []
+
+    for q in questions:
+        qid = q["id"]
+        if qid not in answers:
+            continue
+
+        a = parse_answer(answers[qid])
+        if a is None:
+            continue  # skip bad data (empty string, None, text, out of range...)
+
+        # Apply reverse scoring if needed
+        score = (4 - a) if q.get("reverse", False) else a
+
+        var = q["variable"]
+        w = float(q.get("weight", 1.0))
+
+        per_var_items[var].append((score, w))
+        scored_items.append((var, score, w, q, a))
+
+    per_variable = {}
+    for var, vals in per_var_items.items():
+        total_w = sum(w for _, w in vals)
+        if total_w <= 0:
+            continue
+        mean = sum(score * w for score, w in vals) / total_w  # 0–4
+        pct = clamp(mean / 4 * 100, 0, 100)
+        volatility = pstdev([score for score, _ in vals]) / 4 * 100 if len(vals) > 1 else 0.0
+        per_variable[var] = {"pct": pct, "zone": zone_name(pct), "volatility": volatility}
+
+    # Overall weighted score
+    overall_num = overall_den = 0.0
+    for var, info in per_variable.items():
+        w = VARIABLE_WEIGHTS.get(var, 1.0)
+        overall_num += info["pct"] * w
+        overall_den += w
+
+    overall = (overall_num / overall_den) if overall_den > 0 else 0.0
+
+    scored_items.sort(key=lambda x: (x[1], -x[2]))  # lowest first, then heaviest
+
+    return overall, per_variable, scored_items
+
+
+@timed("scoring.choose_followup_targets")
+def choose_followup_targets(per_variable):
+    if not per_variable:
+        return []
+
+    sorted_vars = sorted(per_variable.items(), key=lambda x: x[1]["pct"])
+    weakest = sorted_vars[0][0]
+
+    reds = [v for v, d in per_variable.items() if d["zone"] == "RED" and v != weakest]
+    yellows = [v for v, d in per_variable.items() if d["zone"] == "YELLOW" and v != weakest]
+
+    targets = [weakest] + reds[:2]
+
+    if len(targets) < 3:
+        for v in yellows:
+            if v not in targets:
+                targets.append(v)
+            if len(targets) >= 3:
+                break
+
+    return targets[:3]
+
+
+@timed("scoring.pick_initial_questions")
+def pick_initial_questions(bank, lens, n=25, rng=random, seed=None):
+    """Random sample of ``n`` questions (or all if fewer) from ``lens``."""
+    if seed is not None:
+        rng = random.Random(seed)
+    return bank.sample(lens, n, rng)
+
+
+# Rejected alias draws (already-asked items) before falling back to an exact
+# draw over what is left in the bucket.
+MAX_REJECTIONS = 8
+
+
+def _draw_unasked(bank, table, asked, rng):
+    """One item from ``table`` not in ``asked``, weighted by item weight; None if none left."""
+    index = bank.index
+    for _ in range(MAX_REJECTIONS):
+        q = table.draw(rng)
+        if index[q["id"]] not in asked:
+            return q
+
+    left = [q for q in table.items if index[q["id"]] not in asked]
+    if not left:
+        return None
+    return rng.choices(left, weights=[float(q.get("weight", 1.0)) for q in left])[0]
+
+
+def target_weight(var, per_variable=None) -> float:
+    """How strongly follow-ups lean towards ``var``: 1 + points below GREEN."""
+    if not per_variable or var not in per_variable:
+        return 1.0
+    return 1.0 + max(GREEN_FROM - per_variable[var]["pct"], 0.0)
+
+
+@timed("scoring.pick_followup_questions")
+def pick_followup_questions(bank, lens, targets, already_asked_ids, n=10, rng=random,
+                            per_variable=None, seed=None):
+    """Up to ``n`` unasked questions from ``lens``, drawn towards the target variables.
+
+    Each pick chooses a target variable by ``target_weight`` and then an item
+    from that variable's bucket by item ``weight`` (alias tables, O(1) per
+    draw). Once the targets run dry the rest come from the whole lens.
+    Already-asked questions are never returned, so fewer than ``n`` come
+    back only when the lens is exhausted. Near-duplicates of asked or
+    selected questions are skipped until nothing else is left. Pass
+    ``seed`` for a reproducible selection.
+    """
+    if seed is not None:
+        rng = random.Random(seed)
+
+    asked = bank.id_set(already_asked_ids)
+    near = bank.near_duplicates()
+    avoid = near.around(asked)
+    selected = []
+
+    def take(q):
+        i = bank.index[q["id"]]
+        asked.add(i)
+        near.block(avoid, i)
+        selected.append(q)
+
+    # Priority: targeted variables, no near-duplicates of anything asked
+    pool = [var for var in targets if bank.bucket(lens, var)]
+    weights = [target_weight(var, per_variable) for var in pool]
+    while len(selected) < n and pool:
+        i = rng.choices(range(len(pool)), weights)[0] if len(pool) > 1 else 0
+        q = _draw_unasked(bank, bank.alias(lens, pool[i]), avoid, rng)
+        if q is None:
+            del pool[i], weights[i]
+            continue
+        take(q)
+
+    # Fill from the whole lens: first without near-duplicates, then any not asked
+    if bank.questions(lens):
+        table = bank.alias(lens)
+        for skip in (avoid, asked):
+            while len(selected) < n:
+                q = _draw_unasked(bank, table, skip, rng)
+                if q is None:
+                    break
+                take(q)
+
+    return selected
@@ -0,0 +1,190 @@
+"""Near-duplicate questions: MinHash/LSH index over normalized question terms.
+
+Each question is reduced to a set of terms:
+
+- lower-cased words minus ``STOPWORDS`` (the shared "How often do you feel…"
+  scaffolding), mapped through the bank's synonyms and lightly
+  suffix-stripped;
+- minus terms used by more than ``MAX_DF`` of the lens's questions, which
+  say what the lens is about rather than what the question asks (e.g.
+  "money" in Financial).
+
+Two questions are near-duplicates when the Jaccard similarity of their term
+sets is at least ``THRESHOLD``. A MinHash signature of ``BANDS × ROWS``
+values per question is split into bands, and questions sharing any band
+become candidates, which are then checked against their exact Jaccard. The
+index is built one question at a time, each looked up against the ones
+before it, so building and querying stay sub-linear in the bank size
+rather than comparing every pair.
+
+Synonyms are bank data, not a general thesaurus: ``questions.synonyms.json``
+beside the bank is a curated list of the paraphrases that bank's authors
+use for one idea (see ``trifactor.bank.read_synonyms``). A bank without one
+matches on word forms alone.
+
+    index = bank.near_duplicates()
+    index.neighbors[bank.index["f07"]]         # bank indexes of f30, f48
+    index.similar("How braced do you feel for bad news?", "Financial")
+    index.clusters()                           # [[q, q, q], [q, q], ...]
+"""
+
+import hashlib
+import re
+from array import array
+
+from trifactor.metrics import timed
+from trifactor.sampling import Bitset
+
+THRESHOLD = 0.5  # Jaccard similarity of term sets at which two questions are near-duplicates
+MAX_DF = 0.2     # terms in more than this share of a lens's questions are ignored
+BANDS = 32       # LSH bands × rows per band = MinHash signature length;
+ROWS = 3         # a pair at THRESHOLD becomes a candidate with probability ≈ 0.99
+
+STOPWORDS = frozenset("""
+    a about after an and are as at be before by can do does feel for frequently generally how
+    in is it much now of often on or right that the this to well what when with you your yourself
+""".split())
+
+SUFFIXES = ("ing", "ed", "es", "s", "ly")
+
+_WORD = re.compile(r"[a-z]+")
+
+
+def _stem(word: str) -> str:
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 4:
+            return word[:-len(suffix)]
+    return word
+
+
+def terms(text: str, synonyms=None) -> frozenset:
+    """Normalized content terms of a question (before lens-level pruning).
+
+    ``synonyms`` maps a word to the term it is folded onto.
+    """
+    synonyms = synonyms or {}
+    return frozenset(
+        _stem(synonyms.get(word, word)) for word in _WORD.findall(text.lower()) if word not in STOPWORDS
+    )
+
+
+def jaccard(a, b) -> float:
+    union = len(a | b)
+    return len(a & b) / union if union else 0.0
+
+
+class MinHasher:
+    """``size`` independent 32-bit hashes per term, stable across processes.
+
+    A term's hashes are consecutive 4-byte words of its SHAKE-128 digest,
+    computed once per distinct term; a signature is their element-wise
+    minimum over the term set.
+    """
+
+    __slots__ = ("size", "_hashes")
+
+    def __init__(self, size=BANDS * ROWS):
+        self.size = size
+        self._hashes = {}  # term -> array('I') of ``size`` hashes
+
+    def _term_hashes(self, term: str):
+        h = self._hashes.get(term)
+        if h is None:
+            h = self._hashes[term] = array("I", hashlib.shake_128(term.encode("utf-8")).digest(4 * self.size))
+        return h
+
+    def signature(self, term_set) -> tuple:
+        hashes = [self._term_hashes(t) for t in term_set]
+        return tuple(hashes[0]) if len(hashes) == 1 else tuple(map(min, *hashes))
+
+
+class NearDuplicateIndex:
+    """Near-duplicate pairs over a ``CompiledBank``, keyed by bank-wide index."""
+
+    @timed("similarity.build")
+    def __init__(self, bank, threshold=THRESHOLD, max_df=MAX_DF):
+        self.bank = bank
+        self.threshold = threshold
+        self.hasher = MinHasher()
+        self.terms = [frozenset()] * len(bank.by_index)  # bank index -> pruned term set
+        self.common = {}    # lens -> terms ignored for that lens
+        self.neighbors = {}  # bank index -> tuple of near-duplicate bank indexes
+        self.pairs = []      # (similarity, bank index, bank index), lower index first
+        self._bands = {}     # (band, band values) -> [bank index, ...]
+
+        for lens in bank.lenses:
+            questions = bank.questions(lens)
+            raw = [terms(q["text"], bank.synonyms) for q in questions]
+            df = {}
+            for ts in raw:
+                for t in ts:
+                    df[t] = df.get(t, 0) + 1
+            self.common[lens] = frozenset(t for t, n in df.items() if n > max_df * len(questions))
+            for q, ts in zip(questions, raw):
+                i = bank.index[q["id"]]
+                self.terms[i] = ts - self.common[lens]
+                if not self.terms[i]:
+                    continue
+                keys = self._band_keys(self.terms[i])
+                for j, sim in self._lookup(self.terms[i], keys):
+                    self.pairs.append((sim, j, i))
+                for key in keys:
+                    self._bands.setdefault(key, []).append(i)
+
+        adjacent = {}
+        for _, i, j in self.pairs:
+            adjacent.setdefault(i, []).append(j)
+            adjacent.setdefault(j, []).append(i)
+        self.neighbors = {i: tuple(js) for i, js in adjacent.items()}
+        self.pairs.sort(reverse=True)
+
+    def _band_keys(self, term_set):
+        sig = self.hasher.signature(term_set)
+        return [(b, sig[b * ROWS:b * ROWS + ROWS]) for b in range(len(sig) // ROWS)]
+
+    def _lookup(self, term_set, keys=None):
+        """``[(bank index, similarity)]`` of indexed questions at or above the threshold."""
+        if not term_set:
+            return []
+        bands = self._bands
+        candidates = {j for key in keys or self._band_keys(term_set) for j in bands.get(key, ())}
+        found = ((j, jaccard(term_set, self.terms[j])) for j in sorted(candidates))
+        return [(j, sim) for j, sim in found if sim >= self.threshold]
+
+    def similar(self, text: str, lens: str) -> list:
+        """``[(question, similarity)]`` in the bank that ``text`` would near-duplicate, most similar first."""
+        found = self._lookup(terms(text, self.bank.synonyms) - self.common.get(lens, frozenset()))
+        return [(self.bank.by_index[j], sim) for j, sim in sorted(found, key=lambda js: -js[1])]
+
+    def block(self, blocked: Bitset, i: int):
+        """Add bank index ``i`` and its near-duplicates to ``blocked``."""
+        blocked.add(i)
+        for j in self.neighbors.get(i, ()):
+            blocked.add(j)
+
+    def around(self, members: Bitset) -> Bitset:
+        """A copy of ``members`` plus the near-duplicates of every member."""
+        bits = members.copy()
+        for i, js in self.neighbors.items():
+            if i in members:
+                for j in js:
+                    bits.add(j)
+        return bits
+
+    def clusters(self) -> list:
+        """Groups of mutually reachable near-duplicates (lists of questions, largest first)."""
+        seen, groups = set(), []
+        for start in sorted(self.neighbors):
+            if start in seen:
+                continue
+            seen.add(start)
+            stack, group = [start], []
+            while stack:
+                i = stack.pop()
+                group.append(i)
+                for j in self.neighbors[i]:
+                    if j not in seen:
+                        seen.add(j)
+                        stack.append(j)
+            groups.append([self.bank.by_index[i] for i in sorted(group)])
+        return sorted(groups, key=len, reverse=True)
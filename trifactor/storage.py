@@ -0,0 +1,532 @@
+"""Session persistence: resumable diagnostics and completed results.
+
+A store keeps each session's progress (lens, stage, question lists, cursor
+positions, seed) and its answers, keyed by an opaque session token, so a
+session survives a server restart and can be resumed on any replica that
+shares the store. Completed results are kept for later analysis and population statistics,
+with any response-quality flags (``trifactor.quality``). Flagged results are
+left out of ``results_since`` and ``completed_since``, which feed population
+statistics and calibration.
+Each user's completed runs also go to an append-only history, one series
+per (user, lens), stored with its running ``Trend`` (see
+``trifactor.history``) and indexed by completion time for range queries.
+
+Backends are chosen by URL through ``open_store``:
+
+    sqlite:///path/to/sessions.db   SQLiteStore (default; WAL, pooled connections)
+    memory://                        MemoryStore (per process, nothing persisted)
+
+``SQLiteStore`` does not write per click. Answer events go to an in-memory
+buffer that a background thread flushes in one transaction every
+``flush_interval`` seconds or once ``batch_size`` events are waiting;
+loading a session flushes first, so reads always see earlier writes. A
+batch that fails to commit goes back to the front of the buffer and is
+retried on the next flush (the buffer keeps at most ``max_pending`` events;
+the oldest beyond that are dropped and logged). ``close`` flushes what is
+left, so callers close the store on shutdown.
+Rows are compact: questions are stored by their bank index (two bytes
+each) and an answer is a (session, question, value) triple of integers.
+"""
+
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from contextlib import contextmanager
+from math import inf
+from operator import itemgetter
+from pathlib import Path
+
+from trifactor.history import Trend
+from trifactor.metrics import timed
+
+DEFAULT_STORE_URL = "sqlite:///sessions.db"
+
+log = logging.getLogger(__name__)
+
+STATE_FIELDS = ("lens", "stage", "mode", "seed", "questions", "followups", "targets", "idx", "followup_idx", "user")
+
+
+class SessionStore:
+    """Interface every backend implements; question lists are lists of qids."""
+
+    def save_session(self, token: str, state: dict):
+        raise NotImplementedError
+
+    def record_answer(self, token: str, qid: str, value: int):
+        raise NotImplementedError
+
+    def load_session(self, token: str):
+        """Saved state plus ``answers`` ({qid: value}), or None if unknown or unreadable."""
+        raise NotImplementedError
+
+    def iter_sessions(self):
+        """Yield ``(token, state)`` for every stored session, ``state`` as from ``load_session``."""
+        raise NotImplementedError
+
+    def save_result(self, token: str, overall: float, per_variable: dict, flags=()):
+        """Record a completed run with its quality ``flags``; only the first result per session is kept."""
+        raise NotImplementedError
+
+    def results_since(self, rid: int):
+        """Yield ``(rid, lens, overall, per_variable)`` for unflagged results with id > ``rid``, in id order."""
+        raise NotImplementedError
+
+    def completed_since(self, rid: int):
+        """Yield ``(rid, state)`` per unflagged completed session with result id > ``rid``, in id order.
+
+        ``state`` is as returned by ``load_session``, answers included.
+        """
+        raise NotImplementedError
+
+    def append_history(self, user: str, token: str, lens: str, overall: float, per_variable: dict,
+                       completed_at: float = None) -> Trend:
+        """Append session ``token``'s result to ``user``'s series for ``lens``; returns the updated trend.
+
+        Each session is appended once; repeating the call returns the trend unchanged.
+        """
+        raise NotImplementedError
+
+    def history(self, user: str, lens: str, since: float = 0.0, until: float = inf) -> list:
+        """``(completed_at, overall, per_variable)`` for runs completed in [since, until), oldest first."""
+        raise NotImplementedError
+
+    def trend(self, user: str, lens: str):
+        """The series' ``Trend``, or None if ``user`` has no runs for ``lens``."""
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+
+class MemoryStore(SessionStore):
+    def __init__(self, bank=None):
+        self._sessions = {}
+        self._results = {}     # token -> rid
+        self._result_tokens = [] # rid - 1 -> token
+        self._result_rows = [] # rid - 1 -> (rid, lens, overall, per_variable)
+        self._flagged = set()  # rids saved with quality flags
+        self._series = {}      # (user, lens) -> [(completed_at, overall, per_variable)], oldest first
+        self._trends = {}      # (user, lens) -> Trend
+        self._appended = set() # tokens already in a series
+        self._lock = threading.Lock()
+
+    def save_session(self, token, state):
+        with self._lock:
+            saved = self._sessions.setdefault(token, {"answers": {}})
+            user = saved.get("user")
+            saved.update({k: state[k] for k in STATE_FIELDS if k in state})
+            if saved.get("user") is None:
+                saved["user"] = user  # a save without a user keeps the stored one
+
+    def record_answer(self, token, qid, value):
+        with self._lock:
+            self._sessions.setdefault(token, {"answers": {}})["answers"][qid] = value
+
+    def load_session(self, token):
+        with self._lock:
+            saved = self._sessions.get(token)
+            return None if saved is None else {**saved, "answers": dict(saved["answers"])}
+
+    def iter_sessions(self):
+        with self._lock:
+            tokens = list(self._sessions)
+        for token in tokens:
+            saved = self.load_session(token)
+            if saved is not None:
+                yield token, saved
+
+    def save_result(self, token, overall, per_variable, flags=()):
+        with self._lock:
+            if token in self._results:
+                return
+            rid = len(self._result_rows) + 1
+            self._results[token] = rid
+            self._result_tokens.append(token)
+            lens = self._sessions.get(token, {}).get("lens")
+            self._result_rows.append((rid, lens, overall, per_variable))
+            if flags:
+                self._flagged.add(rid)
+
+    def results_since(self, rid):
+        with self._lock:
+            return [row for row in self._result_rows[rid:] if row[0] not in self._flagged]
+
+    def completed_since(self, rid):
+        with self._lock:
+            tokens = self._result_tokens[rid:]
+        for n, token in enumerate(tokens, start=rid + 1):
+            if n not in self._flagged:
+                yield n, self.load_session(token)
+
+    def append_history(self, user, token, lens, overall, per_variable, completed_at=None):
+        completed_at = time.time() if completed_at is None else completed_at
+        with self._lock:
+            trend = self._trends.setdefault((user, lens), Trend())
+            if token not in self._appended:
+                self._appended.add(token)
+                insort(self._series.setdefault((user, lens), []), (completed_at, overall, per_variable),
+                       key=itemgetter(0))
+                trend.add(overall, per_variable, completed_at)
+            return trend
+
+    def history(self, user, lens, since=0.0, until=inf):
+        with self._lock:
+            series = self._series.get((user, lens), [])
+            key = itemgetter(0)
+            return series[bisect_left(series, since, key=key):bisect_left(series, until, key=key)]
+
+    def trend(self, user, lens):
+        with self._lock:
+            return self._trends.get((user, lens))
+
+
+# ──────────────────────────────────────────────────────────────
+# SQLite
+# ──────────────────────────────────────────────────────────────
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    sid          INTEGER PRIMARY KEY,
+    token        TEXT NOT NULL UNIQUE,
+    bank_version TEXT NOT NULL,          -- CompiledBank.layout (older rows: CompiledBank.version)
+    lens         TEXT NOT NULL,
+    stage        TEXT NOT NULL,
+    mode         TEXT NOT NULL DEFAULT 'fixed',
+    seed         INTEGER NOT NULL DEFAULT 0,
+    questions    BLOB NOT NULL,          -- u16 bank indexes
+    followups    BLOB NOT NULL,          -- u16 bank indexes
+    targets      TEXT NOT NULL DEFAULT '',
+    idx          INTEGER NOT NULL DEFAULT 0,
+    followup_idx INTEGER NOT NULL DEFAULT 0,
+    updated_at   REAL NOT NULL,
+    user_id      TEXT                    -- history key the run's result is appended under; kept once set
+);
+CREATE TABLE IF NOT EXISTS answers (
+    sid   INTEGER NOT NULL,
+    qidx  INTEGER NOT NULL,
+    value INTEGER NOT NULL,
+    PRIMARY KEY (sid, qidx)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS results (
+    rid          INTEGER PRIMARY KEY AUTOINCREMENT,  -- commit order, used as a sync watermark
+    sid          INTEGER NOT NULL UNIQUE,
+    lens         TEXT NOT NULL,
+    completed_at REAL NOT NULL,
+    overall      REAL NOT NULL,
+    per_variable TEXT NOT NULL,          -- JSON
+    flags        TEXT NOT NULL DEFAULT ''  -- comma-separated trifactor.quality flags; '' if clean
+);
+CREATE TABLE IF NOT EXISTS history (
+    hid          INTEGER PRIMARY KEY,
+    user_id      TEXT NOT NULL,
+    lens         TEXT NOT NULL,
+    token        TEXT NOT NULL UNIQUE,   -- one entry per session
+    completed_at REAL NOT NULL,
+    overall      REAL NOT NULL,
+    per_variable TEXT NOT NULL           -- JSON
+);
+CREATE INDEX IF NOT EXISTS history_series ON history (user_id, lens, completed_at);
+CREATE TABLE IF NOT EXISTS trends (
+    user_id TEXT NOT NULL,
+    lens    TEXT NOT NULL,
+    state   TEXT NOT NULL,               -- JSON of trifactor.history.Trend
+    PRIMARY KEY (user_id, lens)
+) WITHOUT ROWID;
+"""
+
+
+_SESSION_SQL = """SELECT sid, bank_version, lens, stage, mode, seed, questions, followups,
+                         targets, idx, followup_idx, user_id"""
+# Columns added after the first release, ALTERed into older stores: (table, column, definition).
+_ADDED_COLUMNS = (
+    ("results", "flags", "TEXT NOT NULL DEFAULT ''"),  # earlier results count as clean
+    ("sessions", "user_id", "TEXT"),
+)
+_TREND_SQL = "SELECT state FROM trends WHERE user_id = ? AND lens = ?"
+
+
+class ConnectionPool:
+    """Fixed-size pool of SQLite connections shared across threads."""
+
+    def __init__(self, path, size=4):
+        self._idle = queue.LifoQueue()
+        for _ in range(size):
+            conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._idle.put(conn)
+        self.size = size
+
+    @contextmanager
+    def connection(self):
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def close(self):
+        for _ in range(self.size):
+            self._idle.get().close()
+
+
+class SQLiteStore(SessionStore):
+    def __init__(self, path, bank, pool_size=4, batch_size=256, flush_interval=0.5, max_pending=100_000):
+        self.bank = bank
+        self._ids = [None] * len(bank.index)  # bank index -> qid
+        # Stored question indexes depend only on the bank's layout, so weight or text edits keep
+        # sessions readable; rows written before layouts were recorded carry a content version.
+        self._versions = (bank.layout, bank.version, bank.base_version)
+        for qid, i in bank.index.items():
+            self._ids[i] = qid
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.pool = ConnectionPool(str(path), pool_size)
+        with self.pool.connection() as conn:
+            conn.executescript(_SCHEMA)
+            for table, column, definition in _ADDED_COLUMNS:
+                if column not in {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}:
+                    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending = []              # (qidx, value, token) awaiting flush, oldest first
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # batches commit in the order they were taken
+        self._wake = threading.Event()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_behind, args=(flush_interval,), daemon=True)
+        self._writer.start()
+
+    def _pack(self, qids) -> bytes:
+        index = self.bank.index
+        return array("H", (index[qid] for qid in qids)).tobytes()
+
+    def _unpack(self, blob) -> list:
+        packed = array("H")
+        packed.frombytes(blob)
+        return [self._ids[i] for i in packed]
+
+    @timed("store.save_session")
+    def save_session(self, token, state):
+        row = (
+            token, self.bank.layout, state["lens"], state["stage"], state.get("mode", "fixed"),
+            state.get("seed", 0), self._pack(state.get("questions", ())),
+            self._pack(state.get("followups", ())), ",".join(state.get("targets", ())),
+            state.get("idx", 0), state.get("followup_idx", 0), time.time(), state.get("user"),
+        )
+        with self.pool.transaction() as conn:
+            conn.execute(
+                """INSERT INTO sessions (token, bank_version, lens, stage, mode, seed, questions,
+                                         followups, targets, idx, followup_idx, updated_at, user_id)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT (token) DO UPDATE SET
+                       bank_version = excluded.bank_version, lens = excluded.lens,
+                       stage = excluded.stage, mode = excluded.mode, seed = excluded.seed,
+                       questions = excluded.questions, followups = excluded.followups,
+                       targets = excluded.targets, idx = excluded.idx,
+                       followup_idx = excluded.followup_idx, updated_at = excluded.updated_at,
+                       user_id = COALESCE(excluded.user_id, sessions.user_id)""",
+                row,
+            )
+
+    def record_answer(self, token, qid, value):
+        with self._lock:
+            self._pending.append((self.bank.index[qid], int(value), token))
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    @timed("store.flush")
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return
+            try:
+                with self.pool.transaction() as conn:
+                    conn.executemany(
+                        """INSERT OR REPLACE INTO answers (sid, qidx, value)
+                           SELECT sid, ?, ? FROM sessions WHERE token = ?""",
+                        batch,
+                    )
+            except sqlite3.Error:
+                self._requeue(batch)
+                raise
+
+    def _requeue(self, batch):
+        """Put a failed batch back ahead of newer events, so later answers still win."""
+        with self._lock:
+            self._pending[:0] = batch
+            excess = len(self._pending) - self.max_pending
+            if excess > 0:
+                del self._pending[:excess]
+        if excess > 0:
+            log.error("answer buffer full: dropped the %d oldest unwritten answer events", excess)
+
+    def _write_behind(self, interval):
+        while not self._closed:
+            self._wake.wait(interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                # Keep the writer alive; the batch was requeued for the next attempt
+                log.warning("answer flush failed; will retry", exc_info=True)
+
+    def _state(self, row, answers) -> dict:
+        return {
+            "lens": row[2],
+            "stage": row[3],
+            "mode": row[4],
+            "seed": row[5],
+            "questions": self._unpack(row[6]),
+            "followups": self._unpack(row[7]),
+            "targets": row[8].split(",") if row[8] else [],
+            "idx": row[9],
+            "followup_idx": row[10],
+            "user": row[11],
+            "answers": {self._ids[qidx]: value for qidx, value in answers},
+        }
+
+    @timed("store.load_session")
+    def load_session(self, token):
+        self.flush()
+        with self.pool.connection() as conn:
+            row = conn.execute(_SESSION_SQL + " FROM sessions WHERE token = ?", (token,)).fetchone()
+            if row is None or row[1] not in self._versions:
+                return None  # question indexes are only meaningful for the bank layout that wrote them
+            answers = conn.execute("SELECT qidx, value FROM answers WHERE sid = ?", (row[0],)).fetchall()
+        return self._state(row, answers)
+
+    def iter_sessions(self, page_size=500):
+        """Sessions of the current bank layout in sid order, read ``page_size`` at a time."""
+        self.flush()
+        last = 0
+        while True:
+            with self.pool.connection() as conn:
+                rows = conn.execute(
+                    _SESSION_SQL + """, token FROM sessions
+                       WHERE sid > ? AND bank_version IN (?, ?, ?) ORDER BY sid LIMIT ?""",
+                    (last, *self._versions, page_size),
+                ).fetchall()
+                if not rows:
+                    return
+                by_sid = {}
+                for sid, qidx, value in conn.execute(
+                    "SELECT sid, qidx, value FROM answers WHERE sid BETWEEN ? AND ?", (rows[0][0], rows[-1][0])
+                ):
+                    by_sid.setdefault(sid, []).append((qidx, value))
+            for row in rows:
+                yield row[-1], self._state(row, by_sid.get(row[0], ()))
+            last = rows[-1][0]
+
+    def completed_since(self, rid, page_size=500):
+        """Completed sessions of the current bank layout, read ``page_size`` at a time."""
+        self.flush()
+        while True:
+            with self.pool.connection() as conn:
+                rows = conn.execute(
+                    _SESSION_SQL + """, rid FROM sessions
+                       JOIN (SELECT rid, sid AS result_sid FROM results WHERE rid > ? AND flags = '')
+                         ON result_sid = sid
+                       WHERE bank_version IN (?, ?, ?) ORDER BY rid LIMIT ?""",
+                    (rid, *self._versions, page_size),
+                ).fetchall()
+                if not rows:
+                    return
+                by_sid = {}
+                sids = [row[0] for row in rows]
+                for sid, qidx, value in conn.execute(
+                    f"SELECT sid, qidx, value FROM answers WHERE sid IN ({','.join('?' * len(sids))})", sids
+                ):
+                    by_sid.setdefault(sid, []).append((qidx, value))
+            for row in rows:
+                yield row[-1], self._state(row, by_sid.get(row[0], ()))
+            rid = rows[-1][-1]
+
+    @timed("store.save_result")
+    def save_result(self, token, overall, per_variable, flags=()):
+        self.flush()
+        with self.pool.transaction() as conn:
+            conn.execute(
+                """INSERT OR IGNORE INTO results (sid, lens, completed_at, overall, per_variable, flags)
+                   SELECT sid, lens, ?, ?, ?, ? FROM sessions WHERE token = ?""",
+                (time.time(), overall, json.dumps(per_variable), ",".join(flags), token),
+            )
+
+    def results_since(self, rid):
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                "SELECT rid, lens, overall, per_variable FROM results WHERE rid > ? AND flags = '' ORDER BY rid",
+                (rid,),
+            ).fetchall()
+        for rid, lens, overall, per_variable in rows:
+            yield rid, lens, overall, json.loads(per_variable)
+
+    @timed("store.append_history")
+    def append_history(self, user, token, lens, overall, per_variable, completed_at=None):
+        completed_at = time.time() if completed_at is None else completed_at
+        with self.pool.transaction() as conn:
+            appended = conn.execute(
+                """INSERT OR IGNORE INTO history (user_id, lens, token, completed_at, overall, per_variable)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                (user, lens, token, completed_at, overall, json.dumps(per_variable)),
+            ).rowcount
+            row = conn.execute(_TREND_SQL, (user, lens)).fetchone()
+            trend = Trend.from_json(row[0]) if row else Trend()
+            if appended:
+                trend.add(overall, per_variable, completed_at)
+                conn.execute("INSERT OR REPLACE INTO trends (user_id, lens, state) VALUES (?, ?, ?)",
+                             (user, lens, trend.to_json()))
+        return trend
+
+    def history(self, user, lens, since=0.0, until=inf):
+        with self.pool.connection() as conn:
+            rows = conn.execute(
+                """SELECT completed_at, overall, per_variable FROM history
+                   WHERE user_id = ? AND lens = ? AND completed_at >= ? AND completed_at < ?
+                   ORDER BY completed_at""",
+                (user, lens, since, until),
+            ).fetchall()
+        return [(at, overall, json.loads(per_variable)) for at, overall, per_variable in rows]
+
+    def trend(self, user, lens):
+        with self.pool.connection() as conn:
+            row = conn.execute(_TREND_SQL, (user, lens)).fetchone()
+        return None if row is None else Trend.from_json(row[0])
+
+    def close(self):
+        self._closed = True
+        self._wake.set()
+        self._writer.join()
+        self.flush()
+        self.pool.close()
+
+
+def open_store(url: str, bank) -> SessionStore:
+    if url.startswith("sqlite:///"):
+        return SQLiteStore(url[len("sqlite:///"):], bank)
+    if url.startswith("memory://"):
+        return MemoryStore(bank)
+    raise ValueError(f"Unsupported session store URL {url!r}")
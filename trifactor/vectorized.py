@@ -0,0 +1,155 @@
+"""Vectorized batch scoring with NumPy.
+
+Scores many sessions in one pass: every answered item of every session is
+one row in flat answer/weight/reverse/variable-code arrays, and per-variable
+sums are group-by reductions (``np.bincount``) over a (session, variable) key.
+Percentages and zones match ``compute_scores`` exactly; volatility and the
+overall score agree to within floating-point rounding.
+
+    table = ItemTable(bank)
+    scores = score_arrays(table.encode(sessions))
+    scores.per_variable(0)   # same shape as compute_scores()[1]
+"""
+
+from typing import NamedTuple
+
+import numpy as np
+
+from trifactor.bank import VARIABLES
+from trifactor.scoring import GREEN_FROM, RED_BELOW, VARIABLE_WEIGHTS, ZONES, parse_answer
+
+
+class SessionArrays(NamedTuple):
+    """Flat item rows for a batch of sessions (invalid answers already dropped)."""
+
+    session: np.ndarray   # intp, session index of each row
+    answer: np.ndarray    # int8, raw 0–4 answer
+    weight: np.ndarray    # float64, item weight
+    reverse: np.ndarray   # bool, reverse-scored item
+    var_code: np.ndarray  # intp, index into ItemTable.variables
+    n_sessions: int
+    variables: tuple
+
+
+class BatchScores(NamedTuple):
+    variables: tuple
+    pct: np.ndarray          # float64 [sessions, variables], NaN where unanswered
+    zone: np.ndarray         # int8 [sessions, variables], index into ZONES, -1 where unanswered
+    volatility: np.ndarray   # float64 [sessions, variables], NaN where unanswered
+    count: np.ndarray        # intp [sessions, variables], answered items
+    overall: np.ndarray      # float64 [sessions]
+    first: np.ndarray        # intp [sessions, variables], row of first answered item
+
+    def per_variable(self, i: int) -> dict:
+        """Session ``i`` in the ``compute_scores`` per-variable dict format.
+
+        Keys follow first appearance, as in ``compute_scores``, so tie-breaks in
+        ``choose_followup_targets`` come out the same.
+        """
+        codes = sorted((v for v in range(len(self.variables)) if self.count[i, v]),
+                       key=lambda v: self.first[i, v])
+        return {
+            self.variables[v]: {
+                "pct": float(self.pct[i, v]),
+                "zone": ZONES[self.zone[i, v]],
+                "volatility": float(self.volatility[i, v]),
+            }
+            for v in codes
+        }
+
+
+class ItemTable:
+    """Per-question weight, reverse flag and variable code for one bank."""
+
+    def __init__(self, bank):
+        variables = list(VARIABLES)
+        rows = []
+        for lens in bank.lenses:
+            for q in bank.questions(lens):
+                if q["variable"] not in variables:
+                    variables.append(q["variable"])
+                rows.append(q)
+
+        self.variables = tuple(variables)
+        code = {v: i for i, v in enumerate(self.variables)}
+        self.row = {q["id"]: i for i, q in enumerate(rows)}
+        self.weight = np.array([float(q.get("weight", 1.0)) for q in rows], dtype=np.float64)
+        self.reverse = np.array([bool(q.get("reverse", False)) for q in rows], dtype=bool)
+        self.var_code = np.array([code[q["variable"]] for q in rows], dtype=np.intp)
+
+    def encode(self, sessions) -> SessionArrays:
+        """Flatten ``(question_ids, answers)`` pairs into one ``SessionArrays``.
+
+        Like ``compute_scores``, unanswered and invalid answers are skipped.
+        Unknown question ids raise ``KeyError``.
+        """
+        session, rows, answer = [], [], []
+        n = 0
+        for n, (question_ids, answers) in enumerate(sessions, start=1):
+            for qid in question_ids:
+                if qid not in answers:
+                    continue
+                a = parse_answer(answers[qid])
+                if a is None:
+                    continue
+                session.append(n - 1)
+                rows.append(self.row[qid])
+                answer.append(a)
+
+        rows = np.array(rows, dtype=np.intp)
+        return SessionArrays(
+            session=np.array(session, dtype=np.intp),
+            answer=np.array(answer, dtype=np.int8),
+            weight=self.weight[rows],
+            reverse=self.reverse[rows],
+            var_code=self.var_code[rows],
+            n_sessions=n,
+            variables=self.variables,
+        )
+
+
+def score_arrays(arrays: SessionArrays) -> BatchScores:
+    n_vars = len(arrays.variables)
+    shape = (arrays.n_sessions, n_vars)
+    size = shape[0] * shape[1]
+
+    key = arrays.session * n_vars + arrays.var_code
+    score = np.where(arrays.reverse, 4 - arrays.answer, arrays.answer).astype(np.float64)
+
+    count = np.bincount(key, minlength=size).reshape(shape)
+    wsum = np.bincount(key, weights=arrays.weight, minlength=size).reshape(shape)
+    swsum = np.bincount(key, weights=score * arrays.weight, minlength=size).reshape(shape)
+    s1 = np.bincount(key, weights=score, minlength=size).reshape(shape)
+    s2 = np.bincount(key, weights=score * score, minlength=size).reshape(shape)
+
+    first = np.full(size, len(key), dtype=np.intp)
+    keys, first_rows = np.unique(key, return_index=True)
+    first[keys] = first_rows
+    first = first.reshape(shape)
+
+    answered = count > 0
+    valid = answered & (wsum > 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = swsum / wsum  # 0–4
+        pct = np.where(valid, np.clip(mean / 4 * 100, 0, 100), np.nan)
+
+        # Population stdev of the unweighted item scores; scores are small
+        # integers so n·Σs² − (Σs)² is exact.
+        spread = np.sqrt(np.maximum(count * s2 - s1 * s1, 0)) / count
+        volatility = np.where(count > 1, spread / 4 * 100, 0.0)
+    volatility = np.where(valid, volatility, np.nan)
+
+    zone = np.select([pct < RED_BELOW, pct < GREEN_FROM], [0, 1], default=2).astype(np.int8)
+    zone[~valid] = -1
+
+    var_weight = np.array([VARIABLE_WEIGHTS.get(v, 1.0) for v in arrays.variables])
+    num = np.where(valid, pct * var_weight, 0.0).sum(axis=1)
+    den = np.where(valid, var_weight, 0.0).sum(axis=1)
+    overall = np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+
+    return BatchScores(arrays.variables, pct, zone, volatility, np.where(valid, count, 0), overall, first)
+
+
+def score_sessions(bank, sessions, table: ItemTable = None) -> BatchScores:
+    """Score ``(question_ids, answers)`` pairs against ``bank`` in one batch."""
+    return score_arrays((table or ItemTable(bank)).encode(sessions))